@@ -25,6 +25,7 @@ OPTIMAL_CHROMA_REMOVAL = {
 # Import main application
 try:
     from main import AutoVideoEditor
+    from whisper_policy import SPEED_PROFILE
 except ImportError as e:
     print(f"❌ Lỗi import main application: {e}")
     sys.exit(1)
@@ -787,7 +788,8 @@ class VideoEditorGUI:
                         source_language=source_language,
                         target_language=target_language,
                         video_overlay_settings=video_overlay_settings,
-                        words_per_line=words_per_line
+                        words_per_line=words_per_line,
+                        whisper_profile=SPEED_PROFILE  # Người dùng đang chờ: ưu tiên nhanh
                     )
                     self.status_label.config(text="✅ Hoàn thành!")
                     self.log_message("✅ Xử lý xong! File kết quả đã lưu.")
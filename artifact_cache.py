@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module cache artifact trung gian (phụ đề gốc, segment nguyên câu, phụ đề đã dịch)
+Key = hash nội dung input + tham số của bước xử lý, lưu trên đĩa và
+xóa theo LRU khi vượt giới hạn dung lượng.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import time
+import tempfile
+import threading
+
+# Thư mục cache mặc định (có thể đổi bằng biến môi trường EDITVIDEO_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "editvideo")
+
+# Giới hạn dung lượng mặc định 2GB (có thể đổi bằng biến môi trường EDITVIDEO_CACHE_MAX_MB)
+DEFAULT_MAX_SIZE_MB = 2048
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ArtifactCache:
+    """Cache artifact theo nội dung (content-addressed) với giới hạn dung lượng LRU"""
+
+    def __init__(self, cache_dir=None, max_size_mb=None):
+        self.cache_dir = cache_dir or os.environ.get("EDITVIDEO_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_size_mb is None:
+            max_size_mb = float(os.environ.get("EDITVIDEO_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB))
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._hash_memo = {}
+        self._lock = threading.Lock()
+
+    def hash_file(self, path):
+        """
+        Tính SHA-256 nội dung file (nhớ theo đường dẫn + kích thước + mtime)
+
+        Args:
+            path (str): Đường dẫn file
+
+        Returns:
+            str: Mã hash hex
+        """
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._hash_memo.get(memo_key)
+        if cached:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+
+        with self._lock:
+            self._hash_memo[memo_key] = file_hash
+        return file_hash
+
+    def make_key(self, stage, content_hash, **params):
+        """
+        Tạo key cache từ tên bước, hash nội dung input và tham số của bước
+
+        Args:
+            stage (str): Tên bước ('subtitle', 'segments', 'translation', ...)
+            content_hash (str): Hash nội dung input
+            params: Tham số ảnh hưởng tới kết quả (model, ngôn ngữ, words_per_line...)
+        """
+        payload = json.dumps({'stage': stage, 'input': content_hash, 'params': params},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, output_path):
+        """
+        Copy artifact đã cache ra output_path
+
+        Returns:
+            bool: True nếu cache hit
+        """
+        entry_path = self._entry_path(key)
+        try:
+            shutil.copyfile(entry_path, output_path)
+            # Cập nhật thời gian truy cập cho LRU
+            os.utime(entry_path, None)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"⚠️ Không thể đọc cache {key[:12]}: {e}")
+            return False
+
+    def store(self, key, source_path):
+        """Lưu artifact vào cache rồi xóa bớt mục cũ nếu vượt giới hạn"""
+        entry_path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            # Ghi vào file tạm rồi đổi tên để tránh đọc phải file ghi dở
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            print(f"⚠️ Không thể ghi cache {key[:12]}: {e}")
+            return
+
+        self.evict()
+
+    def evict(self, min_age=0):
+        """
+        Xóa các artifact ít được dùng gần đây nhất cho tới khi dưới giới hạn dung lượng
+
+        Args:
+            min_age (float): Giữ lại artifact được dùng trong vòng min_age giây gần nhất
+        """
+        cutoff = time.time() - min_age
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size_bytes:
+            return
+
+        for mtime, size, path in sorted(entries):
+            if min_age and mtime > cutoff:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            if total_size <= self.max_size_bytes:
+                break
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
@@ -8,35 +8,12 @@ import os
 import subprocess
 from pathlib import Path
 
+from ffmpeg_registry import get_ffmpeg_registry
+from media_probe import probe_media
+
 class AspectRatioConverter:
     def __init__(self):
-        self.ffmpeg_path = self._find_ffmpeg()
-    
-    def _find_ffmpeg(self):
-        """Tìm đường dẫn FFmpeg trên hệ thống"""
-        try:
-            # Thử chạy ffmpeg để kiểm tra
-            result = subprocess.run(['ffmpeg', '-version'], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                return 'ffmpeg'
-        except FileNotFoundError:
-            pass
-        
-        # Kiểm tra các đường dẫn phổ biến
-        common_paths = [
-            'C:\\ffmpeg\\bin\\ffmpeg.exe',
-            'C:\\Program Files\\ffmpeg\\bin\\ffmpeg.exe',
-            'ffmpeg.exe'
-        ]
-        
-        for path in common_paths:
-            if os.path.exists(path):
-                return path
-        
-        raise FileNotFoundError(
-            "FFmpeg không được tìm thấy. Vui lòng cài đặt FFmpeg và thêm vào PATH"
-        )
+        self.ffmpeg_path = get_ffmpeg_registry().ffmpeg_path
     
     def convert_to_9_16(self, input_video_path, output_video_path, 
                        target_width=1080, background_color='black'):
@@ -84,6 +61,20 @@ class AspectRatioConverter:
         except Exception as e:
             raise Exception(f"Lỗi chuyển đổi tỉ lệ khung hình: {str(e)}")
     
+    def build_9_16_filter(self, target_width=1080, background_color='black'):
+        """
+        Tạo filter chuyển đổi 9:16 không cần biết kích thước video gốc
+
+        Tương đương với _simple_resize / _convert_wide_video / _convert_narrow_video:
+        scale giữ tỉ lệ cho vừa khung rồi pad phần còn lại bằng màu nền.
+
+        Returns:
+            str: Chuỗi filter (không có label)
+        """
+        target_height = int(target_width * 16 / 9)
+        return (f"scale={target_width}:{target_height}:force_original_aspect_ratio=decrease,"
+                f"pad={target_width}:{target_height}:(ow-iw)/2:(oh-ih)/2:{background_color}")
+
     def _simple_resize(self, input_path, output_path, width, height):
         """Resize đơn giản video"""
         cmd = [
@@ -162,37 +153,16 @@ class AspectRatioConverter:
             dict: Thông tin video
         """
         try:
-            cmd = [
-                'ffprobe',
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_streams',
-                video_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                raise Exception(f"Lỗi lấy thông tin video: {result.stderr}")
-            
-            import json
-            info = json.loads(result.stdout)
-            
-            # Tìm stream video
-            video_stream = None
-            for stream in info['streams']:
-                if stream['codec_type'] == 'video':
-                    video_stream = stream
-                    break
+            info = probe_media(video_path)
             
-            if not video_stream:
+            if not info.has_video:
                 raise Exception("Không tìm thấy stream video")
             
             return {
-                'width': int(video_stream['width']),
-                'height': int(video_stream['height']),
-                'fps': eval(video_stream.get('r_frame_rate', '30/1')),
-                'duration': float(video_stream.get('duration', 0))
+                'width': info.width,
+                'height': info.height,
+                'fps': info.fps or 30.0,
+                'duration': info.duration or 0.0
             }
             
         except Exception as e:
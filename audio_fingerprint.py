@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module fingerprint audio từ PCM đã giải mã (đỉnh phổ, NumPy)
+Audio hạ xuống 8 kHz, mỗi frame lấy đỉnh phổ trong vài dải tần; mỗi cặp đỉnh
+(tần số 1, tần số 2, khoảng cách frame) thành một hash gắn với frame của đỉnh đầu.
+Hai audio cùng lời thoại có nhiều hash trùng ở cùng độ lệch frame, kể cả khi một
+bản bị cắt bớt đầu/cuối.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from audio_source import PCMAudio
+
+FINGERPRINT_SAMPLE_RATE = 8000
+FFT_SIZE = 512
+HOP_SIZE = 256
+FRAME_SECONDS = HOP_SIZE / FINGERPRINT_SAMPLE_RATE
+
+# Dải tần (theo bin FFT ở 8 kHz) lấy một đỉnh mỗi frame: ~150 Hz tới 4 kHz
+PEAK_BANDS = ((10, 40), (40, 80), (80, 160), (160, 256))
+
+# Đỉnh phải cao hơn trung vị phổ toàn bài bấy nhiêu dB (bỏ khoảng lặng/nhiễu nền)
+PEAK_MIN_DB = 10.0
+
+# Mỗi đỉnh ghép với tối đa FAN_OUT đỉnh tiếp theo trong MAX_DELTA_FRAMES frame
+FAN_OUT = 3
+MAX_DELTA_FRAMES = 32
+
+# Điều kiện coi là khớp: tỉ lệ hash trùng ở độ lệch tốt nhất và số hash trùng tối thiểu
+MIN_MATCH_RATIO = 0.25
+MIN_MATCH_COUNT = 20
+
+# Hash trùng phải trải đều cả audio truy vấn, không chỉ một đoạn chung (vd: cùng intro):
+# chia audio thành cửa sổ MATCH_WINDOW_SECONDS giây, cửa sổ có ít nhất MIN_WINDOW_HASHES hash
+# được tính là khớp khi tỉ lệ trùng ≥ MIN_WINDOW_RATIO. Cửa sổ đầu và cuối phải khớp và
+# tổng số cửa sổ khớp ≥ MIN_WINDOW_COVERAGE
+MATCH_WINDOW_SECONDS = 10.0
+MIN_WINDOW_HASHES = 20
+MIN_WINDOW_RATIO = 0.15
+MIN_WINDOW_COVERAGE = 0.9
+
+
+@dataclass
+class Fingerprint:
+    """Danh sách (hash, frame) và độ dài audio"""
+    hashes: List[Tuple[int, int]]
+    duration: float
+
+    @property
+    def is_empty(self):
+        return not self.hashes
+
+
+@dataclass(frozen=True)
+class FingerprintMatch:
+    """Kết quả khớp: audio truy vấn bắt đầu tại offset giây của audio đã lưu"""
+    offset: float
+    score: float
+    matched: int
+
+
+def _spectrogram_db(audio: PCMAudio):
+    samples = audio.to_float32()
+    # Hạ 16 kHz → 8 kHz bằng trung bình từng cặp mẫu (lọc thông thấp thô, đủ cho đỉnh phổ)
+    factor = max(1, audio.sample_rate // FINGERPRINT_SAMPLE_RATE)
+    usable = len(samples) - len(samples) % factor
+    samples = samples[:usable].reshape(-1, factor).mean(axis=1)
+    if len(samples) < FFT_SIZE:
+        return None
+    frame_count = 1 + (len(samples) - FFT_SIZE) // HOP_SIZE
+    frames = np.lib.stride_tricks.as_strided(
+        samples,
+        shape=(frame_count, FFT_SIZE),
+        strides=(samples.strides[0] * HOP_SIZE, samples.strides[0])
+    )
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FFT_SIZE), axis=1))
+    return 20 * np.log10(spectrum + 1e-6)
+
+
+def compute_fingerprint(audio: PCMAudio) -> Fingerprint:
+    """
+    Tính fingerprint của audio (khoảng 0,1 giây cho mỗi phút audio)
+
+    Returns:
+        Fingerprint: Rỗng nếu audio quá ngắn hoặc im lặng
+    """
+    spectrogram = _spectrogram_db(audio)
+    if spectrogram is None:
+        return Fingerprint([], audio.duration)
+
+    threshold = float(np.median(spectrogram)) + PEAK_MIN_DB
+    peaks = []
+    for low, high in PEAK_BANDS:
+        band = spectrogram[:, low:high]
+        bins = band.argmax(axis=1)
+        levels = band[np.arange(len(band)), bins]
+        for frame in np.nonzero(levels > threshold)[0]:
+            peaks.append((int(frame), int(bins[frame]) + low))
+    peaks.sort()
+
+    hashes = []
+    for index, (frame, frequency) in enumerate(peaks):
+        paired = 0
+        for next_frame, next_frequency in peaks[index + 1:]:
+            delta = next_frame - frame
+            if delta == 0:
+                continue
+            if delta > MAX_DELTA_FRAMES or paired >= FAN_OUT:
+                break
+            hashes.append(((frequency << 15) | (next_frequency << 6) | delta, frame))
+            paired += 1
+    return Fingerprint(hashes, audio.duration)
+
+
+def match_offsets(query_hashes, stored_frames):
+    """
+    Tìm độ lệch frame có nhiều hash trùng nhất
+
+    Args:
+        query_hashes (list[tuple[int, int]]): (hash, frame) của audio truy vấn
+        stored_frames (dict[int, list[int]]): hash → các frame trong audio đã lưu
+
+    Returns:
+        tuple[int, list[int]]: (độ lệch frame, frame truy vấn của các hash trùng),
+        (0, []) nếu không trùng
+    """
+    offsets = Counter()
+    for value, frame in query_hashes:
+        for stored_frame in stored_frames.get(value, ()):
+            offsets[stored_frame - frame] += 1
+    if not offsets:
+        return 0, []
+    # Cắt lệch nửa frame làm đỉnh tách ra hai độ lệch liền nhau: xét theo cặp liền kề
+    best_offset = max(offsets, key=lambda offset: offsets[offset] + offsets.get(offset + 1, 0))
+    window = (best_offset, best_offset + 1)
+    # Đếm lại theo từng hash truy vấn (mỗi hash tính tối đa một lần)
+    matched_frames = [
+        frame for value, frame in query_hashes
+        if any(stored_frame - frame in window for stored_frame in stored_frames.get(value, ()))
+    ]
+    if offsets.get(best_offset + 1, 0) > offsets[best_offset]:
+        best_offset += 1
+    return best_offset, matched_frames
+
+
+def _covers_query(query: Fingerprint, matched_frames) -> bool:
+    """Hash trùng có trải đều các cửa sổ của audio truy vấn (kể cả đầu và cuối) không"""
+    window_frames = max(1, round(MATCH_WINDOW_SECONDS / FRAME_SECONDS))
+    totals = Counter(frame // window_frames for _, frame in query.hashes)
+    hits = Counter(frame // window_frames for frame in matched_frames)
+    covered = [hits[window] / totals[window] >= MIN_WINDOW_RATIO
+               for window in sorted(totals) if totals[window] >= MIN_WINDOW_HASHES]
+    if not covered:
+        return False
+    return covered[0] and covered[-1] and sum(covered) >= MIN_WINDOW_COVERAGE * len(covered)
+
+
+def score_match(query: Fingerprint, stored_frames) -> FingerprintMatch:
+    """Khớp fingerprint truy vấn với hash đã lưu, None nếu không đủ điều kiện"""
+    if query.is_empty:
+        return None
+    offset, matched_frames = match_offsets(query.hashes, stored_frames)
+    count = len(matched_frames)
+    score = count / len(query.hashes)
+    if count < MIN_MATCH_COUNT or score < MIN_MATCH_RATIO:
+        return None
+    if not _covers_query(query, matched_frames):
+        return None
+    return FingerprintMatch(offset * FRAME_SECONDS, score, count)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module đọc audio từ video cho Speech-to-Text
+FFmpeg giải mã thẳng ra PCM s16le 16 kHz mono qua pipe vào NumPy,
+không ghi file WAV trung gian.
+"""
+
+import os
+import subprocess
+from dataclasses import dataclass
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from ffmpeg_registry import get_ffmpeg_registry
+from media_probe import probe_media
+
+# Whisper và Google Speech đều làm việc ở 16 kHz mono
+STT_SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # s16le
+
+
+@dataclass
+class PCMAudio:
+    """Audio PCM 16-bit mono trong bộ nhớ"""
+    samples: "np.ndarray"  # int16
+    sample_rate: int = STT_SAMPLE_RATE
+
+    @property
+    def duration(self) -> float:
+        """Thời lượng (giây)"""
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self.samples) == 0
+
+    def to_float32(self) -> "np.ndarray":
+        """Mẫu float32 trong [-1, 1] (định dạng Whisper nhận trực tiếp)"""
+        return self.samples.astype(np.float32) / 32768.0
+
+    def to_bytes(self) -> bytes:
+        """Dữ liệu PCM thô (dùng cho speech_recognition.AudioData)"""
+        return self.samples.tobytes()
+
+    def slice(self, start: float, end: float) -> 'PCMAudio':
+        """Cắt đoạn [start, end) theo giây (không copy dữ liệu)"""
+        start_index = max(0, int(start * self.sample_rate))
+        end_index = min(len(self.samples), int(end * self.sample_rate))
+        return PCMAudio(self.samples[start_index:end_index], self.sample_rate)
+
+
+def load_pcm_audio(media_path, sample_rate=STT_SAMPLE_RATE) -> PCMAudio:
+    """
+    Giải mã audio của file media thành PCM 16-bit mono bằng một process FFmpeg
+
+    Args:
+        media_path (str): Đường dẫn video/audio
+        sample_rate (int): Tần số lấy mẫu đầu ra
+
+    Returns:
+        PCMAudio: Audio trong bộ nhớ (rỗng nếu file không có audio hoặc không giải mã được;
+        bước tạo phụ đề khi đó dùng phụ đề mặc định)
+    """
+    if not HAS_NUMPY:
+        raise ImportError("Cần cài đặt numpy")
+    if not os.path.exists(media_path):
+        raise Exception(f"File không tồn tại: {media_path}")
+
+    try:
+        has_audio = probe_media(media_path).has_audio
+    except Exception as e:
+        print(f"⚠️ Không thể kiểm tra audio stream: {str(e)}, dùng audio trống...")
+        return _empty_audio(sample_rate)
+    if not has_audio:
+        print("⚠️ Video không có audio")
+        return _empty_audio(sample_rate)
+
+    try:
+        cmd = [
+            get_ffmpeg_registry().ffmpeg_path,
+            '-nostdin',
+            '-v', 'error',
+            '-i', media_path,
+            '-map', '0:a:0',
+            '-vn',
+            '-ac', '1',
+            '-ar', str(sample_rate),
+            '-acodec', 'pcm_s16le',
+            '-f', 's16le',
+            '-'
+        ]
+
+        # communicate() đọc đồng thời stdout/stderr nên không bị kẹt pipe
+        result = subprocess.run(cmd, capture_output=True)
+    except OSError as e:
+        print(f"⚠️ Không thể chạy FFmpeg để đọc audio: {str(e)}, dùng audio trống...")
+        return _empty_audio(sample_rate)
+
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', errors='replace').strip()
+        print(f"⚠️ Không thể giải mã audio: {stderr[-300:]}, dùng audio trống...")
+        return _empty_audio(sample_rate)
+
+    # Bỏ byte lẻ (nếu có) để khớp kích thước mẫu; frombuffer không copy dữ liệu
+    data = result.stdout
+    usable = len(data) - len(data) % SAMPLE_WIDTH
+    samples = np.frombuffer(data, dtype=np.int16, count=usable // SAMPLE_WIDTH)
+    audio = PCMAudio(samples, sample_rate)
+    print(f"🎵 Đã đọc {audio.duration:.1f}s audio ({sample_rate} Hz mono)")
+    return audio
+
+
+def _empty_audio(sample_rate):
+    return PCMAudio(np.zeros(0, dtype=np.int16), sample_rate)
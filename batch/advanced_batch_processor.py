@@ -17,6 +17,8 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, asdict
 from typing import List, Dict, Optional, Callable
 from main import AutoVideoEditor
+from whisper_policy import QUALITY_PROFILE, preload_profile_model
+from whisper_batch_server import HAS_WHISPER, get_whisper_batch_server
 
 @dataclass
 class VideoTask:
@@ -43,7 +45,7 @@ class VideoTask:
 class AdvancedBatchProcessor:
     """Xử lý hàng loạt video nâng cao với tối ưu hiệu năng"""
     
-    def __init__(self, max_workers=None, memory_limit_gb=8, priority_mode=True):
+    def __init__(self, max_workers=None, memory_limit_gb=8, priority_mode=True, batched_whisper=True):
         # Tự động tính số workers tối ưu
         if max_workers is None:
             cpu_count = psutil.cpu_count()
@@ -53,6 +55,8 @@ class AdvancedBatchProcessor:
         self.max_workers = max_workers
         self.memory_limit_gb = memory_limit_gb
         self.priority_mode = priority_mode
+        # Gộp cửa sổ audio của các worker thành batch Whisper chung (chỉ có ích khi nhiều worker)
+        self.whisper_server = get_whisper_batch_server() if batched_whisper and HAS_WHISPER and max_workers > 1 else None
         
         # Task management
         self.task_queue = queue.PriorityQueue() if priority_mode else queue.Queue()
@@ -86,6 +90,7 @@ class AdvancedBatchProcessor:
         print(f"   🧵 Max workers: {self.max_workers}")
         print(f"   💾 Memory limit: {self.memory_limit_gb}GB")
         print(f"   📊 Priority mode: {self.priority_mode}")
+        print(f"   🤖 Whisper batch chung: {'Bật' if self.whisper_server else 'Tắt'}")
         
     def add_video_task(self, input_path: str, output_path: str, config: Dict = None, priority: int = 0):
         """Thêm video task với priority"""
@@ -196,8 +201,12 @@ class AdvancedBatchProcessor:
             if not resources['can_process']:
                 raise Exception(f"Tài nguyên hệ thống không đủ: RAM {resources['memory_usage_gb']:.1f}GB, CPU {resources['cpu_percent']:.1f}%")
             
-            # Create editor instance
+            # Create editor instance (Whisper model lấy từ pool dùng chung, không load lại)
             editor = AutoVideoEditor()
+            editor.subtitle_generator.batch_server = self.whisper_server
+            if self.max_workers > 1:
+                # Các task đã chạy song song: không mở thêm process transcribe cho từng video
+                editor.subtitle_generator.stt_workers = 1
             
             # Process video
             editor.process_video(
@@ -208,7 +217,8 @@ class AdvancedBatchProcessor:
                 img_folder=task.config.get('img_folder'),
                 overlay_times=task.config.get('overlay_times'),
                 video_overlay_settings=task.config.get('video_overlay_settings'),
-                custom_timeline=task.config.get('custom_timeline', False)
+                custom_timeline=task.config.get('custom_timeline', False),
+                whisper_profile=task.config.get('whisper_profile', QUALITY_PROFILE)
             )
             
             duration = time.time() - task_start
@@ -301,6 +311,9 @@ class AdvancedBatchProcessor:
         print(f"   📊 Tổng video: {self.stats['total']}")
         print(f"   💾 Tổng dung lượng: {self.stats['total_file_size'] / 1024**3:.2f}GB")
         
+        # Load trước model mà profile quality (mặc định của batch) sẽ chọn, mọi task dùng chung qua pool
+        preload_profile_model(QUALITY_PROFILE)
+        
         # Create ThreadPoolExecutor
         self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         
@@ -358,6 +371,8 @@ class AdvancedBatchProcessor:
         
         # Final cleanup
         self.executor.shutdown(wait=True)
+        if self.whisper_server:
+            self.whisper_server.stop()
         self.stats['end_time'] = datetime.now()
         self.is_processing = False
         
@@ -11,6 +11,7 @@ import time
 from datetime import datetime
 import json
 from main import AutoVideoEditor
+from whisper_policy import QUALITY_PROFILE, preload_profile_model
 
 class BatchProcessor:
     """Xử lý hàng loạt video với multi-threading"""
@@ -67,6 +68,9 @@ class BatchProcessor:
     def worker_thread(self, worker_id):
         """Worker thread xử lý video"""
         editor = AutoVideoEditor()
+        if self.max_workers > 1:
+            # Các worker đã chạy song song: không mở thêm process transcribe cho từng video
+            editor.subtitle_generator.stt_workers = 1
         
         while self.is_processing:
             try:
@@ -86,7 +90,8 @@ class BatchProcessor:
                         img_folder=task['config'].get('img_folder'),
                         overlay_times=task['config'].get('overlay_times'),
                         video_overlay_settings=task['config'].get('video_overlay_settings'),
-                        custom_timeline=task['config'].get('custom_timeline', False)
+                        custom_timeline=task['config'].get('custom_timeline', False),
+                        whisper_profile=task['config'].get('whisper_profile', QUALITY_PROFILE)
                     )
                     
                     end_time = time.time()
@@ -141,6 +146,9 @@ class BatchProcessor:
         print(f"🚀 Bắt đầu batch processing với {self.max_workers} workers")
         print(f"📊 Tổng số video: {self.stats['total']}")
         
+        # Load trước model mà profile quality (mặc định của batch) sẽ chọn, các worker dùng chung
+        preload_profile_model(QUALITY_PROFILE)
+        
         # Tạo worker threads
         for i in range(self.max_workers):
             worker = threading.Thread(target=self.worker_thread, args=(i+1,))
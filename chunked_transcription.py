@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module transcribe audio dài song song trên nhiều process
+Cắt PCM tại điểm im lặng (có chồng lấn nhỏ), mỗi process transcribe một đoạn,
+sau đó ghép segment theo thứ tự và loại phần trùng ở vùng chồng lấn.
+Các hàm iter_* sinh segment theo từng đoạn để bước dịch bắt đầu sớm (streaming).
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from audio_source import PCMAudio
+from voice_activity import frame_energy_db, FRAME_SECONDS
+
+# Chỉ chia đoạn khi audio dài hơn mức này (giây)
+CHUNKED_MIN_SECONDS = 600
+
+# Độ dài mục tiêu mỗi đoạn, khoảng tìm điểm im lặng quanh mỗi mốc cắt và độ chồng lấn
+CHUNK_SECONDS = 180
+SEARCH_SECONDS = 15
+OVERLAP_SECONDS = 2.0
+
+# Độ dài cửa sổ khi transcribe tuần tự trong một process để streaming (giây)
+STREAM_WINDOW_SECONDS = 60
+
+# Số ký tự cuối của cửa sổ trước dùng làm prompt cho cửa sổ sau (giữ ngữ cảnh như transcribe())
+PROMPT_CHARS = 200
+
+# Số process transcribe (có thể đổi bằng biến môi trường EDITVIDEO_STT_WORKERS)
+DEFAULT_WORKERS = int(os.environ.get(
+    "EDITVIDEO_STT_WORKERS", max(1, min(4, (os.cpu_count() or 1) // 2))
+))
+
+
+@dataclass(frozen=True)
+class AudioChunk:
+    """
+    Một đoạn audio cần transcribe
+
+    Process transcribe [start, end); chỉ giữ segment có tâm nằm trong [own_start, own_end).
+    """
+    index: int
+    start: float
+    end: float
+    own_start: float
+    own_end: float
+
+
+def plan_chunks(audio: PCMAudio, chunk_seconds=CHUNK_SECONDS, search_seconds=SEARCH_SECONDS,
+                overlap_seconds=OVERLAP_SECONDS) -> List[AudioChunk]:
+    """
+    Chia audio thành các đoạn, mỗi mốc cắt đặt tại frame năng lượng thấp nhất quanh mốc mục tiêu
+
+    Returns:
+        list[AudioChunk]: Các đoạn theo thứ tự thời gian
+    """
+    duration = audio.duration
+    if duration <= chunk_seconds:
+        return [AudioChunk(0, 0.0, duration, 0.0, duration)]
+
+    energy = frame_energy_db(audio)
+    cuts = [0.0]
+    target = chunk_seconds
+    while target < duration - search_seconds:
+        first = max(int((target - search_seconds) / FRAME_SECONDS), 0)
+        last = min(int((target + search_seconds) / FRAME_SECONDS), len(energy))
+        quietest = first + int(np.argmin(energy[first:last]))
+        cut = quietest * FRAME_SECONDS + FRAME_SECONDS / 2
+        cuts.append(cut)
+        target = cut + chunk_seconds
+    cuts.append(duration)
+
+    chunks = []
+    for index, (own_start, own_end) in enumerate(zip(cuts, cuts[1:])):
+        chunks.append(AudioChunk(
+            index=index,
+            start=max(0.0, own_start - overlap_seconds),
+            end=min(duration, own_end + overlap_seconds),
+            own_start=own_start,
+            own_end=own_end
+        ))
+    return chunks
+
+
+def owned_segments(chunk: AudioChunk, segments, last=False) -> List[dict]:
+    """Segment (đã theo thời gian gốc) thuộc về đoạn này: tâm nằm trong [own_start, own_end)"""
+    owned = []
+    for segment in sorted(segments, key=lambda s: (s['start'], s['end'])):
+        middle = (segment['start'] + segment['end']) / 2
+        if chunk.own_start <= middle and (middle < chunk.own_end or last):
+            owned.append(segment)
+    return owned
+
+
+def merge_chunk_segments(chunks: List[AudioChunk], chunk_segments) -> List[dict]:
+    """
+    Ghép segment của các đoạn theo thứ tự đoạn, bỏ bản trùng ở vùng chồng lấn
+
+    Args:
+        chunks (list[AudioChunk]): Các đoạn (cùng thứ tự với chunk_segments)
+        chunk_segments (list[list[dict]]): Segment của từng đoạn, đã theo thời gian gốc
+    """
+    merged = []
+    for chunk, segments in zip(chunks, chunk_segments):
+        merged.extend(owned_segments(chunk, segments, last=chunk.index == len(chunks) - 1))
+    for segment_id, segment in enumerate(merged):
+        segment['id'] = segment_id
+    return merged
+
+
+def _init_worker(model_name, torch_threads):
+    """Khởi tạo process: giới hạn số luồng torch rồi load model một lần"""
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from whisper_pool import get_whisper_pool
+    get_whisper_pool().preload(model_name)
+
+
+def _transcribe_chunk(model_name, samples, sample_rate, offset, transcribe_options):
+    """Transcribe một đoạn (trong process con hoặc process hiện tại), trả về segment theo thời gian gốc"""
+    from whisper_pool import get_whisper_pool
+    audio = PCMAudio(samples, sample_rate)
+    with get_whisper_pool().acquire(model_name) as model:
+        result = model.transcribe(audio.to_float32(), **transcribe_options)
+
+    segments = []
+    for segment in result.get('segments', []):
+        segment = dict(segment)
+        segment['start'] += offset
+        segment['end'] += offset
+        if segment.get('words'):
+            segment['words'] = [
+                {**word, 'start': word['start'] + offset, 'end': word['end'] + offset}
+                for word in segment['words']
+            ]
+        segments.append(segment)
+    return segments
+
+
+def iter_transcribe_windows(audio: PCMAudio, model_name, window_seconds=STREAM_WINDOW_SECONDS,
+                            **transcribe_options):
+    """
+    Transcribe tuần tự từng cửa sổ trong process hiện tại, sinh segment của mỗi cửa sổ ngay khi xong
+
+    Cửa sổ cắt tại điểm im lặng, chồng lấn và chia segment theo tâm như plan_chunks;
+    văn bản cuối cửa sổ trước làm initial_prompt cho cửa sổ sau (trừ khi
+    condition_on_previous_text=False) để giữ ngữ cảnh giống transcribe() cả audio.
+
+    Yields:
+        list[dict]: Segment (thời gian theo audio đầu vào) của một cửa sổ
+    """
+    chunks = plan_chunks(audio, chunk_seconds=window_seconds)
+    condition = transcribe_options.get('condition_on_previous_text', True)
+    previous_text = transcribe_options.pop('initial_prompt', None) or ''
+    for chunk in chunks:
+        options = dict(transcribe_options)
+        if previous_text:
+            options['initial_prompt'] = previous_text[-PROMPT_CHARS:]
+        segments = owned_segments(chunk, _transcribe_chunk(
+            model_name, audio.slice(chunk.start, chunk.end).samples, audio.sample_rate,
+            chunk.start, options
+        ), last=chunk.index == len(chunks) - 1)
+        if condition:
+            previous_text = ''.join(segment['text'] for segment in segments) or previous_text
+        yield segments
+
+
+def iter_transcribe_chunked(audio: PCMAudio, model_name, workers=DEFAULT_WORKERS,
+                            chunk_seconds=CHUNK_SECONDS, **transcribe_options):
+    """
+    Transcribe audio dài bằng nhiều process, sinh ra segment của từng đoạn theo thứ tự
+
+    Đoạn k được trả ngay khi đoạn 0..k đã xong (không chờ toàn bộ audio),
+    segment đã bỏ phần trùng ở vùng chồng lấn.
+
+    Yields:
+        list[dict]: Segment (thời gian theo audio đầu vào) của một đoạn
+    """
+    chunks = plan_chunks(audio, chunk_seconds=chunk_seconds)
+    workers = max(1, min(workers, len(chunks)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"🧩 Transcribe {len(chunks)} đoạn trên {workers} process...")
+
+    # spawn thay vì fork: process gọi có thể đang chạy luồng khác (dịch streaming, worker batch)
+    # đang giữ lock, fork giữa chừng có thể làm process con bị treo
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_name, torch_threads),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [
+            executor.submit(
+                _transcribe_chunk, model_name,
+                audio.slice(chunk.start, chunk.end).samples, audio.sample_rate,
+                chunk.start, transcribe_options
+            )
+            for chunk in chunks
+        ]
+        # Lấy kết quả theo thứ tự đoạn (không theo thứ tự hoàn thành) để output xác định
+        for chunk, future in zip(chunks, futures):
+            yield owned_segments(chunk, future.result(), last=chunk.index == len(chunks) - 1)
+
+
+def transcribe_chunked(audio: PCMAudio, model_name, workers=DEFAULT_WORKERS, **transcribe_options):
+    """
+    Transcribe audio dài bằng nhiều process
+
+    Args:
+        audio (PCMAudio): Audio 16 kHz mono
+        model_name (str): Tên Whisper model
+        workers (int): Số process
+        transcribe_options: Tham số truyền cho model.transcribe (language, ...)
+
+    Returns:
+        dict: Kết quả dạng Whisper {'text', 'segments', 'language'}
+    """
+    segments = []
+    for chunk_segments in iter_transcribe_chunked(audio, model_name, workers, **transcribe_options):
+        segments.extend(chunk_segments)
+    for segment_id, segment in enumerate(segments):
+        segment['id'] = segment_id
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': transcribe_options.get('language')
+    }
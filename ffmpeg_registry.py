@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module quản lý FFmpeg/FFprobe dùng chung cho toàn bộ ứng dụng
+Tìm binary một lần duy nhất và cache danh sách encoder/filter mà bản build hỗ trợ.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+# Các đường dẫn phổ biến trên Windows
+COMMON_FFMPEG_DIRS = [
+    r"C:\ffmpeg\bin",
+    r"C:\Program Files\ffmpeg\bin",
+    r"C:\Program Files (x86)\ffmpeg\bin",
+    os.path.join(os.getcwd(), "ffmpeg", "bin"),
+    os.getcwd()
+]
+
+# Cột cờ đầu dòng trong output của 'ffmpeg -encoders' / 'ffmpeg -filters'
+_CAPABILITY_FLAGS = re.compile(r"[A-Z.|]{2,6}")
+
+
+def _find_binary(name, sibling_of=None):
+    """Tìm binary: cùng thư mục với sibling_of → PATH → các thư mục phổ biến"""
+    candidates = [name, f"{name}.exe"]
+
+    if sibling_of and os.path.dirname(sibling_of):
+        for candidate in candidates:
+            path = os.path.join(os.path.dirname(sibling_of), candidate)
+            if os.path.exists(path):
+                return path
+
+    found = shutil.which(name)
+    if found:
+        return found
+
+    for directory in COMMON_FFMPEG_DIRS:
+        for candidate in candidates:
+            path = os.path.join(directory, candidate)
+            if os.path.exists(path):
+                return path
+
+    return None
+
+
+def _parse_capability_list(output):
+    """Lấy tên encoder/filter từ output dạng ' V....D libx264  ...'"""
+    names = set()
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and _CAPABILITY_FLAGS.fullmatch(parts[0]) and parts[1] != '=':
+            names.add(parts[1])
+    return frozenset(names)
+
+
+class FFmpegRegistry:
+    """Đường dẫn FFmpeg/FFprobe và khả năng của bản build, chỉ xác định một lần mỗi process"""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ffmpeg_path = None
+        self._ffprobe_path = None
+        self._version = None
+        self._encoders = None
+        self._filters = None
+
+    @classmethod
+    def get(cls):
+        """Registry dùng chung (singleton)"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @property
+    def ffmpeg_path(self):
+        """Đường dẫn FFmpeg (FileNotFoundError nếu không tìm thấy)"""
+        with self._lock:
+            if self._ffmpeg_path is None:
+                path = _find_binary('ffmpeg')
+                if not path:
+                    raise FileNotFoundError(
+                        "FFmpeg không được tìm thấy. Vui lòng cài đặt FFmpeg và thêm vào PATH"
+                    )
+                self._ffmpeg_path = path
+            return self._ffmpeg_path
+
+    @property
+    def ffprobe_path(self):
+        """Đường dẫn FFprobe (ưu tiên cùng thư mục với FFmpeg)"""
+        if self._ffprobe_path is None:
+            try:
+                ffmpeg_path = self.ffmpeg_path
+            except FileNotFoundError:
+                ffmpeg_path = None
+            self._ffprobe_path = _find_binary('ffprobe', sibling_of=ffmpeg_path) or 'ffprobe'
+        return self._ffprobe_path
+
+    @property
+    def version(self):
+        """Dòng phiên bản FFmpeg (vd: 'ffmpeg version 6.1 ...')"""
+        if self._version is None:
+            output = self._run_ffmpeg('-version')
+            self._version = output.splitlines()[0] if output else ''
+        return self._version
+
+    @property
+    def encoders(self):
+        """Tập tên encoder bản build hỗ trợ"""
+        if self._encoders is None:
+            self._encoders = _parse_capability_list(self._run_ffmpeg('-encoders'))
+        return self._encoders
+
+    @property
+    def filters(self):
+        """Tập tên filter bản build hỗ trợ"""
+        if self._filters is None:
+            self._filters = _parse_capability_list(self._run_ffmpeg('-filters'))
+        return self._filters
+
+    def has_encoder(self, name):
+        return name in self.encoders
+
+    def has_filter(self, name):
+        # Không đọc được danh sách filter thì coi như có (để FFmpeg tự báo lỗi)
+        return not self.filters or name in self.filters
+
+    def supports_subtitles(self):
+        """Bản build có libass (filter subtitles) không"""
+        return self.has_filter('subtitles')
+
+    def pick_filter(self, *names):
+        """Chọn filter đầu tiên được hỗ trợ trong danh sách (vd: chromakey → colorkey)"""
+        for name in names:
+            if self.has_filter(name):
+                return name
+        return names[0]
+
+    def missing_filters(self, names):
+        """Các filter trong names mà bản build không có"""
+        return sorted(name for name in set(names) if not self.has_filter(name))
+
+    def _run_ffmpeg(self, *args):
+        try:
+            result = subprocess.run([self.ffmpeg_path, '-hide_banner', *args],
+                                    capture_output=True, text=True)
+            return result.stdout if result.returncode == 0 else ''
+        except OSError as e:
+            print(f"⚠️ Không thể truy vấn FFmpeg {' '.join(args)}: {e}")
+            return ''
+
+
+def get_ffmpeg_registry():
+    """Lấy FFmpegRegistry dùng chung"""
+    return FFmpegRegistry.get()
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module dựng filter graph cho FFmpeg (-filter_complex)
+Thay cho việc nối chuỗi filter_parts bằng f-string: graph gồm các node (filterchain),
+pad/label được cấp tự động, có các bước tối ưu trước khi serialize.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+# Các filter tốn CPU theo từng pixel - nên scale nhỏ trước khi chạy
+EXPENSIVE_FILTERS = {'chromakey', 'colorkey', 'subtitles', 'ass', 'fade'}
+
+
+def _split_outside(text: str, separator: str) -> List[str]:
+    """Tách chuỗi theo separator, bỏ qua phần trong dấu nháy, ngoặc tròn và ký tự escape"""
+    parts = []
+    current = []
+    quote = None
+    depth = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\' and i + 1 < len(text):
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == separator and depth == 0:
+            parts.append(''.join(current))
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    parts.append(''.join(current))
+    return parts
+
+
+def _format_number(value: float) -> str:
+    """Định dạng số gọn cho tham số filter (0.15 thay vì 0.15000000000000002)"""
+    return f"{round(value, 6):g}"
+
+
+@dataclass
+class Filter:
+    """Một filter FFmpeg: tên + danh sách tham số (vị trí hoặc key=value)"""
+    name: str
+    args: List[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, text: Union[str, 'Filter']) -> 'Filter':
+        """Tạo Filter từ chuỗi dạng 'scale=iw*0.1:ih*0.1'"""
+        if isinstance(text, Filter):
+            return text
+        name, _, arg_text = text.strip().partition('=')
+        args = _split_outside(arg_text, ':') if arg_text else []
+        return cls(name=name, args=args)
+
+    def option(self, key: str) -> Optional[str]:
+        """Lấy giá trị tham số dạng key=value"""
+        for arg in self.args:
+            k, sep, v = arg.partition('=')
+            if sep and k == key:
+                return v
+        return None
+
+    def positional(self) -> List[str]:
+        """Các tham số không có key"""
+        return [arg for arg in self.args if not re.match(r'^[a-z_]+=', arg)]
+
+    def __str__(self):
+        if not self.args:
+            return self.name
+        return f"{self.name}={':'.join(self.args)}"
+
+
+def parse_filter_chain(text: str) -> List[Filter]:
+    """Tách chuỗi 'a=1,b=2' thành danh sách Filter"""
+    return [Filter.parse(part) for part in _split_outside(text, ',') if part.strip()]
+
+
+@dataclass
+class FilterStep:
+    """Một filter trong chain, kèm các label input gắn trực tiếp trước filter"""
+    filter: Filter
+    labels: List[str] = field(default_factory=list)
+
+    def __str__(self):
+        return ''.join(f"[{label}]" for label in self.labels) + str(self.filter)
+
+
+@dataclass
+class FilterNode:
+    """Một filterchain: các filter nối bằng dấu phẩy, một output label"""
+    steps: List[FilterStep]
+    output: str
+
+    @property
+    def inputs(self) -> List[str]:
+        labels = []
+        for step in self.steps:
+            labels.extend(step.labels)
+        return labels
+
+    def __str__(self):
+        return ','.join(str(step) for step in self.steps) + f"[{self.output}]"
+
+
+class FilterGraph:
+    """Filter graph có input, node và label được quản lý tự động"""
+
+    def __init__(self, main_input_path: Optional[str] = None):
+        self.input_paths: List[str] = []
+        self.input_options: List[List[str]] = []
+        self.nodes: List[FilterNode] = []
+        self.output: Optional[str] = None
+        self._label_count = 0
+        if main_input_path is not None:
+            self.add_input(main_input_path)
+
+    def add_input(self, path: str, options: Optional[List[str]] = None) -> str:
+        """
+        Thêm file input (-i), trả về pad video của input đó (vd: '1:v')
+
+        Args:
+            path (str): Đường dẫn file
+            options (list): Tham số đặt trước -i của input này (vd: ['-t', '5', '-itsoffset', '10'])
+        """
+        self.input_paths.append(path)
+        self.input_options.append(list(options or []))
+        return f"{len(self.input_paths) - 1}:v"
+
+    def new_label(self, prefix: str = "v") -> str:
+        """Cấp label duy nhất"""
+        self._label_count += 1
+        return f"{prefix}{self._label_count}"
+
+    def chain(self, source: str, *filters: Union[str, Filter], prefix: str = "v") -> str:
+        """
+        Nối một chuỗi filter vào pad source
+
+        Args:
+            source (str): Label đầu vào
+            filters: Filter hoặc chuỗi filter (có thể chứa nhiều filter nối bằng dấu phẩy)
+            prefix (str): Tiền tố cho label đầu ra
+
+        Returns:
+            str: Label đầu ra
+        """
+        parsed = []
+        for item in filters:
+            if isinstance(item, Filter):
+                parsed.append(item)
+            else:
+                parsed.extend(parse_filter_chain(item))
+        if not parsed:
+            return source
+
+        steps = [FilterStep(parsed[0], [source])] + [FilterStep(f) for f in parsed[1:]]
+        return self._add_node(steps, prefix)
+
+    def source(self, *filters: Union[str, Filter], prefix: str = "src") -> str:
+        """Tạo nhánh bắt đầu bằng filter nguồn không có input (vd: color=...), trả về label đầu ra"""
+        parsed = []
+        for item in filters:
+            parsed.extend([item] if isinstance(item, Filter) else parse_filter_chain(item))
+        return self._add_node([FilterStep(f) for f in parsed], prefix)
+
+    def concat(self, labels: List[str], prefix: str = "cat") -> str:
+        """Nối các pad video theo thứ tự thời gian (concat, chỉ video)"""
+        concat_filter = Filter('concat', [f"n={len(labels)}", "v=1", "a=0"])
+        return self._add_node([FilterStep(concat_filter, list(labels))], prefix)
+
+    def overlay(self, main: str, top: str, x: str, y: str,
+                enable: Optional[str] = None, eof_action: Optional[str] = None,
+                prefix: str = "ov") -> str:
+        """Overlay pad top lên pad main, trả về label đầu ra"""
+        args = [x, y]
+        if eof_action:
+            args.append(f"eof_action={eof_action}")
+        if enable:
+            args.append(f"enable='{enable}'")
+        return self._add_node([FilterStep(Filter('overlay', args), [main, top])], prefix)
+
+    def _add_node(self, steps: List[FilterStep], prefix: str) -> str:
+        output = self.new_label(prefix)
+        self.nodes.append(FilterNode(steps=steps, output=output))
+        self.output = output
+        return output
+
+    def optimize(self, passes=None) -> 'FilterGraph':
+        """Chạy các bước tối ưu trên graph (mặc định: DEFAULT_PASSES)"""
+        for optimization_pass in (DEFAULT_PASSES if passes is None else passes):
+            optimization_pass(self)
+        return self
+
+    def to_string(self) -> str:
+        """Serialize graph thành chuỗi cho -filter_complex"""
+        return ';'.join(str(node) for node in self.nodes)
+
+    def __str__(self):
+        return self.to_string()
+
+    def filter_names(self) -> List[str]:
+        """Tên các filter được dùng trong graph"""
+        return sorted({step.filter.name for node in self.nodes for step in node.steps})
+
+    def input_args(self) -> List[str]:
+        args = []
+        for path, options in zip(self.input_paths, self.input_options):
+            args.extend(options)
+            args.extend(['-i', path])
+        return args
+
+    def build_command(self, ffmpeg_path: str, output_path: str, optimize: bool = True) -> List[str]:
+        """Tạo lệnh ffmpeg hoàn chỉnh (map output của graph + audio của input 0)"""
+        if optimize:
+            self.optimize()
+        return [
+            ffmpeg_path,
+            *self.input_args(),
+            '-filter_complex', self.to_string(),
+            '-map', f'[{self.output}]',
+            '-map', '0:a?',
+            '-c:a', 'copy',
+            '-y',
+            output_path
+        ]
+
+    # --- Tiện ích cho các bước tối ưu ---
+
+    def consumers(self, label: str) -> List[FilterNode]:
+        return [node for node in self.nodes if label in node.inputs]
+
+    def rename_label(self, old: str, new: str):
+        """Thay mọi tham chiếu tới label old bằng new"""
+        for node in self.nodes:
+            for step in node.steps:
+                step.labels = [new if label == old else label for label in step.labels]
+        if self.output == old:
+            self.output = new
+
+    def prune_unused(self):
+        """Xóa các node có output không được dùng tới"""
+        changed = True
+        while changed:
+            changed = False
+            for node in list(self.nodes):
+                if node.output != self.output and not self.consumers(node.output):
+                    self.nodes.remove(node)
+                    changed = True
+
+        # Bỏ file input không còn được dùng và đánh lại số thứ tự (input 0 luôn giữ)
+        used = {0}
+        for node in self.nodes:
+            for label in node.inputs:
+                match = re.fullmatch(r"(\d+):v", label)
+                if match:
+                    used.add(int(match.group(1)))
+        kept = [i for i in range(len(self.input_paths)) if i in used]
+        for new_index, old_index in enumerate(kept):
+            if new_index != old_index:
+                self.rename_label(f"{old_index}:v", f"{new_index}:v")
+        self.input_paths = [self.input_paths[i] for i in kept]
+        self.input_options = [self.input_options[i] for i in kept]
+
+
+# --- Các bước tối ưu ---
+
+def _parse_scale_factors(flt: Filter):
+    """
+    Phân tích scale dạng tương đối (iw*f, ih*f, -1) thành (hệ số rộng, hệ số cao)
+    None cho chiều tự động (-1/-2). Trả về None nếu không phải scale tương đối đơn giản.
+    """
+    if flt.name != 'scale' or len(flt.args) != 2 or any('=' in arg for arg in flt.args):
+        return None
+
+    factors = []
+    for arg, base in zip(flt.args, ('iw', 'ih')):
+        arg = arg.strip()
+        if arg in ('-1', '-2'):
+            factors.append(None)
+            continue
+        if arg == base:
+            factors.append(1.0)
+            continue
+        match = re.fullmatch(rf"{base}\*([0-9]*\.?[0-9]+)", arg)
+        if not match:
+            return None
+        factors.append(float(match.group(1)))
+
+    if factors[0] is None and factors[1] is None:
+        return None
+    return tuple(factors)
+
+
+def _uniform(factors):
+    """Trả về hệ số chung nếu scale giữ nguyên tỉ lệ khung hình"""
+    w, h = factors
+    if w is None:
+        return h
+    if h is None:
+        return w
+    return w if abs(w - h) < 1e-9 else None
+
+
+def _rounds_to_even(flt: Filter) -> bool:
+    """Scale có chiều -2 (tự động, làm tròn về số chẵn): không quy được về hệ số"""
+    return flt.name == 'scale' and any(arg.strip() == '-2' for arg in flt.args)
+
+
+def _is_absolute_scale(flt: Filter) -> bool:
+    return (flt.name == 'scale' and len(flt.args) == 2
+            and all(re.fullmatch(r"\d+", arg.strip()) for arg in flt.args))
+
+
+def _merge_scale_pair(first: Filter, second: Filter) -> Optional[Filter]:
+    """Gộp hai filter scale liên tiếp thành một (None nếu không gộp được)"""
+    if first.name != 'scale' or second.name != 'scale':
+        return None
+
+    # Scale tuyệt đối phía sau ghi đè hoàn toàn scale phía trước
+    if _is_absolute_scale(second) and (_parse_scale_factors(first) or _is_absolute_scale(first)):
+        return second
+
+    # -2 làm tròn kích thước về số chẵn, gộp thành hệ số sẽ mất bước làm tròn này
+    if _rounds_to_even(first) or _rounds_to_even(second):
+        return None
+
+    a = _parse_scale_factors(first)
+    b = _parse_scale_factors(second)
+    if not a or not b:
+        return None
+
+    a_uniform = _uniform(a)
+    b_uniform = _uniform(b)
+    if None in a:
+        if a_uniform is None:
+            return None
+        a = (a_uniform, a_uniform)
+    if None in b:
+        # Chiều tự động của b chỉ đúng khi a giữ nguyên tỉ lệ
+        if _uniform(a) is None:
+            return None
+        factor = a[0] * b_uniform
+        args = ['-1' if b[0] is None else f"iw*{_format_number(factor)}",
+                '-1' if b[1] is None else f"ih*{_format_number(factor)}"]
+        return Filter('scale', args)
+
+    return Filter('scale', [f"iw*{_format_number(a[0] * b[0])}", f"ih*{_format_number(a[1] * b[1])}"])
+
+
+def merge_scales(graph: FilterGraph):
+    """Gộp các filter scale liên tiếp trong cùng một chain"""
+    for node in graph.nodes:
+        i = 0
+        while i < len(node.steps) - 1:
+            current, following = node.steps[i], node.steps[i + 1]
+            merged = None if following.labels else _merge_scale_pair(current.filter, following.filter)
+            if merged is not None:
+                current.filter = merged
+                del node.steps[i + 1]
+            else:
+                i += 1
+
+
+def _is_noop(flt: Filter) -> bool:
+    if flt.name == 'scale':
+        if _rounds_to_even(flt):
+            return False
+        factors = _parse_scale_factors(flt)
+        return bool(factors) and _uniform(factors) == 1.0
+    if flt.name == 'pad':
+        positional = flt.positional()
+        return (not flt.option('color') and positional[:2] == ['iw', 'ih']
+                and all(arg in ('0', 'black') for arg in positional[2:]))
+    return False
+
+
+def _overlay_never_enabled(flt: Filter) -> bool:
+    """between(t,a,b) tính cả hai đầu: chỉ chắc chắn tắt khi b < a (b == a vẫn có thể hiện một frame)"""
+    enable = flt.option('enable')
+    if flt.name != 'overlay' or not enable:
+        return False
+    match = re.fullmatch(r"'?between\(t,([-0-9.]+),([-0-9.]+)\)'?", enable)
+    return bool(match) and float(match.group(2)) < float(match.group(1))
+
+
+def drop_noops(graph: FilterGraph):
+    """Bỏ scale/pad không làm thay đổi khung hình và overlay không bao giờ hiển thị"""
+    for node in list(graph.nodes):
+        i = 0
+        while i < len(node.steps) and len(node.steps) > 1:
+            step = node.steps[i]
+            if not _is_noop(step.filter) or len(step.labels) > 1:
+                i += 1
+                continue
+            if step.labels and i + 1 < len(node.steps):
+                # Label input chuyển sang filter kế tiếp (sau các label sẵn có của nó)
+                following = node.steps[i + 1]
+                following.labels = following.labels + step.labels
+            del node.steps[i]
+
+        last = node.steps[-1]
+
+        # Overlay không bao giờ bật: cả node thay bằng pad main
+        if _overlay_never_enabled(last.filter) and last.labels:
+            graph.nodes.remove(node)
+            graph.rename_label(node.output, last.labels[0])
+            continue
+
+        # Node passthrough (chỉ còn một no-op): nối thẳng input với consumer
+        if len(node.steps) == 1 and _is_noop(last.filter) and len(last.labels) == 1:
+            graph.nodes.remove(node)
+            graph.rename_label(node.output, last.labels[0])
+
+    graph.prune_unused()
+
+
+def hoist_downscales(graph: FilterGraph):
+    """Đưa scale thu nhỏ lên trước các filter tốn CPU (chromakey, subtitles, fade...)"""
+    for node in graph.nodes:
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(node.steps) - 1):
+                current, following = node.steps[i], node.steps[i + 1]
+                if following.labels or len(current.labels) > 1:
+                    continue
+                if current.filter.name not in EXPENSIVE_FILTERS:
+                    continue
+                factors = _parse_scale_factors(following.filter)
+                if not factors or any(f is not None and f > 1.0 for f in factors):
+                    continue
+                current.filter, following.filter = following.filter, current.filter
+                changed = True
+
+
+def collapse_chains(graph: FilterGraph):
+    """
+    Gộp node vào consumer duy nhất của nó để bỏ label trung gian.
+    Output của chain trước chỉ nối được vào input pad cuối của filter sau
+    (FFmpeg gắn label tường minh trước, pad nối từ chain sau cùng), nên nhánh
+    overlay (scale → chromakey) gộp được thẳng vào filter overlay.
+    """
+    changed = True
+    while changed:
+        changed = False
+        for producer in graph.nodes:
+            if producer.output == graph.output:
+                continue
+            consumers = graph.consumers(producer.output)
+            if len(consumers) != 1:
+                continue
+            consumer = consumers[0]
+            first = consumer.steps[0]
+            if consumer.inputs.count(producer.output) != 1 or not first.labels or first.labels[-1] != producer.output:
+                continue
+            first.labels = first.labels[:-1]
+            consumer.steps = producer.steps + consumer.steps
+            graph.nodes.remove(producer)
+            changed = True
+            break
+
+
+# Thứ tự mặc định: bỏ no-op → gộp chain → hoist → gộp scale
+DEFAULT_PASSES = [drop_noops, collapse_chains, hoist_downscales, merge_scales]
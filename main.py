@@ -16,6 +16,14 @@ from video_processor import VideoProcessor
 from subtitle_generator import SubtitleGenerator
 from translator import Translator
 from aspect_ratio_converter import AspectRatioConverter
+from render_planner import RenderPlanner
+from artifact_cache import ArtifactCache
+from audio_source import load_pcm_audio
+from subtitle_cues import read_srt, write_srt
+from subtitle_stream import STREAM_MIN_SECONDS, transcribe_and_translate
+from whisper_policy import PROFILE_BUDGET_RATIOS
+from audio_fingerprint import HAS_NUMPY, compute_fingerprint
+from transcript_store import get_transcript_store
 
 class AutoVideoEditor:
     def __init__(self):
@@ -23,8 +31,10 @@ class AutoVideoEditor:
         self.subtitle_generator = SubtitleGenerator()
         self.translator = Translator()
         self.aspect_converter = AspectRatioConverter()
+        self.render_planner = RenderPlanner(self.video_processor, self.aspect_converter)
+        self.artifact_cache = ArtifactCache()
         
-    def process_video(self, input_video_path, output_video_path, source_language='vi', target_language='en', img_folder=None, overlay_times=None, video_overlay_settings=None, custom_timeline=False, words_per_line=7):
+    def process_video(self, input_video_path, output_video_path, source_language='vi', target_language='en', img_folder=None, overlay_times=None, video_overlay_settings=None, custom_timeline=False, words_per_line=7, single_pass=True, use_cache=True, whisper_translate=None, streaming=True, whisper_profile=None, stt_latency_budget=None):
         """
         Xử lý video chính theo các bước:
         1. Trích xuất audio
@@ -35,6 +45,15 @@ class AutoVideoEditor:
         
         Args:
             custom_timeline (bool): Sử dụng timeline tùy chỉnh cho 3 ảnh (1.png, 2.png, 3.png)
+            single_pass (bool): Gộp bước 4 và 5 vào một lần encode (tự động quay về nhiều lượt nếu lỗi)
+            use_cache (bool): Dùng lại phụ đề/bản dịch đã cache của cùng nội dung video
+            whisper_translate (bool): Whisper dịch thẳng sang tiếng Anh, bỏ qua bước 3
+                (None = tự bật khi ngôn ngữ đích là 'en' và engine là Whisper)
+            streaming (bool): Với video dài, dịch từng cửa sổ segment ngay khi transcribe xong
+                (bước 2 và 3 chạy chồng lên nhau)
+            whisper_profile (str): 'speed' (GUI), 'balanced' hoặc 'quality' (batch chạy đêm)
+                để chọn model/cách decode Whisper (None = EDITVIDEO_WHISPER_PROFILE)
+            stt_latency_budget (float): Ngân sách thời gian tạo phụ đề (giây), ưu tiên hơn profile
         """
         print("🎬 Bắt đầu xử lý video...")
         
@@ -43,180 +62,409 @@ class AutoVideoEditor:
             temp_dir = tempfile.mkdtemp()
             print(f"📁 Thư mục tạm: {temp_dir}")
             
-            # Bước 1: Trích xuất audio từ video
-            print("🎵 Bước 1: Trích xuất audio từ video...")
-            audio_path = os.path.join(temp_dir, "extracted_audio.wav")
-            self.video_processor.extract_audio(input_video_path, audio_path)
+            if whisper_profile:
+                self.subtitle_generator.whisper_profile = whisper_profile
+            if stt_latency_budget is not None:
+                self.subtitle_generator.latency_budget = stt_latency_budget
             
-            # Bước 2: Tạo phụ đề từ audio
-            print("📝 Bước 2: Tạo phụ đề từ audio...")
+            cache = self.artifact_cache if use_cache else None
+            video_hash = cache.hash_file(input_video_path) if cache else None
+            
+            # Whisper task="translate" cho ra phụ đề tiếng Anh trực tiếp
+            if whisper_translate is None:
+                whisper_translate = target_language == 'en' and source_language != 'en'
+            whisper_translate = whisper_translate and target_language == 'en' and \
+                self.subtitle_generator.supports_translate_task()
+            subtitle_task = 'translate' if whisper_translate else 'transcribe'
+            
+            # Bước 1 + 2: Đọc audio 16 kHz mono và tạo phụ đề (bỏ qua cả hai nếu cache hit)
+            # Phụ đề đi giữa các bước dưới dạng CueList; chỉ ghi file cho cache và FFmpeg.
+            # Segment (trước khi chia dòng) để bước 3 dịch nguyên câu rồi mới chia dòng.
             original_subtitle_path = os.path.join(temp_dir, "original_subtitle.srt")
-            self.subtitle_generator.generate_subtitle(
-                audio_path, 
-                original_subtitle_path, 
+            segments_path = os.path.join(temp_dir, "original_segments.srt")
+            segments = None
+            translated_cues = None
+            transcript_params = dict(
                 language=source_language,
-                words_per_line=words_per_line
+                task=subtitle_task,
+                **self.subtitle_generator.get_engine_info()
             )
+            subtitle_key = cache.make_key(
+                'subtitle', video_hash,
+                words_per_line=words_per_line,
+                **transcript_params
+            ) if cache else None
+            segments_key = cache.make_key(
+                'segments', video_hash,
+                **transcript_params
+            ) if cache else None
+            if cache and cache.fetch(subtitle_key, original_subtitle_path):
+                print("♻️ Dùng lại phụ đề từ cache")
+                completed_task = subtitle_task
+                original_cues = read_srt(original_subtitle_path)
+                if cache.fetch(segments_key, segments_path):
+                    segments = read_srt(segments_path)
+            else:
+                print("🎵 Bước 1: Đọc audio từ video (PCM 16 kHz mono)...")
+                audio = load_pcm_audio(input_video_path)
+                
+                # Cùng voice-over dưới bản dựng khác (file khác, audio giống): dùng lại transcript
+                transcript_store = get_transcript_store() if cache and HAS_NUMPY else None
+                fingerprint = compute_fingerprint(audio) if transcript_store else None
+                reused_segments = transcript_store.find(fingerprint, transcript_params) \
+                    if transcript_store else None
+                
+                if reused_segments:
+                    print("📝 Bước 2: Dùng lại transcript của audio trùng")
+                    original_cues = self.subtitle_generator.segments_to_cues(reused_segments, words_per_line)
+                elif subtitle_task == 'transcribe' and streaming and audio.duration >= STREAM_MIN_SECONDS:
+                    print("📝 Bước 2+3: Tạo phụ đề và dịch song song (streaming)...")
+                    streamed = self._generate_and_translate_streaming(
+                        audio, cache, source_language, target_language, words_per_line, temp_dir
+                    )
+                    if streamed:
+                        original_cues, translated_cues = streamed
+                
+                if translated_cues is None and not reused_segments:
+                    if whisper_translate:
+                        print("📝 Bước 2: Tạo phụ đề tiếng Anh trực tiếp với Whisper (translate)...")
+                    else:
+                        print("📝 Bước 2: Tạo phụ đề từ audio...")
+                    original_cues = self.subtitle_generator.generate_subtitle(
+                        audio, 
+                        language=source_language,
+                        words_per_line=words_per_line,
+                        task=subtitle_task
+                    )
+                if reused_segments:
+                    completed_task = subtitle_task
+                    segments = reused_segments
+                    used_default_subtitle = False
+                else:
+                    completed_task = self.subtitle_generator.last_task
+                    segments = self.subtitle_generator.last_segments
+                    used_default_subtitle = self.subtitle_generator.used_default_subtitle
+                # Không cache phụ đề mặc định (có thể do lỗi tạm thời) hoặc kết quả
+                # của engine dự phòng không đúng task đã yêu cầu
+                if cache and not used_default_subtitle and completed_task == subtitle_task:
+                    if transcript_store and segments and not reused_segments:
+                        transcript_store.add(fingerprint, transcript_params, segments)
+                    write_srt(original_cues, original_subtitle_path)
+                    cache.store(subtitle_key, original_subtitle_path)
+                    if segments:
+                        write_srt(segments, segments_path)
+                        cache.store(segments_key, segments_path)
             
             # Bước 3: Dịch phụ đề sang ngôn ngữ đích
-            print(f"🌐 Bước 3: Dịch phụ đề từ {source_language} sang {target_language}...")
+            if translated_cues is not None:
+                print("🌐 Bước 3: Đã dịch xong cùng lúc với bước 2")
+            elif completed_task == 'translate':
+                print("🌐 Bước 3: Bỏ qua - phụ đề đã được Whisper dịch sang tiếng Anh")
+                translated_cues = original_cues
+            else:
+                print(f"🌐 Bước 3: Dịch phụ đề từ {source_language} sang {target_language}...")
+                if segments:
+                    translated_cues = self._translate_segments_cached(
+                        cache, segments, source_language, target_language, words_per_line, temp_dir
+                    )
+                else:
+                    translated_cues = self._translate_cues_cached(
+                        cache, original_cues, source_language, target_language, temp_dir
+                    )
+            
+            # Ghi phụ đề ra file một lần, tại ranh giới FFmpeg
             translated_subtitle_path = os.path.join(temp_dir, f"{target_language}_subtitle.srt")
-            self.translator.translate_subtitle(
-                original_subtitle_path,
-                translated_subtitle_path,
-                source_lang=source_language,
-                target_lang=target_language
+            write_srt(translated_cues, translated_subtitle_path)
+            
+            # Bước 4 + 5: Ghép phụ đề, overlay và chuyển đổi 9:16
+            rendered = False
+            if single_pass:
+                print("⚡ Bước 4+5: Render một lượt (overlay + phụ đề + 9:16)...")
+                try:
+                    self._render_single_pass(
+                        input_video_path,
+                        translated_subtitle_path,
+                        output_video_path,
+                        img_folder,
+                        overlay_times,
+                        video_overlay_settings,
+                        custom_timeline
+                    )
+                    rendered = True
+                except Exception as e:
+                    print(f"⚠️ Render một lượt thất bại: {e}, sử dụng phương pháp nhiều lượt...")
+            
+            if not rendered:
+                self._render_multi_pass(
+                    input_video_path,
+                    translated_subtitle_path,
+                    output_video_path,
+                    temp_dir,
+                    img_folder,
+                    overlay_times,
+                    video_overlay_settings,
+                    custom_timeline
+                )
+            
+            print(f"✅ Hoàn thành! Video đã được lưu tại: {output_video_path}")
+            
+            # Dọn dẹp thư mục tạm
+            import shutil
+            shutil.rmtree(temp_dir)
+            print("🧹 Đã dọn dẹp thư mục tạm")
+            
+        except Exception as e:
+            print(f"❌ Lỗi trong quá trình xử lý: {str(e)}")
+            raise
+    
+    def _translate_segments_cached(self, cache, segments, source_language, target_language,
+                                   words_per_line, temp_dir):
+        """
+        Dịch từng segment nguyên câu rồi mới chia dòng theo ngôn ngữ đích
+        
+        Ít request hơn so với dịch từng dòng 7 từ và không đưa nửa câu vào engine dịch.
+        
+        Returns:
+            CueList: Các dòng phụ đề đã dịch
+        """
+        translation_key = self._segment_translation_key(
+            cache, segments, source_language, target_language, words_per_line
+        )
+        cached = self._fetch_cached_cues(cache, translation_key, temp_dir)
+        if cached is not None:
+            return cached
+        
+        translated_segments, complete = self.translator.translate_segments_checked(
+            segments,
+            source_lang=source_language,
+            target_lang=target_language
+        )
+        translated_cues = self.subtitle_generator.segments_to_cues(translated_segments, words_per_line)
+        if complete:
+            self._store_cached_cues(cache, translation_key, translated_cues, temp_dir)
+        return translated_cues
+    
+    def _segment_translation_key(self, cache, segments, source_language, target_language, words_per_line):
+        """Cache key của bản dịch theo segment (None nếu không cache)"""
+        translator_info = self.translator.get_engine_info()
+        return cache.make_key(
+            'translation', segments.content_hash(),
+            source_lang=source_language,
+            target_lang=target_language,
+            words_per_line=words_per_line,
+            unit='segment',
+            **translator_info
+        ) if cache and translator_info else None
+    
+    def _generate_and_translate_streaming(self, audio, cache, source_language, target_language,
+                                          words_per_line, temp_dir):
+        """
+        Bước 2 + 3 chồng lên nhau: STT sinh segment theo từng cửa sổ, luồng dịch
+        nhận qua hàng đợi có giới hạn và dịch ngay (độ trễ mạng che bởi thời gian transcribe)
+        
+        Returns:
+            tuple[CueList, CueList] | None: (phụ đề gốc, phụ đề đã dịch) đã chia dòng;
+            None nếu không có tiếng nói hoặc lỗi (người gọi chạy lại theo từng bước)
+        """
+        generator = self.subtitle_generator
+        try:
+            segments, translated_segments, complete = transcribe_and_translate(
+                generator.iter_segments(audio, language=source_language),
+                lambda batch: self.translator.translate_segments_checked(
+                    batch,
+                    source_lang=source_language,
+                    target_lang=target_language
+                )
+            )
+        except Exception as e:
+            print(f"⚠️ Pipeline streaming lỗi: {e}, chạy lại theo từng bước...")
+            return None
+        if not segments:
+            return None
+        
+        original_cues = generator.segments_to_cues(segments, words_per_line)
+        translated_cues = generator.segments_to_cues(translated_segments, words_per_line)
+        if complete:
+            translation_key = self._segment_translation_key(
+                cache, segments, source_language, target_language, words_per_line
             )
+            self._store_cached_cues(cache, translation_key, translated_cues, temp_dir)
+        return original_cues, translated_cues
+    
+    def _translate_cues_cached(self, cache, cues, source_language, target_language, temp_dir):
+        """Dịch từng dòng phụ đề, dùng lại bản dịch đã cache nếu có"""
+        translator_info = self.translator.get_engine_info()
+        translation_key = cache.make_key(
+            'translation', cues.content_hash(),
+            source_lang=source_language,
+            target_lang=target_language,
+            **translator_info
+        ) if cache and translator_info else None
+        cached = self._fetch_cached_cues(cache, translation_key, temp_dir)
+        if cached is not None:
+            return cached
+        
+        translated_cues, complete = self.translator.translate_cues_checked(
+            cues,
+            source_lang=source_language,
+            target_lang=target_language
+        )
+        if complete:
+            self._store_cached_cues(cache, translation_key, translated_cues, temp_dir)
+        return translated_cues
+    
+    def _fetch_cached_cues(self, cache, key, temp_dir):
+        """Đọc CueList đã cache (None nếu không có)"""
+        cache_path = os.path.join(temp_dir, "cached_translation.srt")
+        if key and cache.fetch(key, cache_path):
+            print("♻️ Dùng lại bản dịch từ cache")
+            return read_srt(cache_path)
+        return None
+    
+    def _store_cached_cues(self, cache, key, cues, temp_dir):
+        """Lưu bản dịch vào cache (chỉ gọi khi mọi dòng đều dịch được, tránh cache văn bản gốc)"""
+        if not key:
+            return
+        cache_path = os.path.join(temp_dir, "cached_translation.srt")
+        write_srt(cues, cache_path)
+        cache.store(key, cache_path)
+    
+    def _render_single_pass(self, input_video_path, subtitle_path, output_video_path,
+                            img_folder=None, overlay_times=None, video_overlay_settings=None,
+                            custom_timeline=False):
+        """
+        Ghép video overlay, phụ đề, ảnh overlay và chuyển đổi 9:16 trong một lần encode
+        """
+        video_overlays = []
+        if video_overlay_settings and video_overlay_settings.get('enabled', False):
+            video_overlays = self._get_video_overlay_jobs(video_overlay_settings)
+        
+        plan = self.render_planner.plan(
+            input_video_path,
+            subtitle_path,
+            img_folder=img_folder,
+            overlay_times=overlay_times,
+            video_overlays=video_overlays,
+            custom_timeline=custom_timeline
+        )
+        self.render_planner.render(plan, output_video_path)
+    
+    def _render_multi_pass(self, input_video_path, translated_subtitle_path, output_video_path, temp_dir,
+                           img_folder=None, overlay_times=None, video_overlay_settings=None,
+                           custom_timeline=False):
+        """
+        Ghép phụ đề, overlay rồi chuyển đổi 9:16 theo từng bước (mỗi bước một lần encode)
+        """
+        print("🎞️ Bước 4: Ghép phụ đề và overlay vào video...")
+        video_with_subtitle_path = os.path.join(temp_dir, "video_with_subtitle.mp4")
+        
+        # Xử lý video overlay nếu có
+        if video_overlay_settings and video_overlay_settings.get('enabled', False):
+            print("🎬 Đang xử lý video overlay với chroma key...")
             
-            # Bước 4: Ghép phụ đề và overlay vào video
-            print("🎞️ Bước 4: Ghép phụ đề và overlay vào video...")
-            video_with_subtitle_path = os.path.join(temp_dir, "video_with_subtitle.mp4")
+            # DEBUG: In ra toàn bộ video_overlay_settings
+            print(f"DEBUG MAIN: video_overlay_settings={video_overlay_settings}")
             
-            # Xử lý video overlay nếu có
-            if video_overlay_settings and video_overlay_settings.get('enabled', False):
-                print("🎬 Đang xử lý video overlay với chroma key...")
+            try:
+                temp_video_overlay_path = os.path.join(temp_dir, "temp_with_video_overlay.mp4")
+                
+                # Kiểm tra nếu có multiple overlays
+                if 'multiple_overlays' in video_overlay_settings:
+                    # Xử lý multiple overlays
+                    overlays = video_overlay_settings['multiple_overlays']
+                    print(f"🎬 Xử lý {len(overlays)} video overlay...")
+                    self._process_multiple_video_overlays(
+                        input_video_path, 
+                        temp_video_overlay_path, 
+                        overlays, 
+                        temp_dir
+                    )
+                else:
+                    # Xử lý single overlay (từ GUI)
+                    from video_overlay import add_video_overlay_with_chroma
+                    overlay_kwargs = self._get_video_overlay_kwargs(video_overlay_settings)
+                    
+                    add_video_overlay_with_chroma(
+                        main_video_path=input_video_path,
+                        output_path=temp_video_overlay_path,
+                        **overlay_kwargs
+                    )
                 
-                # DEBUG: In ra toàn bộ video_overlay_settings
-                print(f"DEBUG MAIN: video_overlay_settings={video_overlay_settings}")
+                # Sau đó thêm phụ đề và image overlay lên video đã có video overlay
+                if img_folder and overlay_times and os.path.exists(img_folder):
+                    self.video_processor.add_subtitle_to_video(
+                        temp_video_overlay_path,
+                        translated_subtitle_path,
+                        video_with_subtitle_path,
+                        img_folder,
+                        overlay_times
+                    )
+                else:
+                    # Chỉ thêm phụ đề
+                    self.video_processor.add_subtitle_to_video(
+                        temp_video_overlay_path,
+                        translated_subtitle_path,
+                        video_with_subtitle_path
+                    )
                 
+            except Exception as e:
+                print(f"⚠️ Lỗi video overlay: {e}, sử dụng phương pháp cũ...")
+                # Fallback về phương pháp cũ
+                if img_folder and overlay_times and os.path.exists(img_folder):
+                    self.video_processor.add_subtitle_to_video(
+                        input_video_path,
+                        translated_subtitle_path,
+                        video_with_subtitle_path,
+                        img_folder,
+                        overlay_times
+                    )
+                else:
+                    self.video_processor.add_subtitle_to_video(
+                        input_video_path,
+                        translated_subtitle_path,
+                        video_with_subtitle_path
+                    )
+        
+        # Xử lý image overlay và phụ đề (nếu không có video overlay)
+        elif img_folder and os.path.exists(img_folder):
+            # Kiểm tra nếu sử dụng custom timeline
+            if custom_timeline:
+                print("🎯 Sử dụng custom timeline cho 3 ảnh...")
                 try:
-                    temp_video_overlay_path = os.path.join(temp_dir, "temp_with_video_overlay.mp4")
-                    
-                    # Kiểm tra nếu có multiple overlays
-                    if 'multiple_overlays' in video_overlay_settings:
-                        # Xử lý multiple overlays
-                        overlays = video_overlay_settings['multiple_overlays']
-                        print(f"🎬 Xử lý {len(overlays)} video overlay...")
-                        self._process_multiple_video_overlays(
-                            input_video_path, 
-                            temp_video_overlay_path, 
-                            overlays, 
-                            temp_dir
-                        )
-                    else:
-                        # Xử lý single overlay (từ GUI)
-                        from video_overlay import add_video_overlay_with_chroma
-                        settings = video_overlay_settings
-                        
-                        # DEBUG: In ra settings được truyền vào
-                        print(f"DEBUG MAIN: Single overlay settings={settings}")
-                        
-                        # Lấy chroma parameters từ GUI settings
-                        chroma_color = settings.get('chroma_color', 'green')
-                        chroma_similarity = settings.get('chroma_similarity', 0.2)
-                        chroma_blend = settings.get('chroma_blend', 0.15)
-                        
-                        # DEBUG: In ra chroma values
-                        print(f"DEBUG MAIN: chroma_color={chroma_color}, similarity={chroma_similarity}, blend={chroma_blend}")
-                        
-                        # Convert color name to hex
-                        if not str(chroma_color).startswith('0x'):
-                            chroma_color = self._get_chroma_color(chroma_color)
-                        
-                        add_video_overlay_with_chroma(
-                            main_video_path=input_video_path,
-                            overlay_video_path=settings['video_path'],
-                            output_path=temp_video_overlay_path,
-                            start_time=settings.get('start_time', 0),
-                            duration=settings.get('duration'),
-                            position=settings.get('position', 'top-right'),
-                            size_percent=settings.get('size_percent', 25),
-                            chroma_key=settings.get('chroma_key', True),
-                            chroma_color=chroma_color,
-                            chroma_similarity=chroma_similarity,
-                            chroma_blend=chroma_blend,
-                            auto_hide=settings.get('auto_hide', True),
-                            custom_x=settings.get('custom_x'),
-                            custom_y=settings.get('custom_y'),
-                            custom_width=settings.get('custom_width'),
-                            custom_height=settings.get('custom_height'),
-                            keep_aspect=settings.get('keep_aspect', True)
-                        )
-                    
-                    # Sau đó thêm phụ đề và image overlay lên video đã có video overlay
-                    if img_folder and overlay_times and os.path.exists(img_folder):
-                        self.video_processor.add_subtitle_to_video(
-                            temp_video_overlay_path,
-                            translated_subtitle_path,
-                            video_with_subtitle_path,
-                            img_folder,
-                            overlay_times
-                        )
-                    else:
-                        # Chỉ thêm phụ đề
-                        self.video_processor.add_subtitle_to_video(
-                            temp_video_overlay_path,
-                            translated_subtitle_path,
-                            video_with_subtitle_path
-                        )
-                    
-                except Exception as e:
-                    print(f"⚠️ Lỗi video overlay: {e}, sử dụng phương pháp cũ...")
-                    # Fallback về phương pháp cũ
-                    if img_folder and overlay_times and os.path.exists(img_folder):
-                        self.video_processor.add_subtitle_to_video(
-                            input_video_path,
-                            translated_subtitle_path,
-                            video_with_subtitle_path,
-                            img_folder,
-                            overlay_times
-                        )
-                    else:
-                        self.video_processor.add_subtitle_to_video(
-                            input_video_path,
-                            translated_subtitle_path,
-                            video_with_subtitle_path
-                        )
-            
-            # Xử lý image overlay và phụ đề (nếu không có video overlay)
-            elif img_folder and os.path.exists(img_folder):
-                # Kiểm tra nếu sử dụng custom timeline
-                if custom_timeline:
-                    print("🎯 Sử dụng custom timeline cho 3 ảnh...")
-                    try:
-                        from video_overlay import add_images_with_custom_timeline
-                        success = add_images_with_custom_timeline(
-                            input_video_path,
-                            translated_subtitle_path,
-                            video_with_subtitle_path,
-                            img_folder
-                        )
-                        if not success:
-                            print("⚠️ Custom timeline thất bại, sử dụng phương pháp cũ...")
-                            self.video_processor.add_subtitle_to_video(
-                                input_video_path,
-                                translated_subtitle_path,
-                                video_with_subtitle_path
-                            )
-                    except ImportError:
-                        print("⚠️ Module video_overlay không có, sử dụng phương pháp cũ...")
+                    from video_overlay import add_images_with_custom_timeline
+                    success = add_images_with_custom_timeline(
+                        input_video_path,
+                        translated_subtitle_path,
+                        video_with_subtitle_path,
+                        img_folder
+                    )
+                    if not success:
+                        print("⚠️ Custom timeline thất bại, sử dụng phương pháp cũ...")
                         self.video_processor.add_subtitle_to_video(
                             input_video_path,
                             translated_subtitle_path,
                             video_with_subtitle_path
                         )
-                elif overlay_times:
-                    # Sử dụng video overlay module với multiple overlays
-                    try:
-                        from video_overlay import add_multiple_overlays
-                        success = add_multiple_overlays(
-                            input_video_path,
-                            translated_subtitle_path,
-                            video_with_subtitle_path,
-                            img_folder,
-                            overlay_times
-                        )
-                        if not success:
-                            print("⚠️ Overlay thất bại, sử dụng phương pháp cũ...")
-                            self.video_processor.add_subtitle_to_video(
-                                input_video_path,
-                                translated_subtitle_path,
-                                video_with_subtitle_path,
-                                img_folder,
-                                overlay_times
-                            )
-                    except ImportError:
-                        print("⚠️ Module video_overlay không có, sử dụng phương pháp cũ...")
+                except ImportError:
+                    print("⚠️ Module video_overlay không có, sử dụng phương pháp cũ...")
+                    self.video_processor.add_subtitle_to_video(
+                        input_video_path,
+                        translated_subtitle_path,
+                        video_with_subtitle_path
+                    )
+            elif overlay_times:
+                # Sử dụng video overlay module với multiple overlays
+                try:
+                    from video_overlay import add_multiple_overlays
+                    success = add_multiple_overlays(
+                        input_video_path,
+                        translated_subtitle_path,
+                        video_with_subtitle_path,
+                        img_folder,
+                        overlay_times
+                    )
+                    if not success:
+                        print("⚠️ Overlay thất bại, sử dụng phương pháp cũ...")
                         self.video_processor.add_subtitle_to_video(
                             input_video_path,
                             translated_subtitle_path,
@@ -224,95 +472,107 @@ class AutoVideoEditor:
                             img_folder,
                             overlay_times
                         )
-                else:
-                    # Chỉ ghép phụ đề với thư mục ảnh (không có overlay times)
+                except ImportError:
+                    print("⚠️ Module video_overlay không có, sử dụng phương pháp cũ...")
                     self.video_processor.add_subtitle_to_video(
                         input_video_path,
                         translated_subtitle_path,
-                        video_with_subtitle_path
+                        video_with_subtitle_path,
+                        img_folder,
+                        overlay_times
                     )
             else:
-                # Chỉ ghép phụ đề
+                # Chỉ ghép phụ đề với thư mục ảnh (không có overlay times)
                 self.video_processor.add_subtitle_to_video(
                     input_video_path,
                     translated_subtitle_path,
                     video_with_subtitle_path
                 )
-            
-            # Bước 5: Chuyển đổi tỉ lệ khung hình thành 9:16
-            print("📱 Bước 5: Chuyển đổi tỉ lệ khung hình thành 9:16...")
-            self.aspect_converter.convert_to_9_16(
-                video_with_subtitle_path,
-                output_video_path
+        else:
+            # Chỉ ghép phụ đề
+            self.video_processor.add_subtitle_to_video(
+                input_video_path,
+                translated_subtitle_path,
+                video_with_subtitle_path
             )
-            
-            print(f"✅ Hoàn thành! Video đã được lưu tại: {output_video_path}")
-            
-            # Dọn dẹp thư mục tạm
-            import shutil
-            shutil.rmtree(temp_dir)
-            print("🧹 Đã dọn dẹp thư mục tạm")
-            
-        except Exception as e:
-            print(f"❌ Lỗi trong quá trình xử lý: {str(e)}")
-            raise
-    def _process_multiple_video_overlays(self, input_video_path, output_path, settings_list, temp_dir):
-        """Xử lý nhiều video overlay"""
-        current_video = input_video_path
         
-        for i, settings in enumerate(settings_list):
-            temp_output = os.path.join(temp_dir, f"temp_overlay_{i}.mp4")
-            
-            print(f"Áp dụng video overlay {i+1}/{len(settings_list)}...")
-            
-            from video_overlay import add_video_overlay_with_chroma
-            
-            # Xử lý chroma parameters từ GUI
-            chroma_color = settings.get('chroma_color', 'green')
-            chroma_similarity = settings.get('chroma_similarity', 0.2)
-            chroma_blend = settings.get('chroma_blend', 0.15)
-            
-            print(f"Processing chroma: color={chroma_color}, similarity={chroma_similarity}, blend={chroma_blend}")
-            
-            # Convert color name to hex nếu cần
-            if not str(chroma_color).startswith('0x'):
-                chroma_color = self._get_chroma_color(chroma_color)
-            
+        # Chuyển đổi tỉ lệ khung hình thành 9:16
+        print("📱 Bước 5: Chuyển đổi tỉ lệ khung hình thành 9:16...")
+        self.aspect_converter.convert_to_9_16(
+            video_with_subtitle_path,
+            output_video_path
+        )
+    
+    def _get_video_overlay_jobs(self, video_overlay_settings):
+        """Chuyển video_overlay_settings thành danh sách kwargs cho từng video overlay"""
+        if 'multiple_overlays' in video_overlay_settings:
+            return [self._get_video_overlay_kwargs(settings, multiple=True)
+                    for settings in video_overlay_settings['multiple_overlays']]
+        return [self._get_video_overlay_kwargs(video_overlay_settings)]
+    
+    def _get_video_overlay_kwargs(self, settings, multiple=False):
+        """
+        Chuẩn hóa settings của một video overlay thành kwargs cho add_video_overlay_with_chroma
+        
+        Args:
+            settings (dict): Settings từ GUI/batch config
+            multiple (bool): Settings thuộc danh sách multiple_overlays
+        """
+        # Lấy chroma parameters từ GUI settings
+        chroma_color = settings.get('chroma_color', 'green')
+        chroma_similarity = settings.get('chroma_similarity', 0.2)
+        chroma_blend = settings.get('chroma_blend', 0.15)
+        
+        print(f"Processing chroma: color={chroma_color}, similarity={chroma_similarity}, blend={chroma_blend}")
+        
+        # Convert color name to hex nếu cần
+        if not str(chroma_color).startswith('0x'):
+            chroma_color = self._get_chroma_color(chroma_color)
+        
+        kwargs = {
+            'overlay_video_path': settings.get('video_path'),
+            'start_time': settings.get('start_time', 0),
+            'duration': settings.get('duration'),
+            'position': settings.get('position', 'top-right'),
+            'size_percent': settings.get('size_percent', 25),
+            'chroma_key': settings.get('chroma_key', True),
+            'auto_hide': settings.get('auto_hide', True),
+            'custom_x': settings.get('custom_x'),
+            'custom_y': settings.get('custom_y'),
+            'custom_width': settings.get('custom_width'),
+            'custom_height': settings.get('custom_height'),
+            'keep_aspect': settings.get('keep_aspect', True)
+        }
+        
+        if multiple:
             # Đảm bảo similarity và blend là số
             try:
                 if isinstance(chroma_similarity, str):
                     chroma_similarity = float(chroma_similarity)
-                if isinstance(chroma_blend, str):
-                    chroma_blend = float(chroma_blend)
             except (ValueError, TypeError):
                 print(f"Invalid chroma values, using defaults")
                 chroma_similarity = 0.2
-                chroma_blend = 0.15
-            
-            add_video_overlay_with_chroma(
-                main_video_path=current_video,
-                overlay_video_path=settings['video_path'],
-                output_path=temp_output,
-                start_time=settings.get('start_time', 0),
-                duration=settings.get('duration'),
-                position=settings.get('position', 'top-right'),
-                size_percent=settings.get('size_percent', 25),
-                chroma_key=settings.get('chroma_key', True),
-                color=chroma_color,  # Sử dụng alias từ test_chroma_key.py
-                similarity=chroma_similarity,  # Sử dụng alias từ test_chroma_key.py
-                auto_hide=settings.get('auto_hide', True),
-                custom_x=settings.get('custom_x'),
-                custom_y=settings.get('custom_y'),
-                custom_width=settings.get('custom_width'),
-                custom_height=settings.get('custom_height'),
-                keep_aspect=settings.get('keep_aspect', True)
-            )
             
-            current_video = temp_output
+            # Sử dụng alias từ test_chroma_key.py (blend = similarity)
+            kwargs['color'] = chroma_color
+            kwargs['similarity'] = chroma_similarity
+        else:
+            kwargs['chroma_color'] = chroma_color
+            kwargs['chroma_similarity'] = chroma_similarity
+            kwargs['chroma_blend'] = chroma_blend
+        
+        return kwargs
+    
+    def _process_multiple_video_overlays(self, input_video_path, output_path, settings_list, temp_dir):
+        """Xử lý nhiều video overlay (một lần encode cho toàn bộ danh sách)"""
+        from video_overlay import add_multiple_video_overlays_with_chroma
         
-        # Copy kết quả cuối cùng
-        import shutil
-        shutil.copy2(current_video, output_path)
+        overlays = [self._get_video_overlay_kwargs(settings, multiple=True) for settings in settings_list]
+        add_multiple_video_overlays_with_chroma(
+            main_video_path=input_video_path,
+            output_path=output_path,
+            overlays=overlays
+        )
         return True
 
     def _get_chroma_color(self, color_name):
@@ -362,6 +622,36 @@ def main():
         default="en", 
         help="Ngôn ngữ đích cho phụ đề (mặc định: en - English)"
     )
+    parser.add_argument(
+        "--multi-pass",
+        action="store_true",
+        help="Render từng bước riêng lẻ thay vì gộp thành một lần encode"
+    )
+    parser.add_argument(
+        "--no-whisper-translate",
+        action="store_true",
+        help="Luôn dịch phụ đề bằng Translator thay vì để Whisper dịch thẳng sang tiếng Anh"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Không dùng cache phụ đề/bản dịch của các lần chạy trước"
+    )
+    parser.add_argument(
+        "--whisper-profile",
+        choices=list(PROFILE_BUDGET_RATIOS),
+        help="Chọn Whisper model/cách decode: speed, balanced hoặc quality (mặc định: balanced)"
+    )
+    parser.add_argument(
+        "--stt-budget",
+        type=float,
+        help="Ngân sách thời gian tạo phụ đề mỗi video (giây), ưu tiên hơn --whisper-profile"
+    )
+    parser.add_argument(
+        "--no-streaming",
+        action="store_true",
+        help="Tạo xong toàn bộ phụ đề rồi mới dịch (không dịch song song khi đang transcribe)"
+    )
     
     args = parser.parse_args()
     
@@ -381,7 +671,13 @@ def main():
         input_video_path=args.input_video_path, 
         output_video_path=args.output_video_path, 
         source_language=args.source_lang,
-        target_language=args.target_lang
+        target_language=args.target_lang,
+        single_pass=not args.multi_pass,
+        use_cache=not args.no_cache,
+        whisper_translate=False if args.no_whisper_translate else None,
+        streaming=not args.no_streaming,
+        whisper_profile=args.whisper_profile,
+        stt_latency_budget=args.stt_budget
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module lấy thông tin media bằng một lần gọi ffprobe (JSON)
+Kết quả là object bất biến, được nhớ theo đường dẫn + mtime + kích thước file
+và có thể lưu ra đĩa để dùng lại giữa các lần chạy.
+"""
+
+import os
+import json
+import tempfile
+import subprocess
+import threading
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+from ffmpeg_registry import get_ffmpeg_registry
+
+# File lưu kết quả probe trên đĩa (tùy chọn, bật bằng biến môi trường EDITVIDEO_PROBE_STORE)
+PROBE_STORE_ENV = "EDITVIDEO_PROBE_STORE"
+
+
+def _parse_frame_rate(rate: Optional[str]) -> Optional[float]:
+    """Chuyển frame rate dạng '30000/1001' thành số (không dùng eval)"""
+    if not rate:
+        return None
+    try:
+        num, _, den = rate.partition('/')
+        value = float(num) / float(den) if den else float(num)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value if value > 0 else None
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class StreamInfo:
+    """Thông tin một stream trong file media"""
+    index: int
+    codec_type: str
+    codec_name: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    duration: Optional[float] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+    @classmethod
+    def from_ffprobe(cls, stream: dict) -> 'StreamInfo':
+        return cls(
+            index=int(stream.get('index', 0)),
+            codec_type=stream.get('codec_type', ''),
+            codec_name=stream.get('codec_name'),
+            width=_to_int(stream.get('width')),
+            height=_to_int(stream.get('height')),
+            fps=_parse_frame_rate(stream.get('avg_frame_rate')) or _parse_frame_rate(stream.get('r_frame_rate')),
+            duration=_to_float(stream.get('duration')),
+            sample_rate=_to_int(stream.get('sample_rate')),
+            channels=_to_int(stream.get('channels'))
+        )
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """Thông tin file media (bất biến)"""
+    path: str
+    size: int
+    mtime_ns: int
+    format_name: Optional[str] = None
+    duration: Optional[float] = None
+    bit_rate: Optional[int] = None
+    streams: Tuple[StreamInfo, ...] = ()
+
+    @property
+    def video_stream(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.codec_type == 'video'), None)
+
+    @property
+    def audio_stream(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.codec_type == 'audio'), None)
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_stream is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio_stream is not None
+
+    @property
+    def width(self) -> Optional[int]:
+        return self.video_stream.width if self.video_stream else None
+
+    @property
+    def height(self) -> Optional[int]:
+        return self.video_stream.height if self.video_stream else None
+
+    @property
+    def fps(self) -> Optional[float]:
+        return self.video_stream.fps if self.video_stream else None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MediaInfo':
+        streams = tuple(StreamInfo(**stream) for stream in data.get('streams', []))
+        return cls(**{**data, 'streams': streams})
+
+
+class MediaProbe:
+    """Probe file media bằng ffprobe, nhớ kết quả theo path + mtime + size"""
+
+    def __init__(self, ffprobe_path=None, store_path=None):
+        self.ffprobe_path = ffprobe_path or get_ffmpeg_registry().ffprobe_path
+        self.store_path = store_path
+        self._memo = {}
+        self._lock = threading.Lock()
+        # Memo có kết quả mới chưa ghi ra store
+        self._dirty = False
+        if self.store_path:
+            self._load_store()
+
+    def probe(self, path) -> MediaInfo:
+        """
+        Lấy thông tin media (chỉ chạy ffprobe khi file mới hoặc đã thay đổi)
+
+        Args:
+            path (str): Đường dẫn file media
+
+        Returns:
+            MediaInfo: Thông tin media
+        """
+        stat = os.stat(path)
+        memo_key = self._memo_key(path, stat)
+        with self._lock:
+            info = self._memo.get(memo_key)
+        if info:
+            return info
+
+        info = self._run_ffprobe(path, stat)
+        with self._lock:
+            if memo_key not in self._memo:
+                self._memo[memo_key] = info
+                self._dirty = True
+        if self.store_path:
+            self._save_store()
+        return info
+
+    def get_duration(self, path) -> Optional[float]:
+        """Thời lượng media (giây), None nếu không xác định được"""
+        try:
+            return self.probe(path).duration
+        except Exception as e:
+            print(f"⚠️ Không thể lấy thời lượng {os.path.basename(path)}: {e}")
+            return None
+
+    def _memo_key(self, path, stat):
+        return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+    def _run_ffprobe(self, path, stat) -> MediaInfo:
+        cmd = [
+            self.ffprobe_path,
+            '-v', 'quiet',
+            '-print_format', 'json',
+            '-show_streams',
+            '-show_format',
+            path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"Lỗi ffprobe: {result.stderr}")
+
+        data = json.loads(result.stdout or '{}')
+        fmt = data.get('format', {})
+        streams = tuple(StreamInfo.from_ffprobe(s) for s in data.get('streams', []))
+
+        # Ưu tiên duration của container, sau đó tới stream video
+        duration = _to_float(fmt.get('duration'))
+        if duration is None:
+            duration = next((s.duration for s in streams if s.codec_type == 'video' and s.duration), None)
+
+        return MediaInfo(
+            path=os.path.abspath(path),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            format_name=fmt.get('format_name'),
+            duration=duration,
+            bit_rate=_to_int(fmt.get('bit_rate')),
+            streams=streams
+        )
+
+    def _load_store(self):
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._memo.update({key: MediaInfo.from_dict(value) for key, value in data.items()})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Không thể đọc probe store: {e}")
+
+    def _save_store(self):
+        """Ghi memo ra store nếu có kết quả mới (file tạm riêng rồi đổi tên, an toàn giữa các process)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {key: info.to_dict() for key, info in self._memo.items()}
+            temp_path = None
+            try:
+                store_dir = os.path.dirname(os.path.abspath(self.store_path))
+                os.makedirs(store_dir, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=store_dir, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(temp_path, self.store_path)
+                self._dirty = False
+            except OSError as e:
+                print(f"⚠️ Không thể ghi probe store: {e}")
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+
+_shared_probe = None
+_shared_probe_lock = threading.Lock()
+
+
+def get_media_probe() -> MediaProbe:
+    """MediaProbe dùng chung cho toàn bộ ứng dụng"""
+    global _shared_probe
+    with _shared_probe_lock:
+        if _shared_probe is None:
+            _shared_probe = MediaProbe(store_path=os.environ.get(PROBE_STORE_ENV))
+        return _shared_probe
+
+
+def probe_media(path) -> MediaInfo:
+    """Lấy MediaInfo của file qua MediaProbe dùng chung"""
+    return get_media_probe().probe(path)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server dịch giả lập (API tương thích LibreTranslate) để thử tốc độ dịch offline
+Server có giới hạn tốc độ riêng (trả 429 + Retry-After), độ trễ và tỉ lệ lỗi giả lập.
+
+Cách dùng:
+    python mock_translation_server.py --port 5005 --rate 5 --latency 0.3
+    EDITVIDEO_TRANSLATE_URL=http://127.0.0.1:5005/translate python main.py input.mp4 output.mp4
+
+GET /stats trả về số request đã nhận, số lần trả 429 và 500.
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from translation_executor import TokenBucket
+
+
+class MockTranslationHandler(BaseHTTPRequestHandler):
+    """Xử lý POST /translate: bản dịch = văn bản viết hoa, có tiền tố ngôn ngữ đích mỗi dòng"""
+
+    def do_POST(self):
+        server = self.server
+        if self.path.rstrip('/') != '/translate':
+            self._send_json(404, {'error': 'Not found'})
+            return
+
+        with server.stats_lock:
+            server.stats['requests'] += 1
+
+        if not server.bucket.try_acquire():
+            with server.stats_lock:
+                server.stats['rate_limited'] += 1
+            retry_after = max(1.0 / server.bucket.rate, 0.1) if server.bucket.rate > 0 else 1
+            self._send_json(429, {'error': 'Too many requests'}, {'Retry-After': f"{retry_after:.2f}"})
+            return
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if random.random() < server.fail_rate:
+            with server.stats_lock:
+                server.stats['errors'] += 1
+            self._send_json(500, {'error': 'Simulated failure'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            text = payload['q']
+            target = payload.get('target', 'en')
+        except (ValueError, KeyError):
+            self._send_json(400, {'error': 'Invalid request'})
+            return
+
+        # Giữ nguyên cấu trúc dòng (dấu [[n]] của batch vẫn tách được)
+        translated = '\n'.join(f"{line.upper()} ({target})" if line.strip() else line
+                               for line in text.split('\n'))
+        with server.stats_lock:
+            server.stats['translated_chars'] += len(text)
+        self._send_json(200, {'translatedText': translated})
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host='127.0.0.1', port=5005, rate=5.0, burst=5, latency=0.2, fail_rate=0.0, verbose=False):
+    """
+    Tạo server dịch giả lập (chưa chạy)
+
+    Args:
+        rate (float): Số request/giây server chấp nhận (vượt thì trả 429)
+        burst (int): Số request dồn tối đa
+        latency (float): Độ trễ mỗi request (giây)
+        fail_rate (float): Tỉ lệ request trả lỗi 500
+    """
+    server = ThreadingHTTPServer((host, port), MockTranslationHandler)
+    server.bucket = TokenBucket(rate, burst)
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.verbose = verbose
+    server.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0, 'translated_chars': 0}
+    server.stats_lock = threading.Lock()
+    return server
+
+
+def serve_in_thread(**kwargs):
+    """Chạy server trong luồng nền, trả về server (gọi shutdown() để dừng)"""
+    server = create_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server dịch giả lập để thử tốc độ dịch offline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--rate", type=float, default=5.0, help="Số request/giây chấp nhận")
+    parser.add_argument("--burst", type=int, default=5, help="Số request dồn tối đa")
+    parser.add_argument("--latency", type=float, default=0.2, help="Độ trễ mỗi request (giây)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Tỉ lệ lỗi 500 giả lập")
+    parser.add_argument("--verbose", action="store_true", help="In log từng request")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.rate, args.burst,
+                           args.latency, args.fail_rate, args.verbose)
+    print(f"🌐 Server dịch giả lập: http://{args.host}:{args.port}/translate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module cache clip overlay render sẵn (có kênh alpha)
+- Clip green-screen dùng chung cho cả batch được scale + chroma key một lần; các lượt
+  render sau overlay thẳng file này thay vì decode/key lại clip gốc cho từng video chính.
+- Ảnh có animation (fade/zoom/rotate) được render một lần thành clip ngắn tính từ t=0,
+  video chính chỉ cần overlay clip tại mốc bắt đầu.
+Key = hash nội dung file gốc + chuỗi filter (kích thước đích, màu, hiệu ứng) + encoder.
+"""
+
+import os
+import tempfile
+import threading
+import subprocess
+
+from artifact_cache import ArtifactCache
+from ffmpeg_registry import get_ffmpeg_registry
+
+# Thư mục cache (EDITVIDEO_OVERLAY_CACHE_DIR) và giới hạn dung lượng (EDITVIDEO_OVERLAY_CACHE_MAX_MB)
+DEFAULT_OVERLAY_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "editvideo_overlays")
+DEFAULT_OVERLAY_CACHE_MAX_MB = 1024
+
+# Tắt cache bằng EDITVIDEO_OVERLAY_CACHE=0
+OVERLAY_CACHE_ENABLED = os.environ.get("EDITVIDEO_OVERLAY_CACHE", "1") != "0"
+
+# Không xóa clip vừa được dùng trong khoảng này (giây): worker khác có thể đang render với nó
+IN_USE_SECONDS = 600
+
+# Số frame/giây của clip animation ảnh (EDITVIDEO_ANIMATION_FPS)
+ANIMATION_FPS = int(os.environ.get("EDITVIDEO_ANIMATION_FPS", "30"))
+
+# Encoder giữ kênh alpha theo thứ tự ưu tiên: (encoder, tham số, container, đuôi file)
+ALPHA_ENCODERS = (
+    ('prores_ks', ['-profile:v', '4444', '-pix_fmt', 'yuva444p10le'], 'mov', '.mov'),
+    ('qtrle', ['-pix_fmt', 'argb'], 'mov', '.mov'),
+    ('ffv1', ['-pix_fmt', 'yuva420p'], 'matroska', '.mkv'),
+)
+
+
+def pick_alpha_encoder():
+    """Encoder alpha đầu tiên bản build hỗ trợ, None nếu không có"""
+    registry = get_ffmpeg_registry()
+    for encoder in ALPHA_ENCODERS:
+        if registry.has_encoder(encoder[0]):
+            return encoder
+    return None
+
+
+class OverlayAssetCache(ArtifactCache):
+    """Cache clip overlay có alpha, dùng chung an toàn giữa các worker (ghi file tạm rồi đổi tên)"""
+
+    def __init__(self, cache_dir=None, max_size_mb=None):
+        if max_size_mb is None:
+            max_size_mb = float(os.environ.get("EDITVIDEO_OVERLAY_CACHE_MAX_MB", DEFAULT_OVERLAY_CACHE_MAX_MB))
+        super().__init__(
+            cache_dir=cache_dir or os.environ.get("EDITVIDEO_OVERLAY_CACHE_DIR", DEFAULT_OVERLAY_CACHE_DIR),
+            max_size_mb=max_size_mb
+        )
+        self._key_locks = {}
+        self._failed = set()
+        self._encoder = None
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_keyed_clip(self, overlay_video_path, filters, duration=None):
+        """
+        Lấy clip overlay đã áp dụng filters (scale + chroma key) kèm alpha, tạo nếu chưa có
+
+        Args:
+            overlay_video_path (str): Clip overlay gốc
+            filters (list[str]): Chuỗi filter áp dụng lên clip (vd: scale, chromakey)
+            duration (float): Chỉ render duration giây đầu (phần được hiển thị), None = cả clip
+
+        Returns:
+            str | None: Đường dẫn clip trong cache, None nếu không tạo được
+        """
+        if not duration:
+            return self._get_clip('overlay', overlay_video_path, filters)
+        return self._get_clip('overlay', overlay_video_path, filters,
+                              ['-t', f"{float(duration):.3f}"], duration=round(float(duration), 3))
+
+    def get_animation_clip(self, image_path, filters, duration, fps=ANIMATION_FPS):
+        """
+        Lấy clip animation của ảnh (scale + hiệu ứng tính từ t=0) dài duration giây, tạo nếu chưa có
+
+        Args:
+            image_path (str): Ảnh gốc
+            filters (list[str]): Chuỗi filter (scale, fade/zoom/rotate với mốc thời gian 0)
+            duration (float): Thời lượng hiển thị (giây)
+            fps (int): Số frame/giây của clip
+
+        Returns:
+            str | None: Đường dẫn clip trong cache, None nếu không tạo được
+        """
+        return self._get_clip('animation', image_path, filters,
+                              ['-loop', '1', '-framerate', str(fps), '-t', f"{float(duration):.3f}"],
+                              duration=round(float(duration), 3), fps=fps)
+
+    def _get_clip(self, stage, source_path, filters, input_options=(), **params):
+        if self._encoder is None:
+            self._encoder = pick_alpha_encoder() or False
+        if not self._encoder:
+            return None
+        encoder, encoder_args, container, extension = self._encoder
+
+        try:
+            key = self.make_key(stage, self.hash_file(source_path),
+                                filters=list(filters), encoder=encoder, **params)
+        except OSError as e:
+            print(f"⚠️ Không thể đọc file overlay {source_path}: {e}")
+            return None
+        entry_path = self._entry_path(key) + extension
+        if key in self._failed:
+            return None
+
+        # Mỗi key chỉ một worker render, các worker khác chờ rồi dùng lại kết quả
+        with self._key_lock(key):
+            if os.path.exists(entry_path):
+                try:
+                    os.utime(entry_path, None)
+                    print(f"♻️ Dùng clip overlay đã render sẵn: {os.path.basename(source_path)}")
+                    return entry_path
+                except FileNotFoundError:
+                    pass
+
+            print(f"🎨 Render clip overlay một lần cho cả batch: {os.path.basename(source_path)}")
+            try:
+                os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+                os.close(fd)
+                cmd = [
+                    get_ffmpeg_registry().ffmpeg_path, *input_options, '-i', source_path,
+                    '-vf', ','.join(filters), '-an',
+                    '-c:v', encoder, *encoder_args,
+                    '-f', container, '-y', temp_path
+                ]
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode != 0:
+                    os.remove(temp_path)
+                    # Filter không render riêng được (vd: cần input thứ hai): không thử lại trong process này
+                    self._failed.add(key)
+                    print(f"⚠️ Không thể render clip overlay: {result.stderr[-300:]}")
+                    return None
+                os.replace(temp_path, entry_path)
+            except OSError as e:
+                print(f"⚠️ Không thể ghi cache overlay {key[:12]}: {e}")
+                return None
+
+        self.evict(min_age=IN_USE_SECONDS)
+        return entry_path
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_overlay_asset_cache():
+    """OverlayAssetCache dùng chung, None nếu cache bị tắt"""
+    global _shared_cache
+    if not OVERLAY_CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = OverlayAssetCache()
+        return _shared_cache
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module lập kế hoạch render một lượt (single-pass)
+Gộp video overlay, phụ đề, ảnh overlay và chuyển đổi 9:16 vào một filter_complex
+để video chỉ bị decode/encode đúng một lần.
+"""
+
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from ffmpeg_registry import get_ffmpeg_registry
+from filter_graph import FilterGraph
+from video_overlay import (
+    build_subtitle_filter,
+    add_video_overlay_job_to_graph,
+    add_timed_media_list_to_graph,
+    collect_overlay_configs,
+    add_custom_timeline_image_input,
+    CUSTOM_TIMELINE_IMAGES,
+    MULTIPLE_OVERLAY_SUBTITLE_STYLE,
+    ANIMATION_SUBTITLE_STYLE,
+)
+from video_processor import NO_IMAGE_SUBTITLE_STYLE
+
+
+@dataclass
+class RenderPlan:
+    """Kế hoạch render: filter graph và các bước đã gộp"""
+    input_video_path: str
+    graph: Optional[FilterGraph] = None
+    stages: List[str] = field(default_factory=list)
+    video_label: str = "0:v"
+
+    def __post_init__(self):
+        if self.graph is None:
+            self.graph = FilterGraph(self.input_video_path)
+
+    def build_command(self, ffmpeg_path: str, output_path: str) -> List[str]:
+        """Tạo lệnh ffmpeg một lượt (graph được tối ưu trước khi serialize)"""
+        return self.graph.build_command(ffmpeg_path, output_path)
+
+    def describe(self):
+        """In các bước đã được gộp vào lượt render"""
+        print(f"🧭 Kế hoạch render một lượt ({len(self.stages)} bước, {len(self.graph.input_paths)} input):")
+        for i, stage in enumerate(self.stages, 1):
+            print(f"   {i}. {stage}")
+
+
+class RenderPlanner:
+    """Lập kế hoạch toàn bộ job và render bằng một lần encode duy nhất"""
+
+    def __init__(self, video_processor, aspect_converter):
+        self.video_processor = video_processor
+        self.aspect_converter = aspect_converter
+
+    def plan(self, input_video_path, subtitle_path, img_folder=None, overlay_times=None,
+             video_overlays=None, custom_timeline=False,
+             target_width=1080, background_color='black') -> RenderPlan:
+        """
+        Lập kế hoạch render theo đúng thứ tự của pipeline nhiều lượt:
+        video overlay → phụ đề → ảnh overlay → 9:16
+
+        Args:
+            video_overlays (list): Danh sách kwargs của add_video_overlay_with_chroma,
+                                   mỗi phần tử có thêm 'overlay_video_path'
+        """
+        plan = RenderPlan(input_video_path=input_video_path)
+
+        # Bước 1: Video overlay (chroma key)
+        active_overlays = []
+        for overlay in video_overlays or []:
+            overlay_path = overlay.get('overlay_video_path')
+            if not overlay_path or not os.path.exists(overlay_path):
+                print(f"⚠️ Video overlay không tồn tại: {overlay_path}, bỏ qua...")
+                continue
+            active_overlays.append(overlay)
+
+        for overlay in active_overlays:
+            self._add_video_overlay(plan, **overlay)
+
+        # Bước 2 + 3: Phụ đề và ảnh overlay (giống nhánh trong AutoVideoEditor.process_video)
+        has_img_folder = bool(img_folder) and os.path.exists(img_folder)
+
+        if video_overlays:
+            if has_img_folder and overlay_times:
+                self._add_media_overlays(plan, subtitle_path, img_folder, overlay_times)
+            else:
+                self._add_default_images(plan, subtitle_path)
+        elif has_img_folder and custom_timeline:
+            if not self._add_custom_timeline(plan, subtitle_path, img_folder):
+                self._add_default_images(plan, subtitle_path)
+        elif has_img_folder and overlay_times:
+            if not self._add_timed_overlays(plan, subtitle_path, img_folder, overlay_times):
+                self._add_media_overlays(plan, subtitle_path, img_folder, overlay_times)
+        else:
+            self._add_default_images(plan, subtitle_path)
+
+        # Bước 4: Chuyển đổi 9:16
+        self._add_filter(plan, self.aspect_converter.build_9_16_filter(target_width, background_color), "vout")
+        plan.stages.append(f"Chuyển đổi 9:16 (rộng {target_width}px, nền {background_color})")
+
+        return plan
+
+    def render(self, plan: RenderPlan, output_path: str):
+        """Chạy lệnh ffmpeg cho kế hoạch đã lập"""
+        plan.describe()
+        cmd = plan.build_command(self.video_processor.ffmpeg_path, output_path)
+
+        # Kiểm tra bản build FFmpeg có đủ filter (vd: subtitles cần libass)
+        missing = get_ffmpeg_registry().missing_filters(plan.graph.filter_names())
+        if missing:
+            raise Exception(f"FFmpeg không hỗ trợ filter: {', '.join(missing)}")
+
+        print(f"⚡ Đang render một lượt...")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+        if result.returncode != 0:
+            raise Exception(f"Lỗi render một lượt: {result.stderr}")
+
+        print(f"✅ Render một lượt thành công: {output_path}")
+
+    def _add_filter(self, plan: RenderPlan, filter_str: str, prefix: str) -> str:
+        """Nối một filter vào nhánh video chính"""
+        plan.video_label = plan.graph.chain(plan.video_label, filter_str, prefix=prefix)
+        return plan.video_label
+
+    def _add_overlay(self, plan: RenderPlan, overlay_label: str, x_pos: str, y_pos: str,
+                     start_time, end_time):
+        """Overlay một nhánh lên video chính trong khoảng thời gian cho trước"""
+        plan.video_label = plan.graph.overlay(plan.video_label, overlay_label, x_pos, y_pos,
+                                              enable=f"between(t,{start_time},{end_time})")
+
+    def _add_video_overlay(self, plan: RenderPlan, overlay_video_path, start_time=0, duration=None,
+                           position="center", size_percent=30, chroma_key=True,
+                           chroma_color="0x00ff00", chroma_similarity=0.1, chroma_blend=0.1,
+                           color=None, similarity=None, auto_hide=True,
+                           custom_x=None, custom_y=None,
+                           custom_width=None, custom_height=None, keep_aspect=True):
+        """Thêm một video overlay (cùng tham số với add_video_overlay_with_chroma)"""
+        plan.video_label = add_video_overlay_job_to_graph(
+            plan.graph,
+            plan.video_label,
+            overlay_video_path,
+            start_time=start_time,
+            duration=duration,
+            position=position,
+            size_percent=size_percent,
+            chroma_key=chroma_key,
+            chroma_color=chroma_color,
+            chroma_similarity=chroma_similarity,
+            chroma_blend=chroma_blend,
+            color=color,
+            similarity=similarity,
+            auto_hide=auto_hide,
+            custom_x=custom_x,
+            custom_y=custom_y,
+            custom_width=custom_width,
+            custom_height=custom_height,
+            keep_aspect=keep_aspect
+        )
+        plan.stages.append(f"Video overlay: {os.path.basename(overlay_video_path)} "
+                           f"({start_time}s, chroma={'có' if chroma_key else 'không'})")
+
+    def _add_subtitles(self, plan: RenderPlan, subtitle_filter: str):
+        """Burn phụ đề vào nhánh video chính"""
+        self._add_filter(plan, subtitle_filter, "sub")
+        plan.stages.append("Phụ đề")
+
+    def _add_timed_media(self, plan: RenderPlan, media):
+        """Thêm ảnh/video overlay căn giữa (cùng filter với _add_subtitle_and_media_overlay)"""
+        plan.video_label = add_timed_media_list_to_graph(plan.graph, plan.video_label, media)
+        for media_file, start_time, duration, is_video in media:
+            media_type = "Video" if is_video else "Ảnh"
+            plan.stages.append(f"{media_type}: {os.path.basename(media_file)} ({start_time}s, {duration}s)")
+
+    def _add_media_overlays(self, plan: RenderPlan, subtitle_path, img_folder, overlay_times):
+        """Tương đương VideoProcessor._add_subtitle_and_media_overlay"""
+        self._add_subtitles(plan, self.video_processor.build_subtitle_filter(subtitle_path))
+
+        self._add_timed_media(plan, [
+            (config['file'], config['start_time'], config['duration'], config['is_video'])
+            for config in self.video_processor.collect_media_overlay_configs(img_folder, overlay_times)
+        ])
+
+    def _add_timed_overlays(self, plan: RenderPlan, subtitle_path, img_folder, overlay_times) -> bool:
+        """Tương đương video_overlay.add_multiple_overlays"""
+        overlay_configs = collect_overlay_configs(img_folder, overlay_times)
+        if not overlay_configs:
+            return False
+
+        self._add_subtitles(plan, build_subtitle_filter(subtitle_path, MULTIPLE_OVERLAY_SUBTITLE_STYLE))
+
+        self._add_timed_media(plan, [
+            (config['file'], config['start'], config['duration'], config['is_video'])
+            for config in overlay_configs
+        ])
+        return True
+
+    def _add_default_images(self, plan: RenderPlan, subtitle_path, img_folder="img"):
+        """Tương đương VideoProcessor._add_subtitle_and_images_with_filter"""
+        existing_images = self.video_processor.get_default_image_configs(img_folder)
+
+        if not existing_images:
+            self._add_subtitles(plan, build_subtitle_filter(subtitle_path, NO_IMAGE_SUBTITLE_STYLE))
+            return
+
+        self._add_subtitles(plan, self.video_processor.build_subtitle_filter(subtitle_path))
+
+        for config in existing_images:
+            img_path = os.path.join(img_folder, config["image"]).replace('\\', '/')
+            img_label = plan.graph.chain(plan.graph.add_input(img_path), "scale=iw*0.1:ih*0.1", prefix="img")
+            self._add_overlay(plan, img_label, "(main_w-overlay_w)/2", str(config["y_offset"]),
+                              config['start_time'], config['end_time'])
+            plan.stages.append(f"Ảnh: {config['image']} ({config['start_time']}s-{config['end_time']}s)")
+
+    def _add_custom_timeline(self, plan: RenderPlan, subtitle_path, img_folder) -> bool:
+        """Tương đương video_overlay.add_images_with_custom_timeline"""
+        valid_configs = [config for config in CUSTOM_TIMELINE_IMAGES
+                         if os.path.exists(os.path.join(img_folder, config["image"]))]
+        if not valid_configs:
+            print("❌ Không tìm thấy ảnh nào cho custom timeline!")
+            return False
+
+        if subtitle_path and os.path.exists(subtitle_path):
+            self._add_subtitles(plan, build_subtitle_filter(subtitle_path, ANIMATION_SUBTITLE_STYLE))
+
+        for config in valid_configs:
+            anim_label = add_custom_timeline_image_input(plan.graph, os.path.join(img_folder, config["image"]),
+                                                         config)
+            self._add_overlay(plan, anim_label, "(main_w-overlay_w)/2", str(config['y_offset']),
+                              config['start_time'], config['end_time'])
+            plan.stages.append(f"Ảnh (custom timeline): {config['image']} "
+                               f"({config['start_time']}s-{config['end_time']}s, {config['animation']})")
+        return True
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module engine nhận dạng giọng nói cho phương án SpeechRecognition
+Mỗi engine nhận một đoạn PCMAudio và trả về văn bản ('' nếu không nhận dạng được),
+an toàn khi gọi từ nhiều luồng. Chọn engine bằng biến môi trường EDITVIDEO_SR_BACKEND.
+"""
+
+import os
+import time
+
+try:
+    import speech_recognition as sr
+    HAS_SPEECH_RECOGNITION = True
+except ImportError:
+    HAS_SPEECH_RECOGNITION = False
+
+from audio_source import SAMPLE_WIDTH
+
+GOOGLE_BACKEND = 'google'
+STUB_BACKEND = 'stub'
+
+# Engine mặc định: 'google' (Google Web Speech) hoặc 'stub' (giả lập offline để thử)
+DEFAULT_BACKEND = os.environ.get("EDITVIDEO_SR_BACKEND", GOOGLE_BACKEND)
+
+# Số đoạn nhận dạng đồng thời (EDITVIDEO_SR_WORKERS)
+DEFAULT_SR_WORKERS = int(os.environ.get("EDITVIDEO_SR_WORKERS", "4"))
+
+
+class GoogleSpeechRecognizer:
+    """Google Web Speech API qua thư viện SpeechRecognition"""
+    name = GOOGLE_BACKEND
+
+    def __init__(self):
+        if not HAS_SPEECH_RECOGNITION:
+            raise ImportError("Cần cài đặt SpeechRecognition: pip install SpeechRecognition")
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, chunk, language):
+        """Nhận dạng một đoạn PCM 16-bit mono, '' nếu không nghe ra nội dung"""
+        # PCM đưa thẳng vào AudioData, không ghi file tạm
+        audio_data = sr.AudioData(chunk.to_bytes(), chunk.sample_rate, SAMPLE_WIDTH)
+        try:
+            return self.recognizer.recognize_google(
+                audio_data, language='vi-VN' if language == 'vi' else language
+            )
+        except sr.UnknownValueError:
+            return ''
+
+
+class StubSpeechRecognizer:
+    """
+    Engine giả lập chạy offline: trả về mô tả đoạn audio thay cho lời thoại
+
+    Dùng để thử pipeline (thứ tự, song song, thời gian cue) mà không cần mạng;
+    latency giả lập thời gian chờ của một request thật.
+    """
+    name = STUB_BACKEND
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def recognize(self, chunk, language):
+        if self.latency:
+            time.sleep(self.latency)
+        if chunk.is_empty or not chunk.samples.any():
+            return ''
+        return f"[{language}] {chunk.duration:.1f}s"
+
+
+def create_speech_recognizer(backend=None):
+    """
+    Tạo engine nhận dạng theo tên
+
+    Returns:
+        Engine có method recognize(chunk, language), None nếu không dùng được
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == STUB_BACKEND:
+        return StubSpeechRecognizer(float(os.environ.get("EDITVIDEO_SR_STUB_LATENCY", "0")))
+    if backend == GOOGLE_BACKEND:
+        return GoogleSpeechRecognizer() if HAS_SPEECH_RECOGNITION else None
+    print(f"⚠️ Không hỗ trợ engine nhận dạng: {backend}")
+    return None
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module dựng sprite track cho nhiều ảnh overlay có thời gian
+Các ảnh cùng vị trí, không chồng thời gian được pad về cùng một khung RGBA và nối
+bằng concat xen các khoảng trong suốt; video chính chỉ đi qua một filter overlay
+cho mỗi track thay vì một overlay cho mỗi ảnh (mỗi overlay đều duyệt mọi frame,
+kể cả khi đang tắt).
+"""
+
+import os
+import math
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from media_probe import get_media_probe
+from overlay_asset_cache import ANIMATION_FPS
+
+# Số frame/giây của sprite track (cùng clip animation render sẵn để nối được với nhau)
+SPRITE_FPS = ANIMATION_FPS
+
+# Khoảng trong suốt: RGBA alpha = 0
+TRANSPARENT = "black@0"
+
+
+@dataclass
+class SpriteItem:
+    """Một ảnh (hoặc clip animation có alpha) hiển thị trong [start, start + duration)"""
+    path: str
+    start: float
+    duration: float
+    size: Tuple[int, int]
+    filters: List[str] = field(default_factory=list)
+    still: bool = True
+    payload: Any = None
+
+    @property
+    def end(self):
+        return self.start + self.duration
+
+    @classmethod
+    def from_image(cls, path, start, duration, scale_factor, payload=None) -> Optional['SpriteItem']:
+        """Ảnh tĩnh scale theo hệ số; None nếu không đọc được kích thước ảnh"""
+        size = _probe_size(path)
+        if not size or not duration:
+            return None
+        size = (math.ceil(size[0] * scale_factor), math.ceil(size[1] * scale_factor))
+        return cls(path, start, duration, size, [f"scale=iw*{scale_factor}:ih*{scale_factor}"],
+                   still=True, payload=payload)
+
+    @classmethod
+    def from_clip(cls, path, start, duration, payload=None) -> Optional['SpriteItem']:
+        """Clip có alpha đã render sẵn (vd: animation ảnh); None nếu không đọc được kích thước"""
+        size = _probe_size(path)
+        if not size or not duration:
+            return None
+        return cls(path, start, duration, size, still=False, payload=payload)
+
+
+def _probe_size(path):
+    """(rộng, cao) của ảnh/clip, None nếu không probe được (thiếu ffprobe, file lỗi...)"""
+    try:
+        info = get_media_probe().probe(path)
+    except Exception as e:
+        print(f"⚠️ Không thể lấy kích thước {os.path.basename(path)}: {e}")
+        return None
+    if not info.width or not info.height:
+        return None
+    return info.width, info.height
+
+
+def _even(value):
+    return value + value % 2
+
+
+def _anchor_offset(expression, main, overlay, outer, inner):
+    """Vị trí item trong khung theo cách biểu thức overlay căn lề (trái/giữa/phải)"""
+    expression = expression.replace(' ', '')
+    if f"{main}-{overlay}" in expression:
+        return f"({outer}-{inner})/2" if "/2" in expression else f"{outer}-{inner}"
+    return "0"
+
+
+def _overlaps(first, second):
+    return first.start < second.end - 1e-6 and second.start < first.end - 1e-6
+
+
+def group_sprite_tracks(placed):
+    """
+    Chia item thành các track: cùng vị trí overlay và không chồng thời gian
+
+    Thứ tự chồng lớp giữ như danh sách: item sau luôn nằm ở track phía trên mọi item
+    đứng trước mà nó chồng thời gian.
+
+    Args:
+        placed (list[tuple[SpriteItem, tuple | None]]): (item, (x, y)) theo thứ tự chồng lớp;
+            vị trí None = không gộp (vd: video overlay, ảnh không probe được)
+
+    Returns:
+        list[tuple[tuple | None, list[SpriteItem]]]: (vị trí, các item theo thời gian), từ dưới lên trên
+    """
+    tracks = []
+    for item, position in placed:
+        lowest = 1 + max((index for index, (_, items) in enumerate(tracks)
+                          if any(_overlaps(item, other) for other in items)), default=-1)
+        for track_position, items in tracks[lowest:]:
+            if position is not None and track_position == position:
+                items.append(item)
+                break
+        else:
+            tracks.append((position, [item]))
+    return [(position, sorted(items, key=lambda item: item.start)) for position, items in tracks]
+
+
+def add_sprite_track(graph, main_label, items, x_pos, y_pos, fps=SPRITE_FPS, prefix="sprite"):
+    """
+    Nối các item thành một track RGBA và overlay một lần lên main_label
+
+    Khung track = item lớn nhất; item nhỏ hơn được pad trong suốt theo cách căn lề của
+    x_pos/y_pos nên vị trí hiển thị giữ nguyên. Độ dài mỗi đoạn làm tròn theo lưới frame
+    chung để thời gian không lệch dần khi có nhiều ảnh.
+
+    Returns:
+        str: Label đầu ra sau khi overlay
+    """
+    # Bỏ item ngắn hơn một frame
+    items = [item for item in items if round(item.end * fps) > round(item.start * fps)]
+    if not items:
+        return main_label
+
+    width = _even(max(item.size[0] for item in items))
+    height = _even(max(item.size[1] for item in items))
+    pad_x = _anchor_offset(x_pos, "main_w", "overlay_w", "ow", "iw")
+    pad_y = _anchor_offset(y_pos, "main_h", "overlay_h", "oh", "ih")
+
+    first_frame = round(items[0].start * fps)
+    cursor = first_frame
+    segments = []
+    for item in items:
+        start_frame = round(item.start * fps)
+        end_frame = round(item.end * fps)
+        if start_frame > cursor:
+            gap_frames = start_frame - cursor
+            segments.append(graph.source(
+                f"color=c={TRANSPARENT}:s={width}x{height}:r={fps}:d={(gap_frames + 1) / fps:.3f}",
+                "format=rgba", f"trim=end_frame={gap_frames}", f"setpts=N/({fps}*TB)", "setsar=1",
+                prefix="gap"
+            ))
+        frames = end_frame - start_frame
+        padding = f"pad={width}:{height}:{pad_x}:{pad_y}:color={TRANSPARENT}"
+        if item.still:
+            # Ảnh tĩnh: scale/pad một frame rồi lặp lại, không xử lý lại từng frame
+            segments.append(graph.chain(
+                graph.add_input(item.path),
+                *item.filters, "format=rgba", padding,
+                f"loop=loop={frames - 1}:size=1:start=0", f"setpts=N/({fps}*TB)", "setsar=1",
+                prefix="item"
+            ))
+        else:
+            segments.append(graph.chain(
+                graph.add_input(item.path, ['-t', f"{item.duration + 1 / fps:.3f}"]),
+                *item.filters, "format=rgba", padding,
+                f"trim=end_frame={frames}", f"setpts=N/({fps}*TB)", "setsar=1",
+                prefix="item"
+            ))
+        cursor = end_frame
+
+    track = graph.concat(segments, prefix=prefix)
+    track = graph.chain(track, f"setpts=PTS+{first_frame / fps:.3f}/TB", prefix=prefix)
+    return graph.overlay(main_label, track, x_pos, y_pos,
+                         enable=f"between(t,{first_frame / fps:.3f},{cursor / fps:.3f})",
+                         eof_action="pass")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module mô hình phụ đề trong bộ nhớ (danh sách cue), đọc SRT/ASS và ghi SRT dạng streaming
+SubtitleGenerator, Translator và VideoProcessor truyền CueList trực tiếp cho nhau;
+chỉ ghi ra file khi tới FFmpeg hoặc cache.
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+
+_SRT_TIME = re.compile(r"(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})")
+_ASS_TIME = re.compile(r"(\d+):(\d{1,2}):(\d{1,2})[.,](\d{1,2})")
+_ASS_OVERRIDE = re.compile(r"\{[^}]*\}")
+
+
+class Cue:
+    """Một dòng phụ đề: thời gian bắt đầu/kết thúc (giây) và nội dung"""
+    __slots__ = ('start', 'end', 'text')
+
+    def __init__(self, start, end, text):
+        self.start = float(start)
+        self.end = float(end)
+        self.text = text
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def with_text(self, text):
+        """Cue mới cùng thời gian, nội dung khác"""
+        return Cue(self.start, self.end, text)
+
+    def __eq__(self, other):
+        return isinstance(other, Cue) and (self.start, self.end, self.text) == (other.start, other.end, other.text)
+
+    def __repr__(self):
+        return f"Cue({self.start:.3f}, {self.end:.3f}, {self.text!r})"
+
+
+class CueList(list):
+    """Danh sách Cue theo thứ tự thời gian"""
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Tạo từ segment dạng dict {'start', 'end', 'text'} (vd: kết quả Whisper)"""
+        return cls(
+            Cue(segment['start'], segment['end'], segment['text'].strip())
+            for segment in segments
+            if segment['text'].strip()
+        )
+
+    @property
+    def texts(self):
+        return [cue.text for cue in self]
+
+    def with_texts(self, texts):
+        """CueList mới giữ nguyên thời gian, thay nội dung (vd: sau khi dịch)"""
+        return CueList(cue.with_text(text) for cue, text in zip(self, texts))
+
+    def to_srt(self):
+        return "".join(_iter_srt_blocks(self))
+
+    def content_hash(self):
+        """SHA-256 của dạng SRT (dùng làm key cache)"""
+        digest = hashlib.sha256()
+        for block in _iter_srt_blocks(self):
+            digest.update(block.encode('utf-8'))
+        return digest.hexdigest()
+
+
+def format_srt_time(seconds):
+    """Giây → HH:MM:SS,mmm"""
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+
+def parse_srt_time(value):
+    """HH:MM:SS,mmm (chấp nhận cả dấu '.') → giây, None nếu sai định dạng"""
+    match = _SRT_TIME.search(value)
+    if not match:
+        return None
+    hours, minutes, secs, fraction = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(secs) + int(fraction.ljust(3, '0')) / 1000
+
+
+def parse_ass_time(value):
+    match = _ASS_TIME.search(value)
+    if not match:
+        return None
+    hours, minutes, secs, fraction = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(secs) + int(fraction.ljust(2, '0')) / 100
+
+
+def _iter_srt_blocks(cues):
+    for index, cue in enumerate(cues, 1):
+        yield f"{index}\n{format_srt_time(cue.start)} --> {format_srt_time(cue.end)}\n{cue.text}\n\n"
+
+
+def iter_srt(lines):
+    """
+    Đọc SRT từng dòng, sinh ra Cue (không cần đọc cả file vào bộ nhớ)
+
+    Chịu được: BOM, CRLF, thiếu dòng số thứ tự, nhiều dòng trống, dòng nội dung bắt đầu bằng số.
+    """
+    start = end = None
+    text_lines = []
+    for line in lines:
+        line = line.rstrip('\r\n').lstrip('﻿')
+        if '-->' in line:
+            start_value, _, end_value = line.partition('-->')
+            parsed_start, parsed_end = parse_srt_time(start_value), parse_srt_time(end_value)
+            if parsed_start is not None and parsed_end is not None:
+                # Dòng thời gian mới: kết thúc cue trước (bỏ dòng số thứ tự nằm ngay trước)
+                if start is not None:
+                    if text_lines and text_lines[-1].strip().isdigit():
+                        text_lines.pop()
+                    yield Cue(start, end, '\n'.join(text_lines).strip())
+                start, end = parsed_start, parsed_end
+                text_lines = []
+                continue
+        if start is not None:
+            if line.strip() or (text_lines and text_lines[-1].strip()):
+                text_lines.append(line)
+    if start is not None:
+        yield Cue(start, end, '\n'.join(text_lines).strip())
+
+
+def read_srt(path):
+    """Đọc file SRT thành CueList"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return CueList(iter_srt(f))
+
+
+def write_srt(cues, path):
+    """Ghi CueList ra file SRT (ghi từng cue, không ghép chuỗi lớn)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for block in _iter_srt_blocks(cues):
+            f.write(block)
+
+
+def iter_ass(lines):
+    """Đọc các dòng Dialogue của file ASS/SSA thành Cue (bỏ tag {\\...})"""
+    fields = ['Layer', 'Start', 'End', 'Style', 'Name', 'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text']
+    in_events = False
+    for line in lines:
+        line = line.rstrip('\r\n').lstrip('﻿')
+        stripped = line.strip()
+        if stripped.startswith('['):
+            in_events = stripped.lower() == '[events]'
+            continue
+        if not in_events:
+            continue
+        key, _, value = line.partition(':')
+        if key.strip() == 'Format':
+            fields = [field.strip() for field in value.split(',')]
+        elif key.strip() == 'Dialogue':
+            values = value.strip().split(',', len(fields) - 1)
+            if len(values) < len(fields):
+                continue
+            row = dict(zip(fields, values))
+            start, end = parse_ass_time(row.get('Start', '')), parse_ass_time(row.get('End', ''))
+            if start is None or end is None:
+                continue
+            text = _ASS_OVERRIDE.sub('', row.get('Text', '')).replace('\\N', '\n').replace('\\n', '\n')
+            yield Cue(start, end, text.strip())
+
+
+def read_ass(path):
+    """Đọc file ASS/SSA thành CueList"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return CueList(iter_ass(f))
+
+
+def read_subtitles(path):
+    """Đọc file phụ đề theo phần mở rộng (.ass/.ssa hoặc SRT)"""
+    if os.path.splitext(path)[1].lower() in ('.ass', '.ssa'):
+        return read_ass(path)
+    return read_srt(path)
+
+
+def materialize_subtitles(subtitles, directory=None):
+    """
+    Đường dẫn file SRT để đưa cho FFmpeg
+
+    Args:
+        subtitles (CueList | str): Cue trong bộ nhớ hoặc đường dẫn file có sẵn
+        directory (str): Thư mục ghi file tạm (mặc định thư mục tạm hệ thống)
+
+    Returns:
+        tuple[str, bool]: (đường dẫn, True nếu là file tạm vừa tạo - người gọi tự xóa)
+    """
+    if isinstance(subtitles, str):
+        return subtitles, False
+    fd, path = tempfile.mkstemp(suffix='.srt', dir=directory)
+    os.close(fd)
+    write_srt(subtitles, path)
+    return path, True
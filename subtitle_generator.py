@@ -5,132 +5,378 @@ Module tạo phụ đề từ audio sử dụng Speech-to-Text
 """
 
 import os
-import tempfile
 import subprocess
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-    import speech_recognition as sr
-    import pydub
-    from pydub import AudioSegment
-    import wave
-    HAS_SPEECH_RECOGNITION = True
-except ImportError:
-    HAS_SPEECH_RECOGNITION = False
+from whisper_pool import HAS_WHISPER, get_whisper_pool
+from whisper_policy import (
+    DEFAULT_PROFILE, DEFAULT_BUDGET, MODEL_SIZES,
+    apply_torch_threads, choose_whisper_plan, ensure_calibrated
+)
+from audio_source import PCMAudio, load_pcm_audio
+from speech_recognizers import DEFAULT_SR_WORKERS, create_speech_recognizer
+from subtitle_cues import Cue, CueList, write_srt, format_srt_time
+from voice_activity import FULL_AUDIO_RATIO, SpeechTimeline, detect_speech_spans
+from chunked_transcription import (
+    CHUNKED_MIN_SECONDS, DEFAULT_WORKERS, transcribe_chunked,
+    iter_transcribe_chunked, iter_transcribe_windows
+)
 
-try:
-    import whisper
-    HAS_WHISPER = True
-except ImportError:
-    HAS_WHISPER = False
+# Audio ngắn hơn mức này coi như trống
+MIN_AUDIO_SECONDS = 0.1
+
+# Độ dài mỗi đoạn gửi cho SpeechRecognition (giây)
+SR_CHUNK_SECONDS = 30
 
 class SubtitleGenerator:
     def __init__(self):
         self.recognizer = None
-        self.whisper_model = None
+        self.whisper_model = None  # Chỉ load khi có tiếng nói cần transcribe
+        self.use_whisper = HAS_WHISPER
+        self.model_name = os.environ.get("EDITVIDEO_WHISPER_MODEL")  # None = chọn theo ngân sách
+        self.whisper_profile = DEFAULT_PROFILE  # 'speed' | 'balanced' | 'quality'
+        self.latency_budget = DEFAULT_BUDGET    # Ngân sách STT mỗi video (giây), None = theo profile
+        self.last_plan = None                   # WhisperPlan của lần transcribe gần nhất
+        self.used_default_subtitle = False
+        self.last_task = 'transcribe'  # Task thực sự đã chạy ở lần tạo phụ đề gần nhất
+        self.last_segments = None      # Segment (start, end, text) trước khi chia dòng của lần gần nhất
+        self.stt_workers = DEFAULT_WORKERS  # Số process cho audio dài (1 = tắt chia đoạn, vd: trong worker batch)
+        self.sr_workers = DEFAULT_SR_WORKERS  # Số đoạn SpeechRecognition nhận dạng đồng thời
+        self.batch_server = None  # WhisperBatchServer dùng chung khi chạy batch (None = transcribe riêng)
         
         # Ưu tiên sử dụng Whisper nếu có
         if HAS_WHISPER:
             print("🤖 Sử dụng OpenAI Whisper để tạo phụ đề")
-            try:
-                self.whisper_model = whisper.load_model("base")
-            except Exception as e:
-                print(f"⚠️ Không thể tải Whisper model: {e}")
-                self.whisper_model = None
         
-        if HAS_SPEECH_RECOGNITION and not self.whisper_model:
-            print("🎙️ Sử dụng SpeechRecognition để tạo phụ đề")
-            self.recognizer = sr.Recognizer()
+        # Engine nhận dạng theo từng đoạn (EDITVIDEO_SR_BACKEND),
+        # cũng là phương án dự phòng khi Whisper model không tải được
+        self.recognizer = create_speech_recognizer()
+        if self.recognizer and not HAS_WHISPER:
+            print(f"🎙️ Sử dụng SpeechRecognition ({self.recognizer.name}) để tạo phụ đề")
         
-        if not HAS_WHISPER and not HAS_SPEECH_RECOGNITION:
+        if not HAS_WHISPER and not self.recognizer:
             raise ImportError(
                 "Cần cài đặt ít nhất một trong các thư viện: "
                 "openai-whisper hoặc SpeechRecognition"
             )
     
-    def generate_subtitle(self, audio_path, subtitle_output_path, language='vi', words_per_line=7):
+    def generate_subtitle(self, audio, subtitle_output_path=None, language='vi', words_per_line=7, task='transcribe'):
         """
-        Tạo phụ đề từ file audio
+        Tạo phụ đề từ audio
         
         Args:
-            audio_path (str): Đường dẫn đến file audio
-            subtitle_output_path (str): Đường dẫn lưu file phụ đề .srt
-            language (str): Mã ngôn ngữ (vi, en, etc.)        """
-        if self.whisper_model:            self._generate_with_whisper(audio_path, subtitle_output_path, language, words_per_line)
+            audio (PCMAudio | str): Audio 16 kHz mono đã giải mã, hoặc đường dẫn video/audio
+            subtitle_output_path (str): Đường dẫn lưu file phụ đề .srt (None = chỉ trả về CueList)
+            language (str): Mã ngôn ngữ (vi, en, etc.)
+            task (str): 'transcribe' hoặc 'translate' (Whisper dịch thẳng sang tiếng Anh)
+        
+        Returns:
+            CueList: Các dòng phụ đề đã chia
+        
+        Sau khi chạy, last_task cho biết phụ đề đã được dịch hay chưa
+        (SpeechRecognition không hỗ trợ 'translate').
+        """
+        self.used_default_subtitle = False
+        self.last_task = 'transcribe'
+        self.last_segments = None
+        if not isinstance(audio, PCMAudio):
+            audio = load_pcm_audio(audio)
+        
+        if self.use_whisper:
+            cues = self._generate_with_whisper(audio, language, words_per_line, task)
         elif self.recognizer:
-            self._generate_with_speech_recognition(audio_path, subtitle_output_path, language, words_per_line)
+            cues = self._generate_with_speech_recognition(audio, language, words_per_line)
         else:
             raise Exception("Không có engine nào để tạo phụ đề")
+        
+        if subtitle_output_path:
+            write_srt(cues, subtitle_output_path)
+        return cues
     
-    def _generate_with_whisper(self, audio_path, subtitle_output_path, language, words_per_line=7):
+    def supports_translate_task(self):
+        """Engine hiện tại có dịch thẳng sang tiếng Anh được không (chỉ Whisper)"""
+        return self.use_whisper
+    
+    def get_engine_info(self):
+        """Thông tin engine đang dùng (dùng làm tham số cache key)"""
+        if self.use_whisper:
+            return {
+                'engine': 'whisper',
+                'model': self.model_name or 'auto',
+                'profile': self.whisper_profile,
+                'budget': self.latency_budget
+            }
+        return {'engine': 'speech_recognition', 'backend': self.recognizer.name}
+    
+    def _load_whisper_model(self, model_name):
+        """Lấy Whisper model từ pool dùng chung (load lần đầu); tắt Whisper nếu lỗi"""
+        if self.use_whisper:
+            try:
+                self.whisper_model = get_whisper_pool().get_model(model_name)
+            except Exception as e:
+                print(f"⚠️ Không thể tải Whisper model: {e}")
+                self.use_whisper = False
+        return self.whisper_model
+    
+    def _generate_with_whisper(self, audio, language, words_per_line=7, task='transcribe'):
         """Tạo phụ đề sử dụng OpenAI Whisper"""
         try:
             print("🤖 Đang tạo phụ đề với Whisper...")
             
-            # Kiểm tra file audio có tồn tại và có nội dung không
-            if not os.path.exists(audio_path):
-                raise Exception(f"File audio không tồn tại: {audio_path}")
+            # Kiểm tra audio có nội dung không
+            if audio.duration < MIN_AUDIO_SECONDS:
+                print("⚠️ Audio trống hoặc quá ngắn, tạo phụ đề mặc định...")
+                return self._create_default_subtitle()
             
-            # Kiểm tra kích thước file audio
-            audio_size = os.path.getsize(audio_path)
-            if audio_size < 1024:  # File quá nhỏ (< 1KB)
-                print("⚠️ File audio trống hoặc quá nhỏ, tạo phụ đề mặc định...")
-                self._create_default_subtitle(subtitle_output_path)
-                return
+            # VAD: chỉ giữ các đoạn có tiếng nói, im lặng hoàn toàn thì không cần load model
+            spans = detect_speech_spans(audio)
+            if not spans:
+                print("⚠️ Không phát hiện được giọng nói, tạo phụ đề mặc định...")
+                return self._create_default_subtitle()
             
-            # Whisper xử lý trực tiếp file audio
-            result = self.whisper_model.transcribe(
-                audio_path, 
-                language=language if language != 'vi' else 'vietnamese'
-            )
+            speech_audio, timeline = self._compact_speech(audio, spans)
+            plan = self._plan_whisper(speech_audio)
+            
+            if not self._load_whisper_model(plan.model_name):
+                if self.recognizer:
+                    print("🎙️ Chuyển sang SpeechRecognition...")
+                    return self._generate_with_speech_recognition(audio, language, words_per_line)
+                raise Exception("Không có Whisper model")
+            audio = speech_audio
+            
+            whisper_language = language if language != 'vi' else 'vietnamese'
+            if self._should_transcribe_chunked(audio):
+                # Audio dài: chia đoạn tại điểm im lặng và transcribe song song nhiều process
+                result = transcribe_chunked(
+                    audio, plan.model_name,
+                    workers=self.stt_workers,
+                    language=whisper_language,
+                    task=task,
+                    **plan.decode_options
+                )
+            elif self.batch_server:
+                # Batch nhiều video: gộp cửa sổ với các video khác thành một lượt decode
+                result = self.batch_server.transcribe(
+                    audio, plan.model_name,
+                    language=whisper_language,
+                    task=task,
+                    **plan.decode_options
+                )
+            else:
+                # Whisper nhận trực tiếp mảng float32 16 kHz, không cần giải mã lại
+                # (mượn riêng một instance từ pool)
+                apply_torch_threads(plan.torch_threads)
+                with get_whisper_pool().acquire(plan.model_name) as model:
+                    result = model.transcribe(
+                        audio.to_float32(), 
+                        language=whisper_language,
+                        task=task,
+                        **plan.decode_options
+                    )
+            
+            # Đưa timestamp từ audio đã ghép về thời gian gốc của video
+            if timeline and result.get('segments'):
+                timeline.remap_segments(result['segments'])
             
             # Kiểm tra kết quả
             if not result.get('segments') or len(result['segments']) == 0:
                 print("⚠️ Không phát hiện được giọng nói, tạo phụ đề mặc định...")
-                self._create_default_subtitle(subtitle_output_path)
-                return
+                return self._create_default_subtitle()
             
-            # Chuyển đổi kết quả thành format SRT
-            srt_content = self._whisper_result_to_srt(result, words_per_line)
-            
-            # Lưu file SRT
-            with open(subtitle_output_path, 'w', encoding='utf-8') as f:
-                f.write(srt_content)
+            # Giữ segment nguyên câu, chia thành các dòng ngắn
+            self.last_segments = CueList.from_segments(result['segments'])
+            cues = self.segments_to_cues(self.last_segments, words_per_line)
+            self.last_task = task
             
             print(f"✅ Tạo phụ đề thành công với {len(result['segments'])} đoạn")
+            return cues
             
         except Exception as e:
             print(f"⚠️ Lỗi tạo phụ đề với Whisper: {str(e)}, tạo phụ đề mặc định...")
-            try:
-                self._create_default_subtitle(subtitle_output_path)
-            except Exception as e2:
-                raise Exception(f"Không thể tạo phụ đề: {str(e2)}")
+            return self._create_default_subtitle()
     
-    def _create_default_subtitle(self, subtitle_output_path):
-        """Tạo phụ đề mặc định cho video không có audio"""
-        default_srt = """1
-00:00:01,000 --> 00:00:05,000
-[Video không có âm thanh]
-
-2
-00:00:06,000 --> 00:00:10,000
-[No audio detected]
-"""
+    def iter_segments(self, audio, language='vi', task='transcribe'):
+        """
+        Transcribe và sinh segment dần theo từng cửa sổ audio (thời gian gốc của video)
+        
+        Dùng cho pipeline streaming: cửa sổ trước được dịch trong khi cửa sổ sau
+        còn đang transcribe. Khi generator chạy hết, last_segments/last_task/
+        used_default_subtitle có ý nghĩa như sau generate_subtitle
+        (không có tiếng nói thì không sinh ra gì và used_default_subtitle = True).
+        
+        Args:
+            audio (PCMAudio | str): Audio 16 kHz mono đã giải mã, hoặc đường dẫn video/audio
+            language (str): Mã ngôn ngữ
+            task (str): 'transcribe' hoặc 'translate'
+        
+        Yields:
+            CueList: Segment nguyên câu (chưa chia dòng) của một cửa sổ
+        """
+        self.used_default_subtitle = False
+        self.last_task = 'transcribe'
+        self.last_segments = None
+        if not isinstance(audio, PCMAudio):
+            audio = load_pcm_audio(audio)
+        
+        if self.use_whisper:
+            batches = self._iter_whisper_segments(audio, language, task)
+        elif self.recognizer:
+            batches = self._iter_speech_recognition_segments(audio, language)
+        else:
+            raise Exception("Không có engine nào để tạo phụ đề")
+        
+        segments = CueList()
+        for batch in batches:
+            if batch:
+                segments.extend(batch)
+                yield batch
+        
+        if segments:
+            self.last_segments = segments
+            print(f"✅ Tạo phụ đề thành công với {len(segments)} đoạn")
+        else:
+            print("⚠️ Không phát hiện được giọng nói, dùng phụ đề mặc định...")
+            self._create_default_subtitle()
+    
+    def _iter_whisper_segments(self, audio, language, task='transcribe'):
+        """Sinh segment Whisper theo từng cửa sổ (đã bỏ im lặng bằng VAD)"""
+        print("🤖 Đang tạo phụ đề với Whisper (streaming)...")
+        if audio.duration < MIN_AUDIO_SECONDS:
+            return
+        
+        spans = detect_speech_spans(audio)
+        if not spans:
+            return
+        
+        speech_audio, timeline = self._compact_speech(audio, spans)
+        plan = self._plan_whisper(speech_audio)
+        
+        if not self._load_whisper_model(plan.model_name):
+            if self.recognizer:
+                print("🎙️ Chuyển sang SpeechRecognition...")
+                yield from self._iter_speech_recognition_segments(audio, language)
+                return
+            raise Exception("Không có Whisper model")
+        audio = speech_audio
+        
+        whisper_language = language if language != 'vi' else 'vietnamese'
+        if self._should_transcribe_chunked(audio):
+            windows = iter_transcribe_chunked(
+                audio, plan.model_name,
+                workers=self.stt_workers,
+                language=whisper_language,
+                task=task,
+                **plan.decode_options
+            )
+        elif self.batch_server:
+            windows = [self.batch_server.transcribe(
+                audio, plan.model_name,
+                language=whisper_language,
+                task=task,
+                **plan.decode_options
+            )['segments']]
+        else:
+            apply_torch_threads(plan.torch_threads)
+            windows = iter_transcribe_windows(
+                audio, plan.model_name,
+                language=whisper_language,
+                task=task,
+                **plan.decode_options
+            )
         
-        with open(subtitle_output_path, 'w', encoding='utf-8') as f:
-            f.write(default_srt)
+        self.last_task = task
+        for window_segments in windows:
+            if timeline:
+                timeline.remap_segments(window_segments)
+            yield CueList.from_segments(window_segments)
+    
+    def _plan_whisper(self, audio):
+        """
+        Chọn model, cách decode và số luồng torch theo độ dài audio (sau VAD),
+        số nhân CPU và ngân sách thời gian (model_name cố định thì chỉ chọn cách decode)
+        """
+        models = (self.model_name,) if self.model_name else MODEL_SIZES
+        parallel = self.stt_workers if self._may_transcribe_chunked(audio) else 1
+        ensure_calibrated(models, audio, torch_threads=max(1, (os.cpu_count() or 1) // parallel))
+        plan = choose_whisper_plan(
+            audio.duration,
+            latency_budget=self.latency_budget,
+            profile=self.whisper_profile,
+            models=models,
+            concurrent_jobs=parallel
+        )
+        self.last_plan = plan
+        print(f"🧭 Whisper {plan.describe()} cho {audio.duration:.0f}s audio ({self.whisper_profile})")
+        return plan
+    
+    def _compact_speech(self, audio, spans):
+        """
+        Ghép các đoạn có tiếng nói thành audio ngắn hơn nếu im lặng chiếm đáng kể
         
-        print(f"✅ Tạo phụ đề mặc định: {subtitle_output_path}")
+        Returns:
+            tuple[PCMAudio, SpeechTimeline | None]: Audio để transcribe và timeline
+            để đưa timestamp về thời gian gốc (None nếu dùng nguyên audio)
+        """
+        speech_seconds = sum(span.duration for span in spans)
+        if speech_seconds >= audio.duration * FULL_AUDIO_RATIO:
+            return audio, None
+        timeline = SpeechTimeline(spans)
+        print(f"🔇 VAD: {len(spans)} đoạn có tiếng, {speech_seconds:.1f}s/{audio.duration:.1f}s")
+        return timeline.build_audio(audio), timeline
+    
+    def _may_transcribe_chunked(self, audio):
+        """
+        Audio đủ dài và có nhiều worker để chia đoạn (chưa xét thiết bị của model)
+        
+        Không chia đoạn khi chạy batch: model dùng chung qua batch_server/pool,
+        mỗi process con lại load riêng một model.
+        """
+        return (audio.duration >= CHUNKED_MIN_SECONDS and self.stt_workers > 1
+                and not self.batch_server)
+    
+    def _should_transcribe_chunked(self, audio):
+        """Chia đoạn song song khi audio dài, có nhiều worker và model chạy trên CPU"""
+        if not self._may_transcribe_chunked(audio):
+            return False
+        device = getattr(self.whisper_model, 'device', None)
+        return getattr(device, 'type', 'cpu') == 'cpu'
+    
+    def _create_default_subtitle(self):
+        """Tạo phụ đề mặc định cho video không có audio"""
+        self.used_default_subtitle = True
+        print("✅ Tạo phụ đề mặc định")
+        return CueList([
+            Cue(1.0, 5.0, "[Video không có âm thanh]"),
+            Cue(6.0, 10.0, "[No audio detected]")
+        ])
     
     def _whisper_result_to_srt(self, result, words_per_line=7):
         """Chuyển đổi kết quả Whisper thành format SRT với giới hạn từ mỗi dòng"""
-        srt_content = ""
-        subtitle_index = 1
+        return self.segments_to_srt(CueList.from_segments(result['segments']), words_per_line)
+    
+    def segments_to_srt(self, segments, words_per_line=7):
+        """Chia segment thành dòng ngắn, trả về nội dung SRT"""
+        return self.segments_to_cues(segments, words_per_line).to_srt()
+    
+    def segments_to_cues(self, segments, words_per_line=7):
+        """
+        Chia từng segment thành các dòng ngắn và phân bổ thời gian
         
-        for segment in result['segments']:
-            start_time = segment['start']
-            end_time = segment['end']
-            text = segment['text'].strip()
+        Dùng cho cả segment gốc lẫn segment đã dịch (chia dòng theo ngôn ngữ hiển thị).
+        
+        Args:
+            segments (CueList): Segment nguyên câu
+        
+        Returns:
+            CueList: Các dòng phụ đề
+        """
+        cues = CueList()
+        
+        for segment in segments:
+            start_time = segment.start
+            end_time = segment.end
+            text = segment.text.strip()
             
             # Chia text thành các dòng ngắn với số từ tùy chỉnh
             lines = self._split_text_into_lines(text, max_words_per_line=words_per_line)
@@ -145,103 +391,70 @@ class SubtitleGenerator:
             for i, line in enumerate(lines):
                 line_start = start_time + (i * time_per_line)
                 line_end = start_time + ((i + 1) * time_per_line)
-                
-                srt_start_time = self._seconds_to_srt_time(line_start)
-                srt_end_time = self._seconds_to_srt_time(line_end)
-                
-                srt_content += f"{subtitle_index}\n"
-                srt_content += f"{srt_start_time} --> {srt_end_time}\n"
-                srt_content += f"{line}\n\n"
-                
-                subtitle_index += 1
+                cues.append(Cue(line_start, line_end, line))
         
-        return srt_content
+        return cues
     
-    def _generate_with_speech_recognition(self, audio_path, subtitle_output_path, language, words_per_line=7):
+    def _generate_with_speech_recognition(self, audio, language, words_per_line=7):
         """Tạo phụ đề sử dụng SpeechRecognition (phương pháp dự phòng)"""
         try:
             print("🎙️ Đang tạo phụ đề với SpeechRecognition...")
             
-            # Chuyển đổi audio thành wav nếu cần
-            audio = AudioSegment.from_file(audio_path)
+            if audio.duration < MIN_AUDIO_SECONDS:
+                print("⚠️ Audio trống hoặc quá ngắn, tạo phụ đề mặc định...")
+                return self._create_default_subtitle()
             
-            # Chia audio thành các đoạn nhỏ (30 giây mỗi đoạn)
-            chunk_length_ms = 30000  # 30 seconds
-            chunks = [audio[i:i + chunk_length_ms] 
-                     for i in range(0, len(audio), chunk_length_ms)]
+            segments = CueList()
+            for chunk_segments in self._iter_speech_recognition_segments(audio, language):
+                segments.extend(chunk_segments)
             
-            srt_content = ""
-            
-            for i, chunk in enumerate(chunks):
-                try:
-                    # Lưu chunk tạm thời
-                    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                        chunk.export(temp_file.name, format="wav")
-                        
-                        # Nhận dạng giọng nói
-                        with sr.AudioFile(temp_file.name) as source:
-                            audio_data = self.recognizer.record(source)
-                            
-                        # Chọn engine dựa trên ngôn ngữ
-                        if language == 'vi':
-                            text = self.recognizer.recognize_google(
-                                audio_data, language='vi-VN'
-                            )
-                        else:
-                            text = self.recognizer.recognize_google(
-                                audio_data, language=language
-                            )
-                          # Tính toán thời gian
-                        start_seconds = i * 30
-                        end_seconds = min((i + 1) * 30, len(audio) / 1000)
-                          # Chia text thành các dòng ngắn với số từ tùy chỉnh
-                        lines = self._split_text_into_lines(text, max_words_per_line=words_per_line)
-                        
-                        if lines:
-                            # Phân bổ thời gian cho từng dòng
-                            segment_duration = end_seconds - start_seconds
-                            time_per_line = segment_duration / len(lines)
-                            
-                            for j, line in enumerate(lines):
-                                line_start = start_seconds + (j * time_per_line)
-                                line_end = start_seconds + ((j + 1) * time_per_line)
-                                
-                                line_start_time = self._seconds_to_srt_time(line_start)
-                                line_end_time = self._seconds_to_srt_time(line_end)
-                                
-                                # Thêm vào nội dung SRT với index liên tục
-                                subtitle_count = len([x for x in srt_content.split('\n\n') if x.strip()]) + 1
-                                srt_content += f"{subtitle_count}\n"
-                                srt_content += f"{line_start_time} --> {line_end_time}\n"
-                                srt_content += f"{line}\n\n"
-                        
-                        # Xóa file tạm
-                        os.unlink(temp_file.name)
-                        
-                except sr.UnknownValueError:
-                    # Bỏ qua đoạn không nhận dạng được
-                    continue
-                except Exception as e:
-                    print(f"⚠️ Lỗi xử lý đoạn {i}: {e}")
-                    continue
+            if not segments:
+                print("⚠️ Không nhận dạng được đoạn nào, tạo phụ đề mặc định...")
+                return self._create_default_subtitle()
             
-            # Lưu file SRT
-            with open(subtitle_output_path, 'w', encoding='utf-8') as f:
-                f.write(srt_content)
+            self.last_segments = segments
             
-            print(f"✅ Tạo phụ đề thành công với {len(chunks)} đoạn")
+            print(f"✅ Tạo phụ đề thành công với {len(segments)} đoạn")
+            return self.segments_to_cues(segments, words_per_line)
             
         except Exception as e:
             raise Exception(f"Lỗi tạo phụ đề với SpeechRecognition: {str(e)}")
     
+    def _iter_speech_recognition_segments(self, audio, language):
+        """
+        Nhận dạng các đoạn 30 giây song song (tối đa sr_workers request cùng lúc),
+        sinh CueList segment của từng đoạn theo đúng thứ tự thời gian
+        """
+        if audio.duration < MIN_AUDIO_SECONDS:
+            return
+        
+        # Chia audio thành các đoạn nhỏ (30 giây mỗi đoạn) ngay trong bộ nhớ
+        chunk_starts = range(0, int(audio.duration) + 1, SR_CHUNK_SECONDS)
+        chunks = [(start, audio.slice(start, start + SR_CHUNK_SECONDS)) for start in chunk_starts]
+        chunks = [(start, chunk) for start, chunk in chunks if not chunk.is_empty]
+        if not chunks:
+            return
+        
+        workers = max(1, min(self.sr_workers, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self.recognizer.recognize, chunk, language)
+                for _, chunk in chunks
+            ]
+            # Lấy kết quả theo thứ tự đoạn để segment đúng thứ tự dù request xong lệch nhau
+            for i, ((start_seconds, chunk), future) in enumerate(zip(chunks, futures)):
+                try:
+                    text = future.result()
+                except Exception as e:
+                    print(f"⚠️ Lỗi xử lý đoạn {i}: {e}")
+                    continue
+                # Mỗi đoạn 30 giây là một segment, chia dòng khi ghi SRT
+                if text and text.strip():
+                    yield CueList([Cue(start_seconds, start_seconds + chunk.duration, text.strip())])
+    
     def _seconds_to_srt_time(self, seconds):
         """Chuyển đổi giây thành định dạng thời gian SRT (HH:MM:SS,mmm)"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        milliseconds = int((seconds % 1) * 1000)
-        
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+        return format_srt_time(seconds)
     
     def _split_text_into_lines(self, text, max_words_per_line=7):
         """Chia text thành các dòng ngắn với tối đa số từ cho trước"""
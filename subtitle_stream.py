@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module pipeline phụ đề streaming: dịch trong khi vẫn đang transcribe
+STT (CPU) sinh segment theo từng cửa sổ vào hàng đợi có giới hạn, một luồng dịch
+(chờ mạng) lấy ra dịch ngay; thời gian mỗi video ≈ max(STT, dịch) thay vì tổng.
+"""
+
+import os
+import queue
+import threading
+
+from subtitle_cues import CueList
+
+# Số cửa sổ segment tối đa chờ dịch (EDITVIDEO_STREAM_QUEUE); STT chờ khi hàng đợi đầy
+DEFAULT_QUEUE_SIZE = int(os.environ.get("EDITVIDEO_STREAM_QUEUE", "4"))
+
+# Chỉ streaming khi audio dài hơn mức này (giây); video ngắn transcribe một lần cho đủ ngữ cảnh
+STREAM_MIN_SECONDS = 120
+
+_DONE = object()
+
+
+def transcribe_and_translate(segment_batches, translate_batch, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Chạy STT và dịch chồng lên nhau qua một hàng đợi có giới hạn
+
+    STT chạy ở luồng gọi hàm (vòng lặp segment_batches), dịch chạy ở một luồng riêng
+    theo đúng thứ tự cửa sổ. Lỗi dịch của một cửa sổ thì giữ nguyên văn bản gốc
+    của cửa sổ đó; lỗi STT được ném lại sau khi luồng dịch đã dừng.
+
+    Args:
+        segment_batches (iterable[CueList]): Segment của từng cửa sổ theo thứ tự thời gian
+        translate_batch (callable): CueList segment → (CueList segment đã dịch, dịch đủ hay không)
+        queue_size (int): Số cửa sổ tối đa chờ dịch
+
+    Returns:
+        tuple[CueList, CueList, bool]: (segment gốc, segment đã dịch, mọi cửa sổ đều dịch
+        được) của toàn bộ video
+    """
+    pending = queue.Queue(maxsize=max(1, queue_size))
+    translated = CueList()
+    status = {'complete': True}
+
+    def translate_worker():
+        while True:
+            batch = pending.get()
+            if batch is _DONE:
+                return
+            try:
+                batch_translated, batch_complete = translate_batch(batch)
+                translated.extend(batch_translated)
+                if not batch_complete:
+                    status['complete'] = False
+            except Exception as e:
+                print(f"⚠️ Lỗi dịch {len(batch)} đoạn: {e}, giữ nguyên văn bản gốc")
+                translated.extend(batch)
+                status['complete'] = False
+
+    worker = threading.Thread(target=translate_worker, name="subtitle-translate", daemon=True)
+    worker.start()
+
+    segments = CueList()
+    try:
+        for batch in segment_batches:
+            if not batch:
+                continue
+            segments.extend(batch)
+            pending.put(batch)
+    finally:
+        pending.put(_DONE)
+        worker.join()
+
+    return segments, translated, status['complete']
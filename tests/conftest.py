@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Cho phép test import các module ở thư mục gốc dự án"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
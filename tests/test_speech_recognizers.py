@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Pipeline SpeechRecognition chạy offline với StubSpeechRecognizer"""
+
+import numpy as np
+import pytest
+
+import subtitle_generator
+from audio_source import PCMAudio, STT_SAMPLE_RATE
+from speech_recognizers import StubSpeechRecognizer
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr(subtitle_generator, 'HAS_WHISPER', False)
+    monkeypatch.setattr(subtitle_generator, 'create_speech_recognizer',
+                        lambda: StubSpeechRecognizer(latency=0.01))
+    return subtitle_generator.SubtitleGenerator()
+
+
+def _audio(seconds, value):
+    return PCMAudio(np.full(int(seconds * STT_SAMPLE_RATE), value, dtype=np.int16))
+
+
+def test_chunks_recognized_in_order(generator):
+    cues = generator.generate_subtitle(_audio(65, 1000), language='vi')
+
+    segments = generator.last_segments
+    assert [cue.start for cue in segments] == [0, 30, 60]
+    assert segments[-1].end == pytest.approx(65)
+    assert segments[0].text == "[vi] 30.0s"
+    assert cues and not generator.used_default_subtitle
+
+
+def test_nothing_recognized_falls_back_to_default_subtitle(generator):
+    cues = generator.generate_subtitle(_audio(40, 0), language='vi')
+
+    assert generator.used_default_subtitle
+    assert len(cues) > 0
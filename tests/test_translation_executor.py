@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Token bucket và backoff Retry-After chạy với server dịch giả lập"""
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from mock_translation_server import serve_in_thread
+from translation_executor import RateLimitedError, TokenBucket, call_with_retry, run_ordered
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(**kwargs):
+        server = serve_in_thread(port=0, latency=0.0, **kwargs)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _translate(url, text):
+    request = urllib.request.Request(
+        f"{url}/translate",
+        data=json.dumps({'q': text, 'source': 'vi', 'target': 'en'}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())['translatedText']
+    except urllib.error.HTTPError as e:
+        if e.code == 429:
+            raise RateLimitedError("HTTP 429", float(e.headers.get('Retry-After')))
+        raise
+
+
+def _stats(url):
+    with urllib.request.urlopen(f"{url}/stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def test_retry_after_backoff_recovers_from_429(start_server):
+    url = start_server(rate=5, burst=2)
+    texts = [f"câu {i}" for i in range(8)]
+
+    results = run_ordered(lambda text: call_with_retry(lambda: _translate(url, text), retries=10),
+                          texts, max_workers=4)
+
+    assert results == [f"CÂU {i} (en)" for i in range(8)]
+    stats = _stats(url)
+    assert stats['rate_limited'] > 0
+    assert stats['requests'] == len(texts) + stats['rate_limited']
+
+
+def test_token_bucket_stays_under_server_limit(start_server):
+    url = start_server(rate=10, burst=2)
+    limiter = TokenBucket(rate=5, capacity=1)
+    texts = [f"câu {i}" for i in range(6)]
+
+    results = run_ordered(lambda text: call_with_retry(lambda: _translate(url, text), limiter),
+                          texts, max_workers=4)
+
+    assert results == [f"CÂU {i} (en)" for i in range(6)]
+    assert _stats(url) == {'requests': 6, 'rate_limited': 0, 'errors': 0,
+                           'translated_chars': sum(len(text) for text in texts)}
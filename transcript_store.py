@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module kho transcript theo fingerprint audio (SQLite)
+Cùng một voice-over dưới nhiều bản dựng hình khác nhau: file khác nên hash nội dung
+không trùng, nhưng fingerprint audio trùng → dùng lại segment đã transcribe
+(dịch thời gian nếu bản mới bị cắt bớt đầu) thay vì chạy lại Whisper.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from audio_fingerprint import score_match
+from subtitle_cues import Cue, CueList
+
+# File SQLite mặc định (EDITVIDEO_TRANSCRIPT_STORE), cạnh bộ nhớ dịch
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "editvideo_transcripts.sqlite3")
+
+# Sai số cho phép khi bản mới bị cắt (giây)
+TRIM_TOLERANCE_SECONDS = 0.5
+
+# Giữ tối đa số transcript này (xóa transcript ít dùng gần đây nhất)
+DEFAULT_MAX_TRANSCRIPTS = int(os.environ.get("EDITVIDEO_TRANSCRIPT_MAX", "2000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    params TEXT NOT NULL,
+    duration REAL NOT NULL,
+    segments TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprint_hashes (
+    hash INTEGER NOT NULL,
+    transcript_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_hash ON fingerprint_hashes (hash);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_transcript ON fingerprint_hashes (transcript_id);
+"""
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+class TranscriptStore:
+    """Kho transcript tra theo fingerprint (mỗi luồng một connection, WAL cho nhiều process)"""
+
+    def __init__(self, db_path=None, max_transcripts=DEFAULT_MAX_TRANSCRIPTS):
+        self.db_path = db_path or os.environ.get("EDITVIDEO_TRANSCRIPT_STORE", DEFAULT_STORE_PATH)
+        self.max_transcripts = max_transcripts
+        self._local = threading.local()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def find(self, fingerprint, params):
+        """
+        Tìm transcript của audio trùng (trùng khớp hoặc là đoạn cắt từ audio đã lưu)
+
+        Args:
+            fingerprint (Fingerprint): Fingerprint audio cần tạo phụ đề
+            params (dict): Tham số tạo phụ đề (ngôn ngữ, task, engine) - phải giống hệt
+
+        Returns:
+            CueList | None: Segment theo thời gian của audio truy vấn
+        """
+        if fingerprint.is_empty:
+            return None
+        conn = self._connection()
+        params_key = _params_key(params)
+        candidates = {}
+        values = sorted({value for value, _ in fingerprint.hashes})
+        # SQLite giới hạn số tham số mỗi câu lệnh
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT h.transcript_id, h.hash, h.frame FROM fingerprint_hashes h "
+                f"JOIN transcripts t ON t.id = h.transcript_id "
+                f"WHERE t.params = ? AND h.hash IN ({placeholders})",
+                (params_key, *chunk)
+            ).fetchall()
+            for transcript_id, value, frame in rows:
+                candidates.setdefault(transcript_id, {}).setdefault(value, []).append(frame)
+
+        best = None
+        for transcript_id, stored_frames in candidates.items():
+            match = score_match(fingerprint, stored_frames)
+            if match and (best is None or match.score > best[1].score):
+                best = (transcript_id, match)
+        if best is None:
+            return None
+
+        transcript_id, match = best
+        duration, segments_json = conn.execute(
+            "SELECT duration, segments FROM transcripts WHERE id = ?", (transcript_id,)
+        ).fetchone()
+        # Chỉ dùng lại khi audio truy vấn nằm trọn trong audio đã lưu
+        if match.offset < -TRIM_TOLERANCE_SECONDS or \
+                match.offset + fingerprint.duration > duration + TRIM_TOLERANCE_SECONDS:
+            return None
+
+        with conn:
+            conn.execute("UPDATE transcripts SET last_used_at = ? WHERE id = ?", (time.time(), transcript_id))
+
+        offset = max(match.offset, 0.0)
+        segments = CueList()
+        for start, end, text in json.loads(segments_json):
+            start, end = start - offset, end - offset
+            if end <= 0 or start >= fingerprint.duration:
+                continue
+            segments.append(Cue(max(start, 0.0), min(end, fingerprint.duration), text))
+        print(f"🔁 Audio trùng transcript đã có (khớp {match.score:.0%}, lệch {match.offset:.2f}s)")
+        return segments
+
+    def add(self, fingerprint, params, segments):
+        """Lưu segment (CueList) của audio kèm fingerprint"""
+        if fingerprint.is_empty or not segments:
+            return
+        now = time.time()
+        segments_json = json.dumps([(cue.start, cue.end, cue.text) for cue in segments], ensure_ascii=False)
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO transcripts (params, duration, segments, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (_params_key(params), fingerprint.duration, segments_json, now, now)
+            )
+            transcript_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO fingerprint_hashes (hash, transcript_id, frame) VALUES (?, ?, ?)",
+                [(value, transcript_id, frame) for value, frame in fingerprint.hashes]
+            )
+        self.evict()
+
+    def evict(self):
+        """Xóa transcript ít dùng gần đây nhất khi vượt max_transcripts"""
+        if not self.max_transcripts:
+            return
+        with self._connection() as conn:
+            stale = [row[0] for row in conn.execute(
+                "SELECT id FROM transcripts ORDER BY last_used_at DESC LIMIT -1 OFFSET ?",
+                (self.max_transcripts,)
+            )]
+            for transcript_id in stale:
+                conn.execute("DELETE FROM fingerprint_hashes WHERE transcript_id = ?", (transcript_id,))
+                conn.execute("DELETE FROM transcripts WHERE id = ?", (transcript_id,))
+
+    def clear(self):
+        """Xóa toàn bộ kho transcript"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM fingerprint_hashes")
+            conn.execute("DELETE FROM transcripts")
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_transcript_store():
+    """TranscriptStore dùng chung, None nếu không mở được database"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            try:
+                _shared_store = TranscriptStore()
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Không thể mở kho transcript: {e}")
+                _shared_store = False
+        return _shared_store or None
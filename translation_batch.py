@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module gộp nhiều câu phụ đề vào một request dịch
+Mỗi câu được đánh dấu bằng [[n]] (đã escape để nội dung không trùng dấu phân cách),
+sau khi dịch tách lại theo dấu và kiểm tra đủ, đúng thứ tự.
+"""
+
+import re
+from typing import List, Optional
+
+# Giới hạn ký tự mỗi request (Google Translate giới hạn ~5000 ký tự)
+DEFAULT_CHAR_BUDGET = 4000
+
+_MARKER = "[[{}]]"
+_LINE_BREAK = "[[br]]"
+_MARKER_PATTERN = re.compile(r"\[\[\s*(\d+)\s*\]\]")
+_LINE_BREAK_PATTERN = re.compile(r"\s*\[\[\s*br\s*\]\]\s*", re.IGNORECASE)
+
+
+def _escape(text: str) -> str:
+    """Tách '[[' / ']]' trong nội dung để không bị nhầm với dấu phân cách"""
+    text = text.replace("[[", "[ [").replace("]]", "] ]")
+    return text.replace("\r\n", "\n").replace("\n", f" {_LINE_BREAK} ")
+
+
+def _unescape(text: str) -> str:
+    text = _LINE_BREAK_PATTERN.sub("\n", text).strip()
+    return text.replace("[ [", "[[").replace("] ]", "]]")
+
+
+def encode_batch(texts: List[str]) -> str:
+    """Ghép các câu thành một văn bản, mỗi câu một dòng có dấu [[n]] phía trước"""
+    return "\n".join(f"{_MARKER.format(i)} {_escape(text)}" for i, text in enumerate(texts))
+
+
+def decode_batch(translated: str, count: int) -> Optional[List[str]]:
+    """
+    Tách văn bản đã dịch thành từng câu
+
+    Returns:
+        list[str] | None: Các câu đã dịch, None nếu dấu phân cách bị mất/sai thứ tự
+    """
+    if not translated:
+        return None
+    parts = _MARKER_PATTERN.split(translated)
+    # parts = [phần trước dấu đầu, idx0, text0, idx1, text1, ...]
+    if parts[0].strip():
+        return None
+    indices = [int(index) for index in parts[1::2]]
+    if indices != list(range(count)):
+        return None
+    texts = [_unescape(text) for text in parts[2::2]]
+    if any(not text for text in texts):
+        return None
+    return texts
+
+
+def pack_batches(texts: List[str], char_budget=DEFAULT_CHAR_BUDGET) -> List[List[int]]:
+    """
+    Chia chỉ số các câu thành các batch không vượt quá char_budget ký tự (đã mã hóa)
+
+    Câu rỗng bị bỏ qua (không cần dịch); câu dài hơn budget đứng một mình.
+    """
+    batches = []
+    current = []
+    current_size = 0
+    for index, text in enumerate(texts):
+        if not text.strip():
+            continue
+        size = len(_escape(text)) + len(_MARKER.format(len(current))) + 2
+        if current and current_size + size > char_budget:
+            batches.append(current)
+            current = []
+            current_size = 0
+        current.append(index)
+        current_size += size
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module chạy request dịch song song
+Giới hạn tốc độ bằng token bucket dùng chung cho mọi worker trong process,
+thử lại với backoff ngẫu nhiên (jitter) khi bị 429/lỗi mạng, kết quả giữ đúng thứ tự.
+"""
+
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Số request dịch đồng thời (EDITVIDEO_TRANSLATE_WORKERS)
+DEFAULT_WORKERS = int(os.environ.get("EDITVIDEO_TRANSLATE_WORKERS", "4"))
+
+# Tốc độ trung bình (request/giây) và số request dồn tối đa (EDITVIDEO_TRANSLATE_RATE / _BURST)
+DEFAULT_RATE = float(os.environ.get("EDITVIDEO_TRANSLATE_RATE", "5"))
+DEFAULT_BURST = int(os.environ.get("EDITVIDEO_TRANSLATE_BURST", "10"))
+
+# Thử lại: số lần, thời gian chờ cơ sở và tối đa (giây)
+DEFAULT_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+
+class RateLimitedError(Exception):
+    """Backend báo vượt giới hạn tốc độ (HTTP 429)"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket an toàn luồng: acquire() chặn tới khi có token"""
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Lấy token, chờ nếu bucket đang cạn (rate <= 0 nghĩa là không giới hạn)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, tokens=1):
+        """Lấy token nếu có ngay, không chờ"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def penalize(self, seconds):
+        """Backend báo 429: rút cạn bucket để mọi worker cùng chậm lại"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Thời gian chờ trước lần thử lại thứ attempt (full jitter, tôn trọng Retry-After)"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def call_with_retry(func, limiter=None, retries=DEFAULT_RETRIES):
+    """
+    Gọi func() qua limiter, thử lại với backoff khi lỗi
+
+    Args:
+        func (callable): Hàm gửi request (ném RateLimitedError khi bị 429)
+        limiter (TokenBucket): Bộ giới hạn tốc độ dùng chung
+        retries (int): Số lần thử lại tối đa
+
+    Returns:
+        Kết quả của func()
+    """
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire()
+        try:
+            return func()
+        except RateLimitedError as e:
+            if attempt >= retries:
+                raise
+            delay = backoff_delay(attempt, e.retry_after)
+            if limiter:
+                # Phạt cả bucket: lần acquire() kế tiếp (của mọi worker) sẽ tự chờ
+                limiter.penalize(delay)
+                delay = 0
+        except Exception:
+            if attempt >= retries:
+                raise
+            delay = backoff_delay(attempt)
+        attempt += 1
+        time.sleep(delay)
+
+
+def run_ordered(func, items, max_workers=DEFAULT_WORKERS):
+    """
+    Chạy func(item) song song, trả kết quả đúng thứ tự items
+
+    Lỗi của một item được trả về dưới dạng exception (không dừng các item khác).
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [_capture(func, item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(lambda item: _capture(func, item), items))
+
+
+def _capture(func, item):
+    try:
+        return func(item)
+    except Exception as e:
+        return e
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_translation_limiter():
+    """TokenBucket dùng chung cho mọi Translator trong process"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TokenBucket()
+        return _shared_limiter
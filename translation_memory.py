@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module bộ nhớ dịch (translation memory) lưu trong SQLite
+Key = (ngôn ngữ gốc, ngôn ngữ đích, backend, văn bản đã chuẩn hóa);
+dùng chung an toàn giữa nhiều luồng/process batch, xóa theo TTL và số mục tối đa.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+
+# File SQLite mặc định (có thể đổi bằng biến môi trường EDITVIDEO_TM_PATH).
+# Không đặt trong thư mục ArtifactCache vì thư mục đó bị xóa theo LRU.
+DEFAULT_TM_PATH = os.path.join(os.path.expanduser("~"), ".cache", "editvideo_translation_memory.sqlite3")
+
+# Mục không dùng quá TTL bị xóa (EDITVIDEO_TM_TTL_DAYS), giới hạn số mục (EDITVIDEO_TM_MAX_ENTRIES)
+DEFAULT_TTL_DAYS = 90
+DEFAULT_MAX_ENTRIES = 200000
+
+# Chạy dọn dẹp sau mỗi số lần ghi này
+EVICT_EVERY_WRITES = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    text_key TEXT NOT NULL,
+    translated_text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source_lang, target_lang, backend, text_key)
+);
+CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used_at);
+"""
+
+
+def normalize_text(text):
+    """Chuẩn hóa văn bản làm key: Unicode NFC, gộp khoảng trắng"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class TranslationMemory:
+    """Bộ nhớ dịch SQLite dùng chung (mỗi luồng một connection, WAL cho nhiều process)"""
+
+    def __init__(self, db_path=None, ttl_days=None, max_entries=None):
+        self.db_path = db_path or os.environ.get("EDITVIDEO_TM_PATH", DEFAULT_TM_PATH)
+        if ttl_days is None:
+            ttl_days = float(os.environ.get("EDITVIDEO_TM_TTL_DAYS", DEFAULT_TTL_DAYS))
+        if max_entries is None:
+            max_entries = int(os.environ.get("EDITVIDEO_TM_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.ttl_seconds = ttl_days * 86400 if ttl_days else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+        self.evict()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup_many(self, texts, source_lang, target_lang, backend):
+        """
+        Tra nhiều câu cùng lúc
+
+        Returns:
+            dict: {văn bản gốc: bản dịch} cho các câu có trong bộ nhớ
+        """
+        keys = {}
+        for text in texts:
+            if text.strip():
+                keys.setdefault(normalize_text(text), []).append(text)
+        if not keys:
+            return {}
+
+        found = {}
+        conn = self._connection()
+        key_list = list(keys)
+        # SQLite giới hạn số tham số mỗi câu lệnh
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT text_key, translated_text FROM translations "
+                f"WHERE source_lang=? AND target_lang=? AND backend=? AND text_key IN ({placeholders})",
+                (source_lang, target_lang, backend, *chunk)
+            ).fetchall()
+            found.update(rows)
+
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "UPDATE translations SET hits=hits+1, last_used_at=? "
+                "WHERE source_lang=? AND target_lang=? AND backend=? AND text_key=?",
+                [(now, source_lang, target_lang, backend, key) for key in found]
+            )
+
+        result = {}
+        for key, originals in keys.items():
+            if key in found:
+                for text in originals:
+                    result[text] = found[key]
+        with self._lock:
+            self.hits += sum(len(keys[key]) for key in found)
+            self.misses += sum(len(originals) for key, originals in keys.items() if key not in found)
+        return result
+
+    def lookup(self, text, source_lang, target_lang, backend):
+        """Tra một câu, None nếu chưa có"""
+        return self.lookup_many([text], source_lang, target_lang, backend).get(text)
+
+    def store_many(self, pairs, source_lang, target_lang, backend):
+        """
+        Lưu các cặp (văn bản gốc, bản dịch)
+
+        Args:
+            pairs (iterable[tuple[str, str]]): Các cặp cần lưu
+        """
+        now = time.time()
+        rows = [
+            (source_lang, target_lang, backend, normalize_text(text), translated, now, now)
+            for text, translated in pairs
+            if text.strip() and translated.strip()
+        ]
+        if not rows:
+            return
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO translations "
+                "(source_lang, target_lang, backend, text_key, translated_text, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(source_lang, target_lang, backend, text_key) "
+                "DO UPDATE SET translated_text=excluded.translated_text, last_used_at=excluded.last_used_at",
+                rows
+            )
+
+        with self._lock:
+            self._writes += len(rows)
+            should_evict = self._writes >= EVICT_EVERY_WRITES
+            if should_evict:
+                self._writes = 0
+        if should_evict:
+            self.evict()
+
+    def store(self, text, translated, source_lang, target_lang, backend):
+        self.store_many([(text, translated)], source_lang, target_lang, backend)
+
+    def evict(self):
+        """Xóa mục quá TTL, sau đó xóa mục ít dùng gần đây nhất nếu vượt max_entries"""
+        with self._connection() as conn:
+            if self.ttl_seconds:
+                conn.execute("DELETE FROM translations WHERE last_used_at < ?",
+                             (time.time() - self.ttl_seconds,))
+            if self.max_entries:
+                conn.execute(
+                    "DELETE FROM translations WHERE rowid IN ("
+                    "SELECT rowid FROM translations ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def get_stats(self):
+        """Số hit/miss của process hiện tại và số mục trong bộ nhớ"""
+        count = self._connection().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': count}
+
+    def clear(self):
+        """Xóa toàn bộ bộ nhớ dịch"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM translations")
+
+
+_shared_memory = None
+_shared_memory_lock = threading.Lock()
+
+
+def get_translation_memory():
+    """TranslationMemory dùng chung, None nếu không mở được database"""
+    global _shared_memory
+    with _shared_memory_lock:
+        if _shared_memory is None:
+            try:
+                _shared_memory = TranslationMemory()
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Không thể mở bộ nhớ dịch: {e}")
+                _shared_memory = False
+        return _shared_memory or None
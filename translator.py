@@ -4,8 +4,8 @@
 Module dịch phụ đề từ ngôn ngữ gốc sang tiếng Anh
 """
 
-import re
-import time
+import os
+import threading
 from pathlib import Path
 
 try:
@@ -20,20 +20,60 @@ try:
 except ImportError:
     HAS_REQUESTS = False
 
+from subtitle_cues import read_subtitles, write_srt
+from translation_batch import DEFAULT_CHAR_BUDGET, decode_batch, encode_batch, pack_batches
+from translation_memory import get_translation_memory
+from translation_executor import (
+    DEFAULT_WORKERS, RateLimitedError, call_with_retry, get_translation_limiter, run_ordered
+)
+
+# Tên backend lưu trong bộ nhớ dịch
+GOOGLE_BACKEND = 'googletrans'
+HTTP_BACKEND = 'libretranslate'
+
+# API dịch HTTP tương thích LibreTranslate (vd: mock_translation_server.py), ưu tiên hơn googletrans
+TRANSLATE_URL_ENV = "EDITVIDEO_TRANSLATE_URL"
+HTTP_TIMEOUT = 30
+
 class Translator:
     def __init__(self):
         self.google_translator = None
+        self.http_endpoint = os.environ.get(TRANSLATE_URL_ENV) if HAS_REQUESTS else None
+        self.char_budget = DEFAULT_CHAR_BUDGET  # Số ký tự tối đa mỗi request dịch
+        self.max_workers = DEFAULT_WORKERS      # Số request dịch đồng thời
+        self.limiter = get_translation_limiter()  # Token bucket dùng chung trong process
+        self._local = threading.local()
+        self._owner_thread = threading.get_ident()
         
-        if HAS_GOOGLETRANS:
+        if self.http_endpoint:
+            print(f"🌐 Sử dụng API dịch HTTP: {self.http_endpoint}")
+        elif HAS_GOOGLETRANS:
             try:
                 self.google_translator = GoogleTranslator()
                 print("🌐 Sử dụng Google Translate API")
             except Exception as e:
                 print(f"⚠️ Không thể khởi tạo Google Translator: {e}")
                 self.google_translator = None
-        
-        if not HAS_GOOGLETRANS:
+        else:
             print("⚠️ Cần cài đặt googletrans để sử dụng tính năng dịch")
+        
+        if self.http_endpoint:
+            self.backend_name = HTTP_BACKEND
+        elif self.google_translator:
+            self.backend_name = GOOGLE_BACKEND
+        else:
+            self.backend_name = None
+        
+        # Bộ nhớ dịch dùng chung: câu đã dịch trước đó không cần gọi mạng
+        self.memory = get_translation_memory() if self.backend_name else None
+    
+    def get_engine_info(self):
+        """Thông tin engine dịch (dùng làm tham số cache key), None nếu chỉ giữ nguyên văn bản"""
+        if self.backend_name == HTTP_BACKEND:
+            return {'engine': HTTP_BACKEND, 'endpoint': self.http_endpoint, 'batch_chars': self.char_budget}
+        if self.backend_name:
+            return {'engine': GOOGLE_BACKEND, 'batch_chars': self.char_budget}
+        return None
     
     def translate_subtitle(self, input_subtitle_path, output_subtitle_path, 
                           source_lang='vi', target_lang='en'):
@@ -47,70 +87,174 @@ class Translator:
             target_lang (str): Mã ngôn ngữ đích
         """
         try:
-            print(f"🌐 Đang dịch phụ đề từ {source_lang} sang {target_lang}...")
-            
-            # Đọc file phụ đề gốc
-            with open(input_subtitle_path, 'r', encoding='utf-8') as f:
-                srt_content = f.read()
-            
-            # Phân tích và dịch từng đoạn phụ đề
-            translated_srt = self._translate_srt_content(
-                srt_content, source_lang, target_lang
-            )
-            
-            # Lưu file phụ đề đã dịch
-            with open(output_subtitle_path, 'w', encoding='utf-8') as f:
-                f.write(translated_srt)
+            cues = read_subtitles(input_subtitle_path)
+            if not cues:
+                raise Exception("Không thể phân tích file phụ đề")
             
+            write_srt(self.translate_cues(cues, source_lang, target_lang), output_subtitle_path)
             print(f"✅ Dịch phụ đề thành công: {output_subtitle_path}")
             
         except Exception as e:
             raise Exception(f"Lỗi dịch phụ đề: {str(e)}")
     
-    def _translate_srt_content(self, srt_content, source_lang, target_lang):
+    def translate_cues(self, cues, source_lang='vi', target_lang='en'):
         """
-        Dịch nội dung file SRT
+        Dịch danh sách cue (giữ nguyên thời gian)
         
         Args:
-            srt_content (str): Nội dung file SRT
-            source_lang (str): Ngôn ngữ gốc
-            target_lang (str): Ngôn ngữ đích
+            cues (CueList): Các dòng phụ đề hoặc segment nguyên câu
+            source_lang (str): Mã ngôn ngữ gốc
+            target_lang (str): Mã ngôn ngữ đích
             
         Returns:
-            str: Nội dung SRT đã dịch
+            CueList: Cue mới với nội dung đã dịch
         """
-        # Regex để tách các thành phần của SRT
-        srt_pattern = r'(\d+)\s*\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\s*\n(.*?)(?=\n\d+\s*\n|\n*$)'
+        return self.translate_cues_checked(cues, source_lang, target_lang)[0]
+    
+    def translate_cues_checked(self, cues, source_lang='vi', target_lang='en'):
+        """
+        Dịch danh sách cue như translate_cues, kèm cờ cho biết mọi dòng đều dịch được
         
-        matches = re.findall(srt_pattern, srt_content, re.DOTALL)
+        Returns:
+            tuple[CueList, bool]: Cue đã dịch và True nếu không có dòng nào phải giữ
+            nguyên văn bản gốc (chỉ nên cache bản dịch khi cờ này là True)
+        """
+        print(f"🌐 Đang dịch {len(cues)} đoạn phụ đề từ {source_lang} sang {target_lang}...")
+        texts, complete = self._translate_texts(cues.texts, source_lang, target_lang)
+        return cues.with_texts(texts), complete
+    
+    def translate_segments(self, segments, source_lang='vi', target_lang='en'):
+        """Dịch segment nguyên câu (chưa chia dòng), trả về CueList segment đã dịch"""
+        return self.translate_cues(segments, source_lang, target_lang)
+    
+    def translate_segments_checked(self, segments, source_lang='vi', target_lang='en'):
+        """Dịch segment nguyên câu, trả về (CueList segment đã dịch, mọi segment đều dịch được)"""
+        return self.translate_cues_checked(segments, source_lang, target_lang)
+    
+    def _translate_texts(self, texts, source_lang, target_lang):
+        """
+        Dịch danh sách câu, gộp nhiều câu vào một request tới giới hạn ký tự
         
-        if not matches:
-            raise Exception("Không thể phân tích file SRT")
+        Batch nào tách lại không khớp số câu thì dịch riêng từng câu của batch đó.
+        Câu không dịch được giữ nguyên văn bản gốc.
         
-        translated_entries = []
+        Returns:
+            tuple[list[str], bool]: Các câu đã dịch (cùng thứ tự với texts) và True nếu
+            mọi câu đều dịch được
+        """
+        results = list(texts)
+        complete = True
+        if not self.backend_name:
+            for i, text in enumerate(texts):
+                translated = self._translate_text(text, source_lang, target_lang)
+                if translated is None:
+                    complete = False
+                else:
+                    results[i] = translated
+            return results, complete
         
-        for i, (index, start_time, end_time, text) in enumerate(matches):
-            try:
-                # Dịch văn bản
-                translated_text = self._translate_text(
-                    text.strip(), source_lang, target_lang
-                )
-                
-                # Tạo entry SRT mới
-                entry = f"{index}\n{start_time} --> {end_time}\n{translated_text}\n"
-                translated_entries.append(entry)
-                
-                # Thêm delay nhỏ để tránh rate limit
-                if i > 0 and i % 10 == 0:
-                    time.sleep(1)
-                
-            except Exception as e:
-                print(f"⚠️ Lỗi dịch đoạn {index}: {e}")
-                # Giữ nguyên văn bản gốc nếu không dịch được
-                entry = f"{index}\n{start_time} --> {end_time}\n{text.strip()}\n"
-                translated_entries.append(entry)
+        # Câu đã có trong bộ nhớ dịch không cần gửi đi
+        remembered = self._memory_lookup(texts, source_lang, target_lang)
+        pending = []
+        for i, text in enumerate(texts):
+            if text in remembered:
+                results[i] = remembered[text]
+                pending.append('')
+            else:
+                pending.append(text)
+        if remembered:
+            print(f"♻️ Bộ nhớ dịch: {sum(1 for t in texts if t in remembered)} câu đã có sẵn")
+        
+        def translate_batch(batch):
+            batch_texts = [texts[i] for i in batch]
+            translated = None
+            if len(batch) > 1:
+                try:
+                    translated = decode_batch(
+                        self._request_translation(encode_batch(batch_texts), source_lang, target_lang),
+                        len(batch)
+                    )
+                except Exception as e:
+                    print(f"⚠️ Lỗi dịch batch: {e}")
+                if translated is None:
+                    print(f"⚠️ Không tách được batch {len(batch)} câu, dịch từng câu...")
+                else:
+                    self._memory_store(zip(batch_texts, translated), source_lang, target_lang)
+            
+            if translated is None:
+                translated = [self._translate_uncached(text, source_lang, target_lang) for text in batch_texts]
+            return translated
+        
+        # Các batch chạy song song (tốc độ do token bucket quyết định), ghép lại đúng thứ tự
+        batches = pack_batches(pending, self.char_budget)
+        batch_results = run_ordered(translate_batch, batches, self.max_workers)
+        for batch, translated in zip(batches, batch_results):
+            if isinstance(translated, Exception):
+                print(f"⚠️ Lỗi dịch batch: {translated}")
+                complete = False
+                continue
+            for i, text in zip(batch, translated):
+                if text is None:
+                    complete = False
+                else:
+                    results[i] = text
         
-        return '\n'.join(translated_entries)
+        print(f"🌐 Đã dịch {len(batches)} batch ({len([t for t in pending if t.strip()])} câu)")
+        return results, complete
+    
+    def _memory_lookup(self, texts, source_lang, target_lang):
+        if not self.memory:
+            return {}
+        try:
+            return self.memory.lookup_many(texts, source_lang, target_lang, self.backend_name)
+        except Exception as e:
+            print(f"⚠️ Không thể đọc bộ nhớ dịch: {e}")
+            return {}
+    
+    def _memory_store(self, pairs, source_lang, target_lang):
+        if not self.memory:
+            return
+        try:
+            self.memory.store_many(pairs, source_lang, target_lang, self.backend_name)
+        except Exception as e:
+            print(f"⚠️ Không thể ghi bộ nhớ dịch: {e}")
+    
+    def _request_translation(self, text, source_lang, target_lang):
+        """Gửi một request dịch qua token bucket, thử lại khi bị 429/lỗi (ném lỗi nếu thất bại)"""
+        return call_with_retry(
+            lambda: self._send_request(text, source_lang, target_lang),
+            self.limiter
+        )
+    
+    def _send_request(self, text, source_lang, target_lang):
+        if self.backend_name == HTTP_BACKEND:
+            response = requests.post(
+                self.http_endpoint,
+                json={'q': text, 'source': source_lang, 'target': target_lang, 'format': 'text'},
+                timeout=HTTP_TIMEOUT
+            )
+            if response.status_code == 429:
+                raise RateLimitedError("HTTP 429", _parse_retry_after(response.headers.get('Retry-After')))
+            response.raise_for_status()
+            return response.json()['translatedText']
+        
+        result = self._google_client().translate(
+            text, 
+            src=source_lang, 
+            dest=target_lang
+        )
+        return result.text
+    
+    def _google_client(self):
+        """Mỗi luồng một client googletrans (client không an toàn khi dùng chung giữa các luồng)"""
+        client = getattr(self._local, 'google_client', None)
+        if client is None:
+            if threading.get_ident() == self._owner_thread:
+                client = self.google_translator
+            else:
+                client = GoogleTranslator()
+            self._local.google_client = client
+        return client
     
     def _translate_text(self, text, source_lang, target_lang):
         """
@@ -122,36 +266,44 @@ class Translator:
             target_lang (str): Ngôn ngữ đích
             
         Returns:
-            str: Văn bản đã dịch
+            str | None: Văn bản đã dịch, None nếu không dịch được
         """
         if not text.strip():
             return text
         
-        # Thử dịch với Google Translate
-        if self.google_translator:
+        # Tra bộ nhớ dịch trước, sau đó mới gọi backend dịch
+        if self.backend_name:
+            remembered = self._memory_lookup([text], source_lang, target_lang)
+            if text in remembered:
+                return remembered[text]
+        return self._translate_uncached(text, source_lang, target_lang)
+    
+    def _translate_uncached(self, text, source_lang, target_lang):
+        """Dịch một đoạn văn bản qua mạng (không tra bộ nhớ dịch), lưu kết quả vào bộ nhớ; None nếu lỗi"""
+        if self.backend_name:
             try:
-                result = self.google_translator.translate(
-                    text, 
-                    src=source_lang, 
-                    dest=target_lang
-                )
-                return result.text
+                translated = self._request_translation(text, source_lang, target_lang)
+                self._memory_store([(text, translated)], source_lang, target_lang)
+                return translated
             except Exception as e:
-                print(f"⚠️ Lỗi Google Translate: {e}")
+                print(f"⚠️ Lỗi dịch: {e}")
         
-        # Fallback: Dịch bằng cách sử dụng API khác hoặc trả về gốc
+        # Fallback: Dịch bằng cách sử dụng API khác
         return self._fallback_translate(text, source_lang, target_lang)
     
     def _fallback_translate(self, text, source_lang, target_lang):
         """
         Phương pháp dịch dự phòng
+        
+        Returns:
+            str | None: Văn bản đã dịch, None nếu không dịch được (người gọi giữ văn bản gốc)
         """
         # Có thể tích hợp thêm các API dịch khác ở đây
         # Ví dụ: DeepL, Microsoft Translator, v.v.
         
-        # Hiện tại chỉ trả về văn bản gốc
+        # Hiện tại chưa có API dự phòng
         print(f"⚠️ Không thể dịch: '{text[:50]}...' - Giữ nguyên")
-        return text
+        return None
     
     def _detect_language(self, text):
         """
@@ -182,6 +334,14 @@ class Translator:
         try:
             test_text = "Hello"
             result = self._translate_text(test_text, 'en', 'vi')
-            return result != test_text
+            return result is not None and result != test_text
         except Exception:
             return False
+
+
+def _parse_retry_after(value):
+    """Giá trị header Retry-After (giây), None nếu không đọc được"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
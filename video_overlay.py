@@ -8,6 +8,12 @@ import os
 import subprocess
 import glob
 
+from ffmpeg_registry import get_ffmpeg_registry
+from filter_graph import FilterGraph
+from media_probe import get_media_probe
+from overlay_asset_cache import get_overlay_asset_cache
+from sprite_track import SpriteItem, add_sprite_track, group_sprite_tracks
+
 # Màu chroma key phổ biến
 CHROMA_COLORS = {
     "green": "0x00ff00",      # Xanh lá cây (phổ biến nhất)
@@ -31,6 +37,37 @@ CHROMA_PRESETS = {
     "perfect": (0.001, 0.001)    # Độ nhạy hoàn hảo - khử tuyệt đối
 }
 
+# Style phụ đề dùng trong add_multiple_overlays
+MULTIPLE_OVERLAY_SUBTITLE_STYLE = "FontName=Arial,FontSize=8,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=1,Shadow=1,MarginV=50"
+
+# Style phụ đề dùng cho ảnh có animation / custom timeline
+ANIMATION_SUBTITLE_STYLE = "FontName=Arial,FontSize=12,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2,Shadow=1,MarginV=50"
+
+# Timeline tùy chỉnh cho 3 ảnh (1.png, 2.png, 3.png)
+CUSTOM_TIMELINE_IMAGES = [
+    {
+        "image": "1.png",  # Ảnh 1
+        "start_time": 5,   # Bắt đầu ở giây thứ 5
+        "end_time": 6,     # Kết thúc ở giây thứ 6
+        "y_offset": 865,   # Vị trí Y
+        "animation": "fade_in_out"
+    },
+    {
+        "image": "2.png",  # Ảnh 2
+        "start_time": 6,   # Bắt đầu ở giây thứ 6
+        "end_time": 7,     # Kết thúc ở giây thứ 7
+        "y_offset": 900,   # Vị trí Y (giống ảnh 3)
+        "animation": "slide_left"
+    },
+    {
+        "image": "3.png",  # Ảnh 3 
+        "start_time": 7,   # Bắt đầu ở giây thứ 7
+        "end_time": 8,     # Kết thúc ở giây thứ 8
+        "y_offset": 900,   # Vị trí Y (giống ảnh 2)
+        "animation": "zoom_in"
+    }
+]
+
 def test_get_video_duration(video_path):
     """Test function to debug video duration detection"""
     print(f"Testing video duration for: {video_path}")
@@ -80,55 +117,297 @@ def test_get_video_duration(video_path):
     return None
 
 def get_video_duration(video_path):
-    """Lấy duration của video bằng ffprobe"""
+    """Lấy duration của video bằng ffprobe (kết quả được nhớ theo file)"""
+    duration = get_media_probe().get_duration(video_path)
+    if duration:
+        print(f"Video duration for {os.path.basename(video_path)}: {duration:.2f}s")
+        return duration
+    
+    print(f"Could not get video duration for {video_path}")
+    return None
+
+def resolve_chroma_params(chroma_color="0x00ff00", chroma_similarity=0.1, chroma_blend=0.1,
+                          color=None, similarity=None):
+    """
+    Chuẩn hóa tham số chroma key (alias + giới hạn giá trị)
+    
+    Returns:
+        tuple: (chroma_color, chroma_similarity, chroma_blend)
+    """
+    # Hỗ trợ tương thích ngược với tham số từ test_chroma_key.py
+    if color is not None:
+        print(f"DEBUG OVERLAY: Using color alias: {color}")
+        chroma_color = color
+    if similarity is not None:
+        print(f"DEBUG OVERLAY: Using similarity alias: {similarity}")
+        chroma_similarity = similarity
+        chroma_blend = similarity  # Sử dụng cùng giá trị cho blend
+    
+    # Validation tham số
     try:
-        # Method 1: Try ffprobe directly
-        try:
-            cmd = ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration', '-of', 'csv=p=0', video_path]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0 and result.stdout.strip():
-                duration = float(result.stdout.strip())
-                print(f"Video duration for {os.path.basename(video_path)}: {duration:.2f}s")
-                return duration
-        except Exception as e:
-            print(f"ffprobe direct failed: {e}")
-        
-        # Method 2: Try ffprobe from ffmpeg path
-        try:
-            ffmpeg_path = find_ffmpeg()
-            ffprobe_path = ffmpeg_path.replace('ffmpeg', 'ffprobe') if 'ffmpeg' in ffmpeg_path else 'ffprobe'
-            cmd = [ffprobe_path, '-v', 'quiet', '-show_entries', 'format=duration', '-of', 'csv=p=0', video_path]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0 and result.stdout.strip():
-                duration = float(result.stdout.strip())
-                print(f"Video duration for {os.path.basename(video_path)}: {duration:.2f}s")
-                return duration
-        except Exception as e:
-            print(f"ffprobe from ffmpeg path failed: {e}")
-        
-        # Method 3: Parse from ffmpeg output
-        try:
-            ffmpeg_path = find_ffmpeg()
-            cmd = [ffmpeg_path, '-i', video_path, '-f', 'null', '-']
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        chroma_similarity = float(chroma_similarity)
+        chroma_blend = float(chroma_blend)
+        
+        # Clamp values to reasonable range
+        chroma_similarity = max(0.0005, min(0.5, chroma_similarity))
+        chroma_blend = max(0.0005, min(0.5, chroma_blend))
+        
+    except (ValueError, TypeError):
+        print(f"Invalid chroma values, using defaults")
+        chroma_similarity = 0.1
+        chroma_blend = 0.1
+    
+    print(f"Final chroma params: color={chroma_color}, similarity={chroma_similarity}, blend={chroma_blend}")
+    return chroma_color, chroma_similarity, chroma_blend
+
+def resolve_overlay_duration(overlay_video_path, duration=None, auto_hide=True):
+    """Tính thời lượng hiển thị thực tế của video overlay (auto-hide)"""
+    if auto_hide:
+        overlay_duration = get_video_duration(overlay_video_path)
+        if overlay_duration:
+            if duration:
+                # Use the shorter of: user-specified duration or actual video duration
+                actual_duration = min(duration, overlay_duration)
+            else:
+                # Use actual video duration
+                actual_duration = overlay_duration
             
-            # Parse duration from stderr
-            import re
-            duration_match = re.search(r'Duration: (\d+):(\d+):(\d+)\.(\d+)', result.stderr)
-            if duration_match:
-                hours, minutes, seconds, milliseconds = duration_match.groups()
-                total_seconds = int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(milliseconds) / 100
-                print(f"Video duration for {os.path.basename(video_path)}: {total_seconds:.2f}s (parsed)")
-                return total_seconds
-        except Exception as e:
-            print(f"ffmpeg parse failed: {e}")
-        
-        print(f"Could not get video duration for {video_path}")
-        return None
+            print(f"Auto-hide enabled: overlay duration={overlay_duration:.2f}s, using duration={actual_duration:.2f}s")
+        else:
+            # Fallback to user duration if can't get video duration
+            actual_duration = duration
+            print(f"Could not get overlay duration, using user duration={duration}")
+    else:
+        # Use user-specified duration (original behavior)
+        actual_duration = duration
+        print(f"Auto-hide disabled, using user duration={duration}")
+    
+    return actual_duration
+
+def get_overlay_position(position="center", custom_x=None, custom_y=None):
+    """Tính biểu thức vị trí (x, y) cho filter overlay"""
+    if position == "center":
+        return "(main_w-overlay_w)/2", "(main_h-overlay_h)/2"
+    elif position == "top-left":
+        return "10", "10"
+    elif position == "top-right":
+        return "main_w-overlay_w-10", "10"
+    elif position == "bottom-left":
+        return "10", "main_h-overlay_h-10"
+    elif position == "bottom-right":
+        return "main_w-overlay_w-10", "main_h-overlay_h-10"
+    elif position == "custom" and custom_x is not None and custom_y is not None:
+        return str(custom_x), str(custom_y)
+    return "(main_w-overlay_w)/2", "(main_h-overlay_h)/2"
+
+def build_overlay_filters(size_percent=30, chroma_key=True, chroma_color="0x00ff00",
+                          chroma_similarity=0.1, chroma_blend=0.1,
+                          custom_width=None, custom_height=None, keep_aspect=True):
+    """
+    Tạo chuỗi filter (scale → chromakey) áp dụng lên video overlay
+    
+    Returns:
+        list[str]: Các filter theo thứ tự
+    """
+    # Scale video overlay based on mode
+    if custom_width is not None and custom_height is not None:
+        # Custom pixel size mode
+        if keep_aspect:
+            # Keep aspect ratio, scale to fit within specified dimensions
+            scale_filter = f"scale={custom_width}:{custom_height}:force_original_aspect_ratio=decrease"
+        else:
+            # Exact size, may distort aspect ratio
+            scale_filter = f"scale={custom_width}:{custom_height}"
+        print(f"Using custom size: {custom_width}x{custom_height}px, keep_aspect={keep_aspect}")
+    else:
+        # Original percentage mode
+        scale_factor = size_percent / 100.0
+        scale_filter = f"scale=-1:ih*{scale_factor}"
+        print(f"Using percentage mode: {size_percent}%")
+    
+    overlay_filters = [scale_filter]
+    
+    # Áp dụng chroma key nếu cần (colorkey khi bản build không có chromakey)
+    if chroma_key:
+        key_filter = get_ffmpeg_registry().pick_filter('chromakey', 'colorkey')
+        overlay_filters.append(f"{key_filter}={chroma_color}:{chroma_similarity}:{chroma_blend}")
+    
+    return overlay_filters
+
+def timed_input_options(start_time=0, duration=None):
+    """
+    Tham số input cho clip overlay: chỉ đọc duration giây đầu (-t) và dời timestamp
+    tới start_time (-itsoffset), để scale/chroma key chỉ chạy trên các frame được hiển thị
+    
+    Returns:
+        list[str]: Tham số đặt trước -i
+    """
+    options = []
+    if duration:
+        options.extend(['-t', f"{float(duration):.3f}"])
+    if start_time:
+        options.extend(['-itsoffset', f"{float(start_time):.3f}"])
+    return options
+
+def add_video_overlay_to_graph(graph, main_label, overlay_label, start_time=0, actual_duration=None,
+                               position="center", size_percent=30, chroma_key=True,
+                               chroma_color="0x00ff00", chroma_similarity=0.1, chroma_blend=0.1,
+                               custom_x=None, custom_y=None,
+                               custom_width=None, custom_height=None, keep_aspect=True,
+                               prekeyed=False, eof_action=None):
+    """
+    Thêm nhánh video overlay (scale → chromakey → overlay) vào filter graph
+    
+    Args:
+        graph (FilterGraph): Filter graph đang dựng
+        main_label (str): Label của video chính (vd: "0:v")
+        overlay_label (str): Label của video overlay (vd: "1:v"), nên thêm bằng timed_input_options
+        prekeyed (bool): Overlay là clip đã scale + khử phông sẵn (có alpha), overlay thẳng
+        eof_action (str): Hành vi khi clip overlay hết ('pass' = bỏ overlay, mặc định lặp frame cuối)
         
-    except Exception as e:
-        print(f"Could not get video duration: {e}")
-        return None
+    Returns:
+        str: Label đầu ra sau khi overlay
+    """
+    x_pos, y_pos = get_overlay_position(position, custom_x, custom_y)
+    
+    keyed = overlay_label
+    if not prekeyed:
+        overlay_filters = build_overlay_filters(size_percent, chroma_key, chroma_color, chroma_similarity,
+                                                chroma_blend, custom_width, custom_height, keep_aspect)
+        keyed = graph.chain(overlay_label, *overlay_filters, prefix="keyed")
+    
+    # Tạo overlay với thời gian (NEW: use actual_duration)
+    if actual_duration:
+        enable = f"between(t,{start_time},{start_time + actual_duration})"
+    else:
+        enable = f"gte(t,{start_time})"
+    
+    return graph.overlay(main_label, keyed, x_pos, y_pos, enable=enable, eof_action=eof_action, prefix="vov")
+
+def add_keyed_overlay_input(graph, overlay_video_path, overlay_filters, start_time=0, duration=None):
+    """
+    Thêm clip overlay vào graph, ưu tiên bản đã khử phông trong cache overlay
+    
+    Clip trong cache chỉ gồm duration giây đầu (phần được hiển thị), không render cả clip gốc.
+    
+    Args:
+        start_time (float): Thời điểm overlay bắt đầu (giây)
+        duration (float): Thời lượng hiển thị (None = cả clip)
+    
+    Returns:
+        tuple: (label input, True nếu là clip đã áp dụng overlay_filters)
+    """
+    options = timed_input_options(start_time, duration)
+    cache = get_overlay_asset_cache()
+    keyed_path = cache.get_keyed_clip(overlay_video_path, overlay_filters, duration) if cache else None
+    if keyed_path:
+        return graph.add_input(keyed_path, options), True
+    return graph.add_input(overlay_video_path, options), False
+
+def add_timed_media_to_graph(graph, main_label, media_file, start_time, duration, is_video,
+                             x_pos="(main_w-overlay_w)/2", y_pos="(main_h-overlay_h)/2"):
+    """
+    Thêm một ảnh/video overlay có thời gian vào filter graph
+    Video: scale 30% chiều cao + chroma key xanh lá; ảnh: scale 10%
+    
+    Returns:
+        str: Label đầu ra sau khi overlay
+    """
+    if is_video:
+        key_filter = get_ffmpeg_registry().pick_filter('chromakey', 'colorkey')
+        media_filters = ["scale=-1:ih*0.3", f"{key_filter}=0x00ff00:0.1:0.1"]
+        media_label, prekeyed = add_keyed_overlay_input(graph, media_file, media_filters,
+                                                        start_time, duration)
+        if not prekeyed:
+            media_label = graph.chain(media_label, *media_filters, prefix="chroma")
+    else:
+        media_label = graph.chain(graph.add_input(media_file), "scale=iw*0.1:ih*0.1", prefix="img")
+    
+    return graph.overlay(main_label, media_label, x_pos, y_pos,
+                         enable=f"between(t,{start_time},{start_time + duration})")
+
+def add_timed_media_list_to_graph(graph, main_label, media):
+    """
+    Thêm nhiều ảnh/video overlay có thời gian (căn giữa) vào filter graph
+    
+    Video overlay như add_timed_media_to_graph; các ảnh không chồng thời gian được gộp
+    thành sprite track để video chính chỉ đi qua một overlay thay vì một overlay mỗi ảnh.
+    Thứ tự chồng lớp giữa các overlay trùng thời gian giữ như danh sách.
+    
+    Args:
+        media (list[tuple]): (file, start_time, duration, is_video)
+    
+    Returns:
+        str: Label đầu ra sau khi overlay
+    """
+    position = ("(main_w-overlay_w)/2", "(main_h-overlay_h)/2")
+    placed = []
+    for entry in media:
+        media_file, start_time, duration, is_video = entry
+        item = None if is_video else SpriteItem.from_image(media_file, start_time, duration, 0.1, payload=entry)
+        if item:
+            placed.append((item, position))
+        else:
+            # Video overlay / ảnh không probe được: overlay riêng như trước
+            placed.append((SpriteItem(media_file, start_time, duration, (0, 0), payload=entry), None))
+    
+    for track_position, items in group_sprite_tracks(placed):
+        if track_position is None or len(items) == 1:
+            main_label = add_timed_media_to_graph(graph, main_label, *items[0].payload)
+        else:
+            main_label = add_sprite_track(graph, main_label, items, *track_position)
+    return main_label
+
+def add_video_overlay_job_to_graph(graph, main_label, overlay_video_path, start_time=0, duration=None,
+                                   position="center", size_percent=30, chroma_key=True,
+                                   chroma_color="0x00ff00", chroma_similarity=0.1, chroma_blend=0.1,
+                                   color=None, similarity=None, auto_hide=True,
+                                   custom_x=None, custom_y=None,
+                                   custom_width=None, custom_height=None, keep_aspect=True):
+    """
+    Thêm một video overlay (cùng tham số với add_video_overlay_with_chroma) vào filter graph:
+    chuẩn hóa chroma, tính auto-hide rồi nối nhánh overlay lên main_label
+    
+    Returns:
+        str: Label đầu ra sau khi overlay
+    """
+    chroma_color, chroma_similarity, chroma_blend = resolve_chroma_params(
+        chroma_color, chroma_similarity, chroma_blend, color, similarity
+    )
+    actual_duration = resolve_overlay_duration(overlay_video_path, duration, auto_hide)
+    
+    # Clip green-screen dùng lại nhiều lần: khử phông một lần (phần được hiển thị) vào cache overlay
+    prekeyed = False
+    if chroma_key:
+        overlay_label, prekeyed = add_keyed_overlay_input(
+            graph, overlay_video_path,
+            build_overlay_filters(size_percent, chroma_key, chroma_color, chroma_similarity,
+                                  chroma_blend, custom_width, custom_height, keep_aspect),
+            start_time, actual_duration
+        )
+    else:
+        overlay_label = graph.add_input(overlay_video_path, timed_input_options(start_time, actual_duration))
+    
+    return add_video_overlay_to_graph(
+        graph,
+        main_label=main_label,
+        overlay_label=overlay_label,
+        start_time=start_time,
+        actual_duration=actual_duration,
+        position=position,
+        size_percent=size_percent,
+        chroma_key=chroma_key,
+        chroma_color=chroma_color,
+        chroma_similarity=chroma_similarity,
+        chroma_blend=chroma_blend,
+        custom_x=custom_x,
+        custom_y=custom_y,
+        custom_width=custom_width,
+        custom_height=custom_height,
+        keep_aspect=keep_aspect,
+        prekeyed=prekeyed,
+        eof_action='pass' if auto_hide else None
+    )
     
 def add_video_overlay_with_chroma(main_video_path, overlay_video_path, output_path, 
                                  start_time=0, duration=None, position="center", 
@@ -165,130 +444,40 @@ def add_video_overlay_with_chroma(main_video_path, overlay_video_path, output_pa
     print(f"  similarity={similarity}")
     print(f"  auto_hide={auto_hide}")
     
-    # Hỗ trợ tương thích ngược với tham số từ test_chroma_key.py
-    if color is not None:
-        print(f"DEBUG OVERLAY: Using color alias: {color}")
-        chroma_color = color
-    if similarity is not None:
-        print(f"DEBUG OVERLAY: Using similarity alias: {similarity}")
-        chroma_similarity = similarity
-        chroma_blend = similarity  # Sử dụng cùng giá trị cho blend
-    
-    # Validation tham số
-    try:
-        chroma_similarity = float(chroma_similarity)
-        chroma_blend = float(chroma_blend)
-        
-        # Clamp values to reasonable range
-        chroma_similarity = max(0.0005, min(0.5, chroma_similarity))
-        chroma_blend = max(0.0005, min(0.5, chroma_blend))
-        
-    except (ValueError, TypeError):
-        print(f"Invalid chroma values, using defaults")
-        chroma_similarity = 0.1
-        chroma_blend = 0.1
-    
-    print(f"Final chroma params: color={chroma_color}, similarity={chroma_similarity}, blend={chroma_blend}")
+    chroma_color, chroma_similarity, chroma_blend = resolve_chroma_params(
+        chroma_color, chroma_similarity, chroma_blend, color, similarity
+    )
     
     try:
         # Tìm FFmpeg
         ffmpeg_path = find_ffmpeg()
         
-        # Calculate actual overlay duration if auto_hide is enabled
-        if auto_hide:
-            overlay_duration = get_video_duration(overlay_video_path)
-            if overlay_duration:
-                if duration:
-                    # Use the shorter of: user-specified duration or actual video duration
-                    actual_duration = min(duration, overlay_duration)
-                else:
-                    # Use actual video duration
-                    actual_duration = overlay_duration
-                
-                print(f"Auto-hide enabled: overlay duration={overlay_duration:.2f}s, using duration={actual_duration:.2f}s")
-            else:
-                # Fallback to user duration if can't get video duration
-                actual_duration = duration
-                print(f"Could not get overlay duration, using user duration={duration}")
-        else:
-            # Use user-specified duration (original behavior)
-            actual_duration = duration
-            print(f"Auto-hide disabled, using user duration={duration}")
-        
-        # Tính toán vị trí
-        if position == "center":
-            x_pos = "(main_w-overlay_w)/2"
-            y_pos = "(main_h-overlay_h)/2"
-        elif position == "top-left":
-            x_pos = "10"
-            y_pos = "10"
-        elif position == "top-right":
-            x_pos = "main_w-overlay_w-10"
-            y_pos = "10"
-        elif position == "bottom-left":
-            x_pos = "10"
-            y_pos = "main_h-overlay_h-10"
-        elif position == "bottom-right":
-            x_pos = "main_w-overlay_w-10"
-            y_pos = "main_h-overlay_h-10"
-        elif position == "custom" and custom_x is not None and custom_y is not None:
-            x_pos = str(custom_x)
-            y_pos = str(custom_y)
-        else:
-            x_pos = "(main_w-overlay_w)/2"
-            y_pos = "(main_h-overlay_h)/2"
-        
-        # Tạo filter complex
-        filter_parts = []
-        
-        # Scale video overlay based on mode
-        if custom_width is not None and custom_height is not None:
-            # Custom pixel size mode
-            if keep_aspect:
-                # Keep aspect ratio, scale to fit within specified dimensions
-                scale_filter = f"[1:v]scale={custom_width}:{custom_height}:force_original_aspect_ratio=decrease[scaled]"
-            else:
-                # Exact size, may distort aspect ratio
-                scale_filter = f"[1:v]scale={custom_width}:{custom_height}[scaled]"
-            print(f"Using custom size: {custom_width}x{custom_height}px, keep_aspect={keep_aspect}")
-        else:
-            # Original percentage mode
-            scale_factor = size_percent / 100.0
-            scale_filter = f"[1:v]scale=-1:ih*{scale_factor}[scaled]"
-            print(f"Using percentage mode: {size_percent}%")
-        
-        filter_parts.append(scale_filter)
-        
-        # Áp dụng chroma key nếu cần
-        if chroma_key:
-            chromakey_filter = f"[scaled]chromakey={chroma_color}:{chroma_similarity}:{chroma_blend}[keyed]"
-            filter_parts.append(chromakey_filter)
-            overlay_input = "keyed"
-        else:
-            overlay_input = "scaled"
-        
-        # Tạo overlay với thời gian (NEW: use actual_duration)
-        if actual_duration:
-            end_time = start_time + actual_duration
-            time_condition = f"enable='between(t,{start_time},{end_time})'"
-        else:
-            time_condition = f"enable='gte(t,{start_time})'"
-        
-        overlay_filter = f"[0:v][{overlay_input}]overlay={x_pos}:{y_pos}:{time_condition}"
-        filter_parts.append(overlay_filter)
-        
-        filter_complex = ";".join(filter_parts)
+        actual_duration = resolve_overlay_duration(overlay_video_path, duration, auto_hide)
+        
+        # Tạo filter graph (khử phông qua cache overlay như khi chèn nhiều overlay)
+        graph = FilterGraph(main_video_path)
+        add_video_overlay_job_to_graph(
+            graph,
+            "0:v",
+            overlay_video_path,
+            start_time=start_time,
+            duration=duration,
+            position=position,
+            size_percent=size_percent,
+            chroma_key=chroma_key,
+            chroma_color=chroma_color,
+            chroma_similarity=chroma_similarity,
+            chroma_blend=chroma_blend,
+            auto_hide=auto_hide,
+            custom_x=custom_x,
+            custom_y=custom_y,
+            custom_width=custom_width,
+            custom_height=custom_height,
+            keep_aspect=keep_aspect
+        )
         
         # Tạo command FFmpeg
-        cmd = [
-            ffmpeg_path,
-            '-i', main_video_path,
-            '-i', overlay_video_path,
-            '-filter_complex', filter_complex,
-            '-c:a', 'copy',
-            '-y',
-            output_path
-        ]
+        cmd = graph.build_command(ffmpeg_path, output_path)
         
         print(f"🎬 Đang chèn video overlay...")
         print(f"📂 Video chính: {main_video_path}")
@@ -313,6 +502,42 @@ def add_video_overlay_with_chroma(main_video_path, overlay_video_path, output_pa
         
     except Exception as e:
         raise Exception(f"Không thể chèn video overlay: {str(e)}")
+
+def add_multiple_video_overlays_with_chroma(main_video_path, output_path, overlays):
+    """
+    Chèn nhiều video overlay trong một lần decode/encode video chính
+    
+    Mỗi overlay là một input của cùng filter graph; các nhánh overlay nối tiếp nhau
+    theo thứ tự danh sách (overlay sau nằm trên overlay trước).
+    
+    Args:
+        main_video_path (str): Đường dẫn video chính
+        output_path (str): Đường dẫn lưu kết quả
+        overlays (list[dict]): Kwargs của add_video_overlay_with_chroma cho từng overlay
+            (overlay_video_path, start_time, duration, position, size_percent, chroma..., auto_hide)
+    """
+    try:
+        ffmpeg_path = find_ffmpeg()
+        
+        graph = FilterGraph(main_video_path)
+        video_label = "0:v"
+        for i, overlay_kwargs in enumerate(overlays):
+            print(f"🎭 Video overlay {i+1}/{len(overlays)}: {overlay_kwargs.get('overlay_video_path')} "
+                  f"({overlay_kwargs.get('start_time', 0)}s, {overlay_kwargs.get('position', 'center')})")
+            video_label = add_video_overlay_job_to_graph(graph, video_label, **overlay_kwargs)
+        
+        cmd = graph.build_command(ffmpeg_path, output_path)
+        
+        print(f"🎬 Đang chèn {len(overlays)} video overlay trong một lần encode...")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        
+        if result.returncode != 0:
+            raise Exception(f"Lỗi chèn video overlay: {result.stderr}")
+        
+        print(f"✅ Chèn {len(overlays)} video overlay thành công: {output_path}")
+        
+    except Exception as e:
+        raise Exception(f"Không thể chèn video overlay: {str(e)}")
     
 def add_image_overlay(main_video_path, image_path, output_path, 
                      start_time=0, duration=5, position="center", size_percent=20):
@@ -343,24 +568,15 @@ def add_image_overlay(main_video_path, image_path, output_path,
             y_pos = "(main_h-overlay_h)/2"
         
         # Scale ảnh
+        graph = FilterGraph(main_video_path)
         scale_factor = size_percent / 100.0
-        scale_filter = f"[1:v]scale=iw*{scale_factor}:ih*{scale_factor}[scaled]"
+        scaled = graph.chain(graph.add_input(image_path), f"scale=iw*{scale_factor}:ih*{scale_factor}", prefix="scaled")
         
         # Overlay với thời gian
         end_time = start_time + duration
-        overlay_filter = f"[0:v][scaled]overlay={x_pos}:{y_pos}:enable='between(t,{start_time},{end_time})'"
-        
-        filter_complex = f"{scale_filter};{overlay_filter}"
+        graph.overlay("0:v", scaled, x_pos, y_pos, enable=f"between(t,{start_time},{end_time})")
         
-        cmd = [
-            ffmpeg_path,
-            '-i', main_video_path,
-            '-i', image_path,
-            '-filter_complex', filter_complex,
-            '-c:a', 'copy',
-            '-y',
-            output_path
-        ]
+        cmd = graph.build_command(ffmpeg_path, output_path)
         
         print(f"🖼️ Đang chèn ảnh overlay...")
         print(f"📂 Video: {main_video_path}")
@@ -378,6 +594,47 @@ def add_image_overlay(main_video_path, image_path, output_path,
     except Exception as e:
         raise Exception(f"Không thể chèn ảnh overlay: {str(e)}")
 
+def build_subtitle_filter(subtitle_path, force_style, fonts_dir=None):
+    """Tạo filter subtitles (không có label) với style cho trước"""
+    # Chuyển đổi đường dẫn Windows cho phụ đề
+    subtitle_path_escaped = subtitle_path.replace('\\', '/').replace(':', '\\:')
+    if fonts_dir:
+        return f"subtitles='{subtitle_path_escaped}':fontsdir='{fonts_dir}':force_style='{force_style}'"
+    return f"subtitles='{subtitle_path_escaped}':force_style='{force_style}'"
+
+def collect_overlay_configs(overlay_folder, overlay_times):
+    """
+    Tìm các file media trong thư mục có cấu hình thời gian trong overlay_times
+    
+    Returns:
+        list: [{'file', 'filename', 'start', 'duration', 'is_video'}]
+    """
+    # Tìm tất cả file media
+    media_files = []
+    for ext in ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.bmp', '*.mp4', '*.avi', '*.mov', '*.mkv', '*.wmv']:
+        media_files.extend(glob.glob(os.path.join(overlay_folder, ext)))
+    
+    if not media_files:
+        print("⚠️ Không tìm thấy file overlay nào")
+        return []
+    
+    overlay_configs = []
+    for media_file in media_files:
+        filename = os.path.basename(media_file)
+        if filename in overlay_times:
+            overlay_configs.append({
+                'file': media_file,
+                'filename': filename,
+                'start': overlay_times[filename]['start'],
+                'duration': overlay_times[filename]['duration'],
+                'is_video': media_file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.wmv'))
+            })
+    
+    if not overlay_configs:
+        print("⚠️ Không có file overlay nào được cấu hình thời gian")
+    
+    return overlay_configs
+
 def add_multiple_overlays(main_video_path, subtitle_path, output_path, overlay_folder, overlay_times):
     """
     Chèn nhiều video/ảnh overlay cùng lúc
@@ -385,82 +642,22 @@ def add_multiple_overlays(main_video_path, subtitle_path, output_path, overlay_f
     try:
         ffmpeg_path = find_ffmpeg()
         
-        # Tìm tất cả file media
-        media_files = []
-        for ext in ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.bmp', '*.mp4', '*.avi', '*.mov', '*.mkv', '*.wmv']:
-            media_files.extend(glob.glob(os.path.join(overlay_folder, ext)))
-        
-        if not media_files:
-            print("⚠️ Không tìm thấy file overlay nào")
-            return False
-        
-        # Chuẩn bị inputs
-        inputs = ['-i', main_video_path]
-        overlay_configs = []
-        
-        for media_file in media_files:
-            filename = os.path.basename(media_file)
-            if filename in overlay_times:
-                inputs.extend(['-i', media_file])
-                overlay_configs.append({
-                    'file': media_file,
-                    'filename': filename,
-                    'start': overlay_times[filename]['start'],
-                    'duration': overlay_times[filename]['duration'],
-                    'is_video': media_file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.wmv'))
-                })
-        
+        overlay_configs = collect_overlay_configs(overlay_folder, overlay_times)
         if not overlay_configs:
-            print("⚠️ Không có file overlay nào được cấu hình thời gian")
             return False
         
-        # Tạo filter complex
-        filter_parts = []
+        graph = FilterGraph(main_video_path)
         
         # Bước 1: Thêm subtitles
-        subtitle_path_escaped = subtitle_path.replace('\\', '/').replace(':', '\\:')
-        subtitle_filter = f"[0:v]subtitles='{subtitle_path_escaped}':force_style='FontName=Arial,FontSize=8,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=1,Shadow=1,MarginV=50'[sub]"
-        filter_parts.append(subtitle_filter)
-        
-        # Bước 2: Xử lý overlay
-        current_input = "sub"
-        for i, config in enumerate(overlay_configs):
-            input_index = i + 1
-            
-            if config['is_video']:
-                # Video overlay với chroma key
-                scale_filter = f"[{input_index}:v]scale=-1:ih*0.3[scaled{i}]"
-                filter_parts.append(scale_filter)
-                
-                chromakey_filter = f"[scaled{i}]chromakey=0x00ff00:0.1:0.1[chroma{i}]"
-                filter_parts.append(chromakey_filter)
-                
-                end_time = config['start'] + config['duration']
-                overlay_filter = f"[{current_input}][chroma{i}]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:enable='between(t,{config['start']},{end_time})'"
-            else:
-                # Ảnh overlay
-                scale_filter = f"[{input_index}]scale=iw*0.1:ih*0.1[img{i}]"
-                filter_parts.append(scale_filter)
-                
-                end_time = config['start'] + config['duration']
-                overlay_filter = f"[{current_input}][img{i}]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:enable='between(t,{config['start']},{end_time})'"
-            
-            if i < len(overlay_configs) - 1:
-                overlay_filter += f"[tmp{i}]"
-                current_input = f"tmp{i}"
-            
-            filter_parts.append(overlay_filter)
+        current_label = graph.chain("0:v", build_subtitle_filter(subtitle_path, MULTIPLE_OVERLAY_SUBTITLE_STYLE), prefix="sub")
         
-        filter_complex = ";".join(filter_parts)
+        # Bước 2: Xử lý overlay (video: chroma key, ảnh: scale 10%, gộp thành sprite track)
+        current_label = add_timed_media_list_to_graph(
+            graph, current_label,
+            [(config['file'], config['start'], config['duration'], config['is_video']) for config in overlay_configs]
+        )
         
-        cmd = [
-            ffmpeg_path,
-            *inputs,
-            '-filter_complex', filter_complex,
-            '-c:a', 'copy',
-            '-y',
-            output_path
-        ]
+        cmd = graph.build_command(ffmpeg_path, output_path)
         
         print(f"🎭 Đang chèn {len(overlay_configs)} overlay...")
         for config in overlay_configs:
@@ -480,27 +677,8 @@ def add_multiple_overlays(main_video_path, subtitle_path, output_path, overlay_f
         return False
 
 def find_ffmpeg():
-    """Tìm đường dẫn FFmpeg"""
-    import shutil
-    
-    ffmpeg_path = shutil.which('ffmpeg')
-    if ffmpeg_path:
-        return ffmpeg_path
-    
-    # Thử các đường dẫn phổ biến
-    common_paths = [
-        r"C:\ffmpeg\bin\ffmpeg.exe",
-        r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-        r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe",
-        os.path.join(os.getcwd(), "ffmpeg", "bin", "ffmpeg.exe"),
-        os.path.join(os.getcwd(), "ffmpeg.exe")
-    ]
-    
-    for path in common_paths:
-        if os.path.exists(path):
-            return path
-    
-    raise FileNotFoundError("FFmpeg không được tìm thấy")
+    """Tìm đường dẫn FFmpeg (resolve một lần qua registry dùng chung)"""
+    return get_ffmpeg_registry().ffmpeg_path
 
 def get_chroma_color(color_name):
     """
@@ -600,28 +778,20 @@ def add_image_overlay_with_animation(main_video_path, image_path, output_path,
         }
         x_pos, y_pos = position_map.get(position, position_map["center"])
         
-        # Tạo animation filters
-        animation_filter = _create_animation_filter(animation, start_time, duration, animation_duration, size_percent)
-        
-        # Scale ảnh
+        # Scale ảnh rồi áp dụng animation (clip render sẵn nếu có trong cache)
+        graph = FilterGraph(main_video_path)
         scale_factor = size_percent / 100.0
-        scale_filter = f"[1:v]scale=iw*{scale_factor}:ih*{scale_factor}[scaled]"
+        animated = add_animated_image_input(
+            graph, image_path, f"scale=iw*{scale_factor}:ih*{scale_factor}",
+            lambda start: _create_animation_filter(animation, start, duration, animation_duration, size_percent),
+            start_time, duration, prefix="animated"
+        )
         
         # Kết hợp filters
         end_time = start_time + duration
-        overlay_filter = f"[0:v][animated]overlay={x_pos}:{y_pos}:enable='between(t,{start_time},{end_time})'"
+        graph.overlay("0:v", animated, x_pos, y_pos, enable=f"between(t,{start_time},{end_time})")
         
-        filter_complex = f"{scale_filter};{animation_filter};{overlay_filter}"
-        
-        cmd = [
-            ffmpeg_path,
-            '-i', main_video_path,
-            '-i', image_path,
-            '-filter_complex', filter_complex,
-            '-c:a', 'copy',
-            '-y',
-            output_path
-        ]
+        cmd = graph.build_command(ffmpeg_path, output_path)
         
         print(f"✨ Đang chèn ảnh với animation {animation}...")
         print(f"📂 Video: {main_video_path}")
@@ -642,8 +812,39 @@ def add_image_overlay_with_animation(main_video_path, image_path, output_path,
         print(f"❌ Lỗi: {str(e)}")
         return False
 
+def add_animated_image_input(graph, image_path, scale_filter, build_animation, start_time, duration,
+                             prefix="anim"):
+    """
+    Thêm ảnh có animation vào graph, trả về label sẵn sàng để overlay
+    
+    Ưu tiên clip animation render sẵn trong cache overlay (hiệu ứng tính từ t=0, dời tới
+    start_time ở input) để không phải tính biểu thức/scale từng frame cho mỗi video;
+    không render được thì áp dụng filter animation trực tiếp lên ảnh như trước.
+    
+    Args:
+        scale_filter (str): Filter scale ảnh
+        build_animation (callable): start -> chuỗi filter animation với mốc thời gian start
+        start_time (float): Thời gian bắt đầu trên video chính (giây)
+        duration (float): Thời lượng hiển thị (giây)
+    """
+    cache = get_overlay_asset_cache()
+    clip_path = None
+    if cache and duration:
+        clip_path = cache.get_animation_clip(image_path, [scale_filter, build_animation(0)], duration)
+    if clip_path:
+        return graph.add_input(clip_path, timed_input_options(start_time, duration))
+    return graph.chain(graph.add_input(image_path), scale_filter, build_animation(start_time), prefix=prefix)
+
+def animation_sprite_item(image_path, scale_filter, build_animation, start_time, duration, payload=None):
+    """SpriteItem từ clip animation render sẵn của ảnh, None nếu không có clip"""
+    cache = get_overlay_asset_cache()
+    if not cache or not duration:
+        return None
+    clip_path = cache.get_animation_clip(image_path, [scale_filter, build_animation(0)], duration)
+    return SpriteItem.from_clip(clip_path, start_time, duration, payload) if clip_path else None
+
 def _create_animation_filter(animation, start_time, duration, animation_duration, size_percent):
-    """Tạo filter animation cho ảnh"""
+    """Tạo chuỗi filter animation (không có label) cho ảnh"""
     
     # Animation timings
     fade_start = start_time
@@ -654,51 +855,51 @@ def _create_animation_filter(animation, start_time, duration, animation_duration
     fade_out_end = start_time + duration
     
     if animation == "fade_in":
-        return f"[scaled]fade=t=in:st={fade_start}:d={animation_duration}:alpha=1[animated]"
+        return f"fade=t=in:st={fade_start}:d={animation_duration}:alpha=1"
     
     elif animation == "fade_out":
-        return f"[scaled]fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1[animated]"
+        return f"fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1"
     
     elif animation == "fade_in_out":
-        return f"[scaled]fade=t=in:st={fade_start}:d={animation_duration}:alpha=1,fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1[animated]"
+        return f"fade=t=in:st={fade_start}:d={animation_duration}:alpha=1,fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1"
     
     elif animation == "slide_left":
-        return f"[scaled]overlay=x='if(lt(t,{fade_end}),w-(w*(t-{fade_start})/{animation_duration}),0)':y=0[animated]"
+        return f"overlay=x='if(lt(t,{fade_end}),w-(w*(t-{fade_start})/{animation_duration}),0)':y=0"
     
     elif animation == "slide_right":
-        return f"[scaled]overlay=x='if(lt(t,{fade_end}),-w+(w*(t-{fade_start})/{animation_duration}),0)':y=0[animated]"
+        return f"overlay=x='if(lt(t,{fade_end}),-w+(w*(t-{fade_start})/{animation_duration}),0)':y=0"
     
     elif animation == "slide_up":
-        return f"[scaled]overlay=x=0:y='if(lt(t,{fade_end}),h-(h*(t-{fade_start})/{animation_duration}),0)'[animated]"
+        return f"overlay=x=0:y='if(lt(t,{fade_end}),h-(h*(t-{fade_start})/{animation_duration}),0)'"
     
     elif animation == "slide_down":
-        return f"[scaled]overlay=x=0:y='if(lt(t,{fade_end}),-h+(h*(t-{fade_start})/{animation_duration}),0)'[animated]"
+        return f"overlay=x=0:y='if(lt(t,{fade_end}),-h+(h*(t-{fade_start})/{animation_duration}),0)'"
     
     elif animation == "zoom_in":
         zoom_factor = f"if(lt(t,{fade_end}),0.1+0.9*(t-{fade_start})/{animation_duration},1)"
-        return f"[scaled]scale=iw*{zoom_factor}:ih*{zoom_factor}[animated]"
+        return f"scale=iw*{zoom_factor}:ih*{zoom_factor}"
     
     elif animation == "zoom_out":
         zoom_factor = f"if(gt(t,{fade_out_start}),1-0.9*(t-{fade_out_start})/{animation_duration},1)"
-        return f"[scaled]scale=iw*{zoom_factor}:ih*{zoom_factor}[animated]"
+        return f"scale=iw*{zoom_factor}:ih*{zoom_factor}"
     
     elif animation == "rotate_in":
         angle = f"if(lt(t,{fade_end}),2*PI*(t-{fade_start})/{animation_duration},0)"
-        return f"[scaled]rotate={angle}:fillcolor=none[animated]"
+        return f"rotate={angle}:fillcolor=none"
     
     elif animation == "bounce":
         # Tạo hiệu ứng bounce đơn giản
         y_offset = f"if(lt(t,{fade_end}),abs(sin(4*PI*(t-{fade_start})/{animation_duration}))*50,0)"
-        return f"[scaled]overlay=x=0:y={y_offset}[animated]"
+        return f"overlay=x=0:y={y_offset}"
     
     elif animation == "pulse":
         # Hiệu ứng pulse (thay đổi kích thước)
         pulse_scale = f"1+0.2*sin(4*PI*(t-{fade_start})/{animation_duration})"
-        return f"[scaled]scale=iw*{pulse_scale}:ih*{pulse_scale}[animated]"
+        return f"scale=iw*{pulse_scale}:ih*{pulse_scale}"
     
     else:
         # Mặc định: fade_in
-        return f"[scaled]fade=t=in:st={fade_start}:d={animation_duration}:alpha=1[animated]"
+        return f"fade=t=in:st={fade_start}:d={animation_duration}:alpha=1"
 
 def add_multiple_images_with_animations(main_video_path, subtitle_path, output_path, 
                                        img_folder, overlay_times, animations=None):
@@ -720,15 +921,12 @@ def add_multiple_images_with_animations(main_video_path, subtitle_path, output_p
             print("⚠️ Không tìm thấy ảnh nào")
             return False
         
-        # Chuẩn bị inputs và configs
-        inputs = ['-i', main_video_path]
+        # Chuẩn bị configs
         overlay_configs = []
         
         for img_file in image_files:
             filename = os.path.basename(img_file)
             if filename in overlay_times:
-                inputs.extend(['-i', img_file])
-                
                 # Lấy animation config
                 anim_config = animations.get(filename, {'type': 'fade_in', 'duration': 1.0}) if animations else {'type': 'fade_in', 'duration': 1.0}
                 
@@ -747,64 +945,61 @@ def add_multiple_images_with_animations(main_video_path, subtitle_path, output_p
             print("⚠️ Không có ảnh nào được cấu hình")
             return False
         
-        # Tạo filter complex với animations
-        filter_parts = []
+        # Tạo filter graph với animations
+        graph = FilterGraph(main_video_path)
         
         # Subtitle filter
-        subtitle_path_escaped = subtitle_path.replace('\\', '/').replace(':', '\\:')
-        subtitle_filter = f"[0:v]subtitles='{subtitle_path_escaped}':force_style='FontName=Arial,FontSize=12,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2,Shadow=1,MarginV=50'[sub]"
-        filter_parts.append(subtitle_filter)
+        current_label = graph.chain("0:v", build_subtitle_filter(subtitle_path, ANIMATION_SUBTITLE_STYLE), prefix="sub")
         
-        # Xử lý từng ảnh
-        current_input = "sub"
-        for i, config in enumerate(overlay_configs):
-            input_index = i + 1
-            
-            # Scale ảnh
-            scale_filter = f"[{input_index}]scale=iw*{config['scale']}:ih*{config['scale']}[scaled{i}]"
-            filter_parts.append(scale_filter)
-            
-            # Animation
-            anim_filter = _create_animation_filter_for_multiple(
-                config['animation'], 
-                config['start'], 
-                config['duration'], 
-                config['animation_duration'],
-                f"scaled{i}",
-                f"anim{i}"
+        position_map = {
+            "center": ("(main_w-overlay_w)/2", "(main_h-overlay_h)/2"),
+            "top-left": ("20", "20"),
+            "top-right": ("main_w-overlay_w-20", "20"),
+            "bottom-left": ("20", "main_h-overlay_h-20"),
+            "bottom-right": ("main_w-overlay_w-20", "main_h-overlay_h-20")
+        }
+        
+        def scale_filter(config):
+            return f"scale=iw*{config['scale']}:ih*{config['scale']}"
+        
+        def build_animation(config):
+            return lambda start: _create_animation_filter_for_multiple(
+                config['animation'],
+                start,
+                config['duration'],
+                config['animation_duration']
             )
-            filter_parts.append(anim_filter)
-            
-            # Position
-            position_map = {
-                "center": ("(main_w-overlay_w)/2", "(main_h-overlay_h)/2"),
-                "top-left": ("20", "20"),
-                "top-right": ("main_w-overlay_w-20", "20"),
-                "bottom-left": ("20", "main_h-overlay_h-20"),
-                "bottom-right": ("main_w-overlay_w-20", "main_h-overlay_h-20")
-            }
+        
+        def overlay_image(current_label, config):
+            # Scale ảnh + animation
+            anim_label = add_animated_image_input(graph, config['file'], scale_filter(config),
+                                                  build_animation(config), config['start'], config['duration'])
             x_pos, y_pos = position_map.get(config['position'], position_map["center"])
             
             # Overlay
             end_time = config['start'] + config['duration']
-            overlay_filter = f"[{current_input}][anim{i}]overlay={x_pos}:{y_pos}:enable='between(t,{config['start']},{end_time})'"
-            
-            if i < len(overlay_configs) - 1:
-                overlay_filter += f"[tmp{i}]"
-                current_input = f"tmp{i}"
-            
-            filter_parts.append(overlay_filter)
+            return graph.overlay(current_label, anim_label, x_pos, y_pos,
+                                 enable=f"between(t,{config['start']},{end_time})")
         
-        filter_complex = ";".join(filter_parts)
+        # Ảnh đã có clip animation render sẵn: gộp theo vị trí thành sprite track (một overlay mỗi track)
+        # (thứ tự chồng lớp giữa các ảnh trùng thời gian giữ như danh sách)
+        placed = []
+        for config in overlay_configs:
+            item = animation_sprite_item(config['file'], scale_filter(config), build_animation(config),
+                                         config['start'], config['duration'], payload=config)
+            if item:
+                placed.append((item, position_map.get(config['position'], position_map["center"])))
+            else:
+                placed.append((SpriteItem(config['file'], config['start'], config['duration'], (0, 0),
+                                          payload=config), None))
+        
+        for track_position, items in group_sprite_tracks(placed):
+            if track_position is None or len(items) == 1:
+                current_label = overlay_image(current_label, items[0].payload)
+            else:
+                current_label = add_sprite_track(graph, current_label, items, *track_position)
         
-        cmd = [
-            ffmpeg_path,
-            *inputs,
-            '-filter_complex', filter_complex,
-            '-c:a', 'copy',
-            '-y',
-            output_path
-        ]
+        cmd = graph.build_command(ffmpeg_path, output_path)
         
         print(f"✨ Đang chèn {len(overlay_configs)} ảnh với animation...")
         for config in overlay_configs:
@@ -822,33 +1017,56 @@ def add_multiple_images_with_animations(main_video_path, subtitle_path, output_p
         print(f"❌ Lỗi: {str(e)}")
         return False
 
-def _create_animation_filter_for_multiple(animation, start_time, duration, animation_duration, input_label, output_label):
-    """Tạo animation filter cho multiple overlay"""
+def _create_animation_filter_for_multiple(animation, start_time, duration, animation_duration):
+    """Tạo chuỗi animation filter (không có label) cho multiple overlay"""
     
     fade_start = start_time
     fade_end = start_time + animation_duration
     fade_out_start = start_time + duration - animation_duration
     
     if animation == "fade_in":
-        return f"[{input_label}]fade=t=in:st={fade_start}:d={animation_duration}:alpha=1[{output_label}]"
+        return f"fade=t=in:st={fade_start}:d={animation_duration}:alpha=1"
     
     elif animation == "fade_out":
-        return f"[{input_label}]fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1[{output_label}]"
+        return f"fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1"
     
     elif animation == "fade_in_out":
-        return f"[{input_label}]fade=t=in:st={fade_start}:d={animation_duration}:alpha=1,fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1[{output_label}]"
+        return f"fade=t=in:st={fade_start}:d={animation_duration}:alpha=1,fade=t=out:st={fade_out_start}:d={animation_duration}:alpha=1"
     
     elif animation == "zoom_in":
         zoom_factor = f"if(lt(t,{fade_end}),0.3+0.7*(t-{fade_start})/{animation_duration},1)"
-        return f"[{input_label}]scale=iw*{zoom_factor}:ih*{zoom_factor}[{output_label}]"
+        return f"scale=iw*{zoom_factor}:ih*{zoom_factor}"
     
     elif animation == "pulse":
         pulse_scale = f"1+0.3*sin(6*PI*(t-{fade_start})/2)"
-        return f"[{input_label}]scale=iw*{pulse_scale}:ih*{pulse_scale}[{output_label}]"
+        return f"scale=iw*{pulse_scale}:ih*{pulse_scale}"
     
     else:
         # Mặc định
-        return f"[{input_label}]fade=t=in:st={fade_start}:d={animation_duration}:alpha=1[{output_label}]"
+        return f"fade=t=in:st={fade_start}:d={animation_duration}:alpha=1"
+
+def _create_custom_timeline_animation(config, anim_duration=0.5):
+    """
+    Tạo chuỗi filter animation (không có label) cho một ảnh của custom timeline
+    
+    Args:
+        config (dict): Cấu hình ảnh trong CUSTOM_TIMELINE_IMAGES
+        anim_duration (float): Thời gian animation ngắn (giây)
+    """
+    # slide_left / zoom_in hiện cũng dùng fade in/out để ảnh hiển thị ổn định
+    return (f"fade=t=in:st={config['start_time']}:d={anim_duration}:alpha=1,"
+            f"fade=t=out:st={config['end_time']-anim_duration}:d={anim_duration}:alpha=1")
+
+def add_custom_timeline_image_input(graph, image_path, config, anim_duration=0.5):
+    """Thêm một ảnh của custom timeline (scale 20% + fade in/out) vào graph, trả về label"""
+    duration = config['end_time'] - config['start_time']
+    return add_animated_image_input(
+        graph, image_path, "scale=-1:ih*0.2",
+        lambda start: _create_custom_timeline_animation(
+            {**config, 'start_time': start, 'end_time': start + duration}, anim_duration
+        ),
+        config['start_time'], duration
+    )
 
 def add_images_with_custom_timeline(main_video_path, subtitle_path, output_path, img_folder):
     """
@@ -856,51 +1074,24 @@ def add_images_with_custom_timeline(main_video_path, subtitle_path, output_path,
     """
     try:
         ffmpeg_path = find_ffmpeg()
-          # Cấu hình ảnh theo yêu cầu mới
-        image_configs = [
-            {
-                "image": "1.png",  # Ảnh 1
-                "start_time": 5,   # Bắt đầu ở giây thứ 5
-                "end_time": 6,     # Kết thúc ở giây thứ 6
-                "y_offset": 865,   # Vị trí Y
-                "animation": "fade_in_out"
-            },
-            {
-                "image": "2.png",  # Ảnh 2
-                "start_time": 6,   # Bắt đầu ở giây thứ 6
-                "end_time": 7,     # Kết thúc ở giây thứ 7
-                "y_offset": 900,   # Vị trí Y (giống ảnh 3)
-                "animation": "slide_left"
-            },
-            {
-                "image": "3.png",  # Ảnh 3 
-                "start_time": 7,   # Bắt đầu ở giây thứ 7
-                "end_time": 8,     # Kết thúc ở giây thứ 8
-                "y_offset": 900,   # Vị trí Y (giống ảnh 2)
-                "animation": "zoom_in"
-            }
-        ]
+        # Cấu hình ảnh theo yêu cầu mới
+        image_configs = CUSTOM_TIMELINE_IMAGES
         
         # Kiểm tra file ảnh
-        inputs = ['-i', main_video_path]
-        filter_parts = []
+        graph = FilterGraph(main_video_path)
         
         # Thêm subtitle trước
         if subtitle_path and os.path.exists(subtitle_path):
-            subtitle_path_escaped = subtitle_path.replace('\\', '/').replace(':', '\\:')
-            subtitle_filter = f"[0:v]subtitles='{subtitle_path_escaped}':force_style='FontName=Arial,FontSize=12,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2,Shadow=1,MarginV=50'[sub]"
-            filter_parts.append(subtitle_filter)
-            current_input = "sub"
+            current_label = graph.chain("0:v", build_subtitle_filter(subtitle_path, ANIMATION_SUBTITLE_STYLE), prefix="sub")
         else:
-            current_input = "0:v"
-          # Xử lý từng ảnh
+            current_label = "0:v"
+        
+        # Xử lý từng ảnh
         valid_configs = []
         for i, config in enumerate(image_configs):
             img_path = os.path.join(img_folder, config["image"])
             if os.path.exists(img_path):
-                inputs.extend(['-i', img_path])
-                # input_index là số thứ tự của input (0=main_video, 1=image1, 2=image2, 3=image3)
-                valid_configs.append({**config, 'input_index': len(inputs)//2 - 1})
+                valid_configs.append({**config, 'file': img_path})
                 print(f"📋 Ảnh {i+1}: {config['image']} ({config['start_time']}s-{config['end_time']}s, Y={config['y_offset']})")
             else:
                 print(f"⚠️ Không tìm thấy: {img_path}")
@@ -909,58 +1100,26 @@ def add_images_with_custom_timeline(main_video_path, subtitle_path, output_path,
             print("❌ Không tìm thấy ảnh nào!")
             return False
         
-        # Tạo filter overlay cho từng ảnh
-        for i, config in enumerate(valid_configs):
-            input_idx = config['input_index']
-            
-            # Scale ảnh (kích thước nhỏ 20% chiều cao video)
-            scale_filter = f"[{input_idx}]scale=-1:ih*0.2[scaled{i}]"
-            filter_parts.append(scale_filter)
-            
-            # Animation filter
-            anim_duration = 0.5  # Thời gian animation ngắn
-            if config['animation'] == 'fade_in_out':
-                anim_filter = f"[scaled{i}]fade=t=in:st={config['start_time']}:d={anim_duration}:alpha=1,fade=t=out:st={config['end_time']-anim_duration}:d={anim_duration}:alpha=1[anim{i}]"
-            elif config['animation'] == 'slide_left':
-                # Slide từ phải sang trái
-                x_expr = f"if(lt(t,{config['start_time']+anim_duration}),w-(w*(t-{config['start_time']})/{anim_duration}),0)"
-                anim_filter = f"[scaled{i}]fade=t=in:st={config['start_time']}:d={anim_duration}:alpha=1,fade=t=out:st={config['end_time']-anim_duration}:d={anim_duration}:alpha=1[anim{i}]"
-            elif config['animation'] == 'zoom_in':
-                # Zoom từ nhỏ lên bình thường
-                anim_filter = f"[scaled{i}]fade=t=in:st={config['start_time']}:d={anim_duration}:alpha=1,fade=t=out:st={config['end_time']-anim_duration}:d={anim_duration}:alpha=1[anim{i}]"
-            else:
-                anim_filter = f"[scaled{i}]fade=t=in:st={config['start_time']}:d={anim_duration}:alpha=1,fade=t=out:st={config['end_time']-anim_duration}:d={anim_duration}:alpha=1[anim{i}]"
-            
-            filter_parts.append(anim_filter)
+        # Tạo overlay cho từng ảnh
+        for config in valid_configs:
+            # Scale ảnh (kích thước nhỏ 20% chiều cao video) + animation
+            anim_label = add_custom_timeline_image_input(graph, config['file'], config)
             
             # Overlay với vị trí Y tùy chỉnh
             x_pos = "(main_w-overlay_w)/2"  # Căn giữa theo chiều ngang
             y_pos = str(config['y_offset'])  # Vị trí Y cố định
             
-            overlay_filter = f"[{current_input}][anim{i}]overlay={x_pos}:{y_pos}:enable='between(t,{config['start_time']},{config['end_time']})'"
-            
-            if i < len(valid_configs) - 1:
-                overlay_filter += f"[tmp{i}]"
-                current_input = f"tmp{i}"
-            
-            filter_parts.append(overlay_filter)
-          # Tạo command FFmpeg
-        filter_complex = ";".join(filter_parts)
+            current_label = graph.overlay(current_label, anim_label, x_pos, y_pos,
+                                          enable=f"between(t,{config['start_time']},{config['end_time']})")
+        
+        # Tạo command FFmpeg
+        cmd = graph.build_command(ffmpeg_path, output_path)
         
         print(f"🔍 Debug Filter Complex:")
-        print(f"📋 Inputs: {inputs}")
-        print(f"🎛️ Filter: {filter_complex}")
+        print(f"📋 Inputs: {graph.input_paths}")
+        print(f"🎛️ Filter: {graph.to_string()}")
         print()
         
-        cmd = [
-            ffmpeg_path,
-            *inputs,
-            '-filter_complex', filter_complex,
-            '-c:a', 'copy',
-            '-y',
-            output_path
-        ]
-        
         print(f"🎬 Đang xử lý {len(valid_configs)} ảnh với timeline tùy chỉnh...")
         print(f"📂 Video đầu vào: {main_video_path}")
         print(f"📁 Thư mục ảnh: {img_folder}")
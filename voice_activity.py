@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module phát hiện vùng có tiếng nói (VAD) dựa trên năng lượng audio
+Tính trên toàn bộ PCM bằng NumPy, dùng để chỉ đưa các đoạn có tiếng vào Whisper
+và ánh xạ timestamp về thời gian gốc của video.
+"""
+
+from dataclasses import dataclass
+from typing import List
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from audio_source import PCMAudio
+
+# Độ dài mỗi frame phân tích năng lượng (giây)
+FRAME_SECONDS = 0.03
+
+# Ngưỡng = nền nhiễu + MARGIN, giới hạn trong [MIN, MAX] dBFS.
+# Giới hạn trên thấp để audio to liên tục (nhạc nền + lời) vẫn được coi là có tiếng.
+NOISE_PERCENTILE = 10
+THRESHOLD_MARGIN_DB = 12.0
+MIN_THRESHOLD_DB = -50.0
+MAX_THRESHOLD_DB = -30.0
+
+MIN_SPEECH_SECONDS = 0.25   # Bỏ các xung ngắn hơn mức này
+MIN_SILENCE_SECONDS = 0.5   # Khoảng lặng ngắn hơn mức này được gộp vào đoạn nói
+PADDING_SECONDS = 0.2       # Nới mỗi đoạn để không cắt mất đầu/cuối từ
+GAP_SECONDS = 0.3           # Khoảng lặng chèn giữa các đoạn khi ghép lại
+
+# Tiếng nói chiếm quá tỉ lệ này thì transcribe nguyên file (ghép lại không lợi gì)
+FULL_AUDIO_RATIO = 0.9
+
+
+@dataclass(frozen=True)
+class SpeechSpan:
+    """Một đoạn có tiếng nói (giây, theo thời gian gốc)"""
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def frame_energy_db(audio: PCMAudio, frame_seconds=FRAME_SECONDS) -> "np.ndarray":
+    """Năng lượng RMS (dBFS) của từng frame"""
+    frame_length = max(1, int(audio.sample_rate * frame_seconds))
+    samples = audio.to_float32()
+    frame_count = -(-len(samples) // frame_length)
+    padded = np.zeros(frame_count * frame_length, dtype=np.float32)
+    padded[:len(samples)] = samples
+    frames = padded.reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(rms + 1e-10)
+
+
+def detect_speech_spans(audio: PCMAudio, frame_seconds=FRAME_SECONDS) -> List[SpeechSpan]:
+    """
+    Tìm các đoạn có tiếng nói trong audio
+
+    Args:
+        audio (PCMAudio): Audio 16-bit mono
+        frame_seconds (float): Độ dài frame phân tích
+
+    Returns:
+        list[SpeechSpan]: Các đoạn có tiếng (rỗng nếu audio im lặng)
+    """
+    if audio.is_empty:
+        return []
+
+    energy = frame_energy_db(audio, frame_seconds)
+    noise_floor = np.percentile(energy, NOISE_PERCENTILE)
+    threshold = float(np.clip(noise_floor + THRESHOLD_MARGIN_DB, MIN_THRESHOLD_DB, MAX_THRESHOLD_DB))
+    active = energy > threshold
+    if not active.any():
+        return []
+
+    # Biên lên/xuống của mảng active → chỉ số frame bắt đầu/kết thúc
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * frame_seconds
+    ends = np.flatnonzero(edges == -1) * frame_seconds
+
+    # Gộp các đoạn cách nhau bởi khoảng lặng ngắn
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] < MIN_SILENCE_SECONDS:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    # Bỏ xung ngắn, nới biên rồi gộp lại các đoạn chồng nhau sau khi nới
+    spans = []
+    for start, end in merged:
+        if end - start < MIN_SPEECH_SECONDS:
+            continue
+        start = max(0.0, start - PADDING_SECONDS)
+        end = min(audio.duration, end + PADDING_SECONDS)
+        if spans and start <= spans[-1].end:
+            spans[-1] = SpeechSpan(spans[-1].start, end)
+        else:
+            spans.append(SpeechSpan(float(start), float(end)))
+    return spans
+
+
+class SpeechTimeline:
+    """
+    Ghép các đoạn có tiếng thành một audio ngắn và ánh xạ thời gian ngược lại
+
+    Đoạn thứ i nằm ở [compact_starts[i], compact_starts[i] + duration) trong audio ghép.
+    """
+
+    def __init__(self, spans: List[SpeechSpan], gap_seconds=GAP_SECONDS):
+        self.spans = spans
+        self.gap_seconds = gap_seconds
+        self.compact_starts = []
+        position = 0.0
+        for span in spans:
+            self.compact_starts.append(position)
+            position += span.duration + gap_seconds
+
+    def build_audio(self, audio: PCMAudio) -> PCMAudio:
+        """Audio chỉ gồm các đoạn có tiếng, xen giữa là khoảng lặng ngắn"""
+        gap = np.zeros(int(self.gap_seconds * audio.sample_rate), dtype=np.int16)
+        parts = []
+        for span in self.spans:
+            parts.append(audio.slice(span.start, span.end).samples)
+            parts.append(gap)
+        samples = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+        return PCMAudio(samples, audio.sample_rate)
+
+    def to_source_time(self, compact_time: float) -> float:
+        """Đổi thời gian trong audio ghép về thời gian gốc"""
+        index = int(np.searchsorted(self.compact_starts, compact_time, side='right')) - 1
+        index = min(max(index, 0), len(self.spans) - 1)
+        span = self.spans[index]
+        offset = min(max(compact_time - self.compact_starts[index], 0.0), span.duration)
+        return span.start + offset
+
+    def remap_segments(self, segments):
+        """Ánh xạ start/end (và words nếu có) của các segment Whisper về thời gian gốc"""
+        for segment in segments:
+            segment['start'] = self.to_source_time(segment['start'])
+            segment['end'] = max(segment['start'], self.to_source_time(segment['end']))
+            for word in segment.get('words') or []:
+                word['start'] = self.to_source_time(word['start'])
+                word['end'] = max(word['start'], self.to_source_time(word['end']))
+        return segments
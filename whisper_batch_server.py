@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module server Whisper gộp batch giữa nhiều video
+Mỗi video chia audio thành các cửa sổ ≤ 30 giây (cắt tại điểm im lặng) và gửi mel
+của từng cửa sổ vào hàng đợi chung; một luồng server gom cửa sổ của nhiều video
+đang chờ thành một lượt encoder/decoder theo batch rồi trả kết quả về đúng video.
+Tăng thông lượng khi batch có nhiều clip ngắn (mỗi transcribe() riêng lẻ dùng CPU kém).
+
+Đánh đổi chất lượng so với transcribe(): các cửa sổ của cùng video được decode song song
+nên không có prompt là văn bản của cửa sổ trước (condition_on_previous_text); các cửa sổ
+chồng nhau OVERLAP_SECONDS giây và segment thuộc cửa sổ chứa tâm của nó để không cắt
+đôi từ ở mép cửa sổ.
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+try:
+    import torch
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+    HAS_WHISPER = True
+except ImportError:
+    HAS_WHISPER = False
+
+from audio_source import PCMAudio
+from chunked_transcription import owned_segments, plan_chunks
+from whisper_pool import get_whisper_pool
+from whisper_policy import FALLBACK_TEMPERATURES
+
+# Số cửa sổ tối đa mỗi lượt (EDITVIDEO_WHISPER_BATCH_SIZE) và thời gian chờ gom thêm
+# cửa sổ sau cửa sổ đầu tiên (EDITVIDEO_WHISPER_BATCH_WAIT, giây)
+DEFAULT_MAX_BATCH = int(os.environ.get("EDITVIDEO_WHISPER_BATCH_SIZE", "8"))
+DEFAULT_MAX_WAIT = float(os.environ.get("EDITVIDEO_WHISPER_BATCH_WAIT", "0.05"))
+
+# Cửa sổ mục tiêu, khoảng tìm điểm im lặng và độ chồng lấn mỗi bên
+# (WINDOW + SEARCH + 2 × OVERLAP không vượt 30 giây của Whisper)
+WINDOW_SECONDS = 24
+WINDOW_SEARCH_SECONDS = 3
+OVERLAP_SECONDS = 1.0
+
+# Ngưỡng giống whisper.transcribe: decode lại khi lặp từ / xác suất thấp, bỏ cửa sổ im lặng
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# Mỗi token timestamp của Whisper ứng với 0.02 giây
+TIMESTAMP_SECONDS = 0.02
+
+_STOP = object()
+
+
+class _WindowRequest:
+    """Một cửa sổ mel chờ decode"""
+    __slots__ = ('model_name', 'mel', 'language', 'task', 'decode', 'future')
+
+    def __init__(self, model_name, mel, language, task, decode):
+        self.model_name = model_name
+        self.mel = mel
+        self.language = language
+        self.task = task
+        self.decode = decode
+        self.future = Future()
+
+
+def _decode_key(decode_options):
+    """(beam_size, best_of, các temperature) từ tham số decode của WhisperPlan"""
+    temperatures = decode_options.get('temperature', FALLBACK_TEMPERATURES)
+    if not isinstance(temperatures, (list, tuple)):
+        temperatures = (temperatures,)
+    return decode_options.get('beam_size'), decode_options.get('best_of'), tuple(temperatures)
+
+
+def _is_silent(result):
+    return result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+
+
+def _needs_fallback(result):
+    if _is_silent(result):
+        return False
+    return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+
+
+def result_to_segments(result, tokenizer, offset, window_seconds):
+    """
+    Tách DecodingResult (token có timestamp) thành segment theo thời gian gốc
+
+    Returns:
+        list[dict]: Segment {'start', 'end', 'text'}
+    """
+    if _is_silent(result):
+        return []
+    timestamp_begin = tokenizer.timestamp_begin
+    segments = []
+    start = None
+    text_tokens = []
+    for token in result.tokens:
+        if token < timestamp_begin:
+            text_tokens.append(token)
+            continue
+        position = min((token - timestamp_begin) * TIMESTAMP_SECONDS, window_seconds)
+        if start is not None and text_tokens:
+            segments.append({
+                'start': offset + start,
+                'end': offset + max(position, start),
+                'text': tokenizer.decode(text_tokens)
+            })
+            text_tokens = []
+            start = None
+        else:
+            start = position
+    if text_tokens:
+        # Model không kết thúc bằng timestamp: segment kéo tới hết cửa sổ
+        segments.append({
+            'start': offset + (start or 0.0),
+            'end': offset + window_seconds,
+            'text': tokenizer.decode(text_tokens)
+        })
+    return [segment for segment in segments if segment['text'].strip()]
+
+
+class WhisperBatchServer:
+    """
+    Luồng server decode cửa sổ mel của nhiều video theo batch
+
+    Cửa sổ được nhóm theo (model, ngôn ngữ, task, cách decode); mỗi nhóm là một lần
+    whisper.decode() với tensor [batch, n_mels, 3000] ở temperature đầu tiên (beam
+    search nếu plan yêu cầu), cửa sổ nào lặp từ/xác suất thấp thì decode lại riêng
+    với các temperature tiếp theo.
+    """
+
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'batches': 0, 'windows': 0, 'fallbacks': 0}
+
+    def start(self):
+        """Chạy luồng server (gọi nhiều lần không sao)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._serve, name="whisper-batch", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Dừng luồng server sau khi xử lý xong các cửa sổ đã nhận"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._requests.put(_STOP)
+            thread.join()
+
+    def transcribe(self, audio: PCMAudio, model_name, language=None, task='transcribe', **decode_options):
+        """
+        Transcribe một audio qua server (chặn tới khi mọi cửa sổ của audio xong)
+
+        Args:
+            audio (PCMAudio): Audio 16 kHz mono
+            model_name (str): Tên Whisper model
+            language (str): Ngôn ngữ (mã hoặc tên, vd: 'vi', 'vietnamese')
+            task (str): 'transcribe' hoặc 'translate'
+            decode_options: beam_size, best_of, temperature (WhisperPlan.decode_options);
+                condition_on_previous_text bị bỏ qua (xem đầu module)
+
+        Returns:
+            dict: Kết quả dạng Whisper {'text', 'segments', 'language'}
+        """
+        if not HAS_WHISPER:
+            raise ImportError("Cần cài đặt openai-whisper")
+        self.start()
+        model = get_whisper_pool().get_model(model_name)
+        n_mels = getattr(model.dims, 'n_mels', 80)
+
+        decode = _decode_key(decode_options)
+        chunks = plan_chunks(audio, chunk_seconds=WINDOW_SECONDS,
+                             search_seconds=WINDOW_SEARCH_SECONDS, overlap_seconds=OVERLAP_SECONDS)
+        windows = []
+        for chunk in chunks:
+            samples = whisper.pad_or_trim(audio.slice(chunk.start, chunk.end).to_float32())
+            request = _WindowRequest(model_name, whisper.log_mel_spectrogram(samples, n_mels=n_mels),
+                                     language, task, decode)
+            self._requests.put(request)
+            windows.append((chunk, request))
+
+        tokenizer = get_tokenizer(model.is_multilingual, language=language, task=task)
+        segments = []
+        for chunk, request in windows:
+            result = request.future.result()
+            segments.extend(owned_segments(
+                chunk, result_to_segments(result, tokenizer, chunk.start, chunk.end - chunk.start),
+                last=chunk.index == len(chunks) - 1
+            ))
+        for segment_id, segment in enumerate(segments):
+            segment['id'] = segment_id
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': language
+        }
+
+    def _serve(self):
+        while True:
+            first = self._requests.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            # Gom thêm cửa sổ của các video khác đang gửi tới trong max_wait
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    self._requests.put(_STOP)
+                    break
+                batch.append(request)
+
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.model_name, request.language, request.task, request.decode),
+                                  []).append(request)
+            for key, requests in groups.items():
+                self._decode_group(key, requests)
+
+    def _decode_group(self, key, requests):
+        model_name, language, task, (beam_size, best_of, temperatures) = key
+        try:
+            with get_whisper_pool().acquire(model_name) as model:
+                fp16 = model.device.type == 'cuda'
+                options = whisper.DecodingOptions(language=language, task=task, temperature=temperatures[0],
+                                                  beam_size=beam_size, fp16=fp16)
+                mel = torch.stack([request.mel for request in requests]).to(model.device)
+                results = whisper.decode(model, mel, options)
+                results = [
+                    self._decode_fallback(model, request.mel, result, language, task, fp16,
+                                          temperatures[1:], best_of)
+                    for request, result in zip(requests, results)
+                ]
+            with self._lock:
+                self.stats['batches'] += 1
+                self.stats['windows'] += len(requests)
+            for request, result in zip(requests, results):
+                request.future.set_result(result)
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def _decode_fallback(self, model, mel, result, language, task, fp16, temperatures, best_of):
+        """Decode lại riêng một cửa sổ với temperature tăng dần khi kết quả đầu tiên kém"""
+        for temperature in temperatures:
+            if not _needs_fallback(result):
+                break
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            options = whisper.DecodingOptions(language=language, task=task, temperature=temperature,
+                                              best_of=best_of or 5, fp16=fp16)
+            result = whisper.decode(model, mel.to(model.device), options)
+        return result
+
+
+_shared_server = None
+_shared_server_lock = threading.Lock()
+
+
+def get_whisper_batch_server():
+    """WhisperBatchServer dùng chung cho các worker batch trong process"""
+    global _shared_server
+    with _shared_server_lock:
+        if _shared_server is None:
+            _shared_server = WhisperBatchServer()
+        return _shared_server
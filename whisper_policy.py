@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module chọn Whisper model và cách decode theo ngân sách thời gian
+Ước lượng thời gian transcribe = độ dài audio × hệ số thời gian thực (RTF) của model
+× hệ số chi phí của cách decode; RTF lấy từ benchmark đo trên máy (cache ra đĩa),
+chưa đo thì dùng giá trị ước lượng sẵn.
+
+Đo lại benchmark:
+    python whisper_policy.py --benchmark [file_audio_mẫu]
+"""
+
+import os
+import json
+import time
+import platform
+import argparse
+import threading
+from dataclasses import dataclass, field
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from whisper_pool import HAS_WHISPER, get_whisper_pool
+
+SPEED_PROFILE = 'speed'        # GUI tương tác: ưu tiên nhanh
+BALANCED_PROFILE = 'balanced'
+QUALITY_PROFILE = 'quality'    # Batch chạy đêm: ưu tiên chất lượng
+
+# Profile mặc định (EDITVIDEO_WHISPER_PROFILE) và ngân sách STT mặc định tính bằng giây
+# (EDITVIDEO_WHISPER_BUDGET, bỏ trống = theo profile)
+DEFAULT_PROFILE = os.environ.get("EDITVIDEO_WHISPER_PROFILE", BALANCED_PROFILE)
+DEFAULT_BUDGET = float(os.environ["EDITVIDEO_WHISPER_BUDGET"]) if os.environ.get("EDITVIDEO_WHISPER_BUDGET") else None
+
+# Ngân sách theo profile = tỉ lệ × độ dài audio (None = không giới hạn)
+PROFILE_BUDGET_RATIOS = {
+    SPEED_PROFILE: 0.25,
+    BALANCED_PROFILE: 0.5,
+    QUALITY_PROFILE: None,
+}
+
+# Các model được cân nhắc, từ chất lượng cao tới nhanh nhất
+MODEL_SIZES = ('small', 'base', 'tiny')
+
+# Tổ hợp (model, decode) cao nhất mỗi profile được chọn (None = không giới hạn): mặc định
+# giữ base/greedy như trước, chỉ batch 'quality' mới dùng model lớn hơn
+PROFILE_CEILINGS = {
+    SPEED_PROFILE: ('base', 'greedy'),
+    BALANCED_PROFILE: ('base', 'greedy'),
+    QUALITY_PROFILE: None,
+}
+
+# RTF ước lượng trên CPU khi chưa có benchmark (giây xử lý / giây audio, decode greedy)
+DEFAULT_RTF = {'tiny': 0.06, 'base': 0.12, 'small': 0.4}
+
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+# Cách decode: tham số truyền cho model.transcribe và hệ số chi phí so với greedy
+DECODE_PROFILES = {
+    'beam': ({'beam_size': 5, 'best_of': 5, 'temperature': FALLBACK_TEMPERATURES}, 2.5),
+    'greedy': ({'beam_size': None, 'best_of': 1, 'temperature': FALLBACK_TEMPERATURES}, 1.15),
+    'fast': ({'beam_size': None, 'best_of': 1, 'temperature': 0.0,
+              'condition_on_previous_text': False}, 1.0),
+}
+DECODE_ORDER = ('beam', 'greedy', 'fast')
+
+# File cache kết quả benchmark (EDITVIDEO_WHISPER_BENCHMARK_PATH)
+DEFAULT_BENCHMARK_PATH = os.path.join(os.path.expanduser("~"), ".cache", "editvideo_whisper_benchmark.json")
+
+# Độ dài audio dùng để benchmark (giây)
+BENCHMARK_SECONDS = 30
+
+# Tự benchmark bằng audio của job đầu tiên nếu máy chưa có kết quả (EDITVIDEO_WHISPER_CALIBRATE=1)
+AUTO_CALIBRATE = os.environ.get("EDITVIDEO_WHISPER_CALIBRATE", "0") == "1"
+
+
+@dataclass
+class WhisperPlan:
+    """Model, tham số decode và số luồng torch đã chọn cho một lượt transcribe"""
+    model_name: str
+    decode: str
+    decode_options: dict = field(default_factory=dict)
+    torch_threads: int = 1
+    estimated_seconds: float = 0.0
+
+    def describe(self):
+        return f"{self.model_name}/{self.decode}, {self.torch_threads} luồng, ~{self.estimated_seconds:.0f}s"
+
+
+def resolve_budget(duration, latency_budget=None, profile=None):
+    """Ngân sách STT (giây) cho audio dài duration giây, None = không giới hạn"""
+    if latency_budget is not None:
+        return latency_budget
+    ratio = PROFILE_BUDGET_RATIOS.get(profile or DEFAULT_PROFILE, 1.0)
+    return duration * ratio if ratio is not None else None
+
+
+def choose_whisper_plan(duration, latency_budget=None, profile=None, cpu_count=None,
+                        rtf=None, models=MODEL_SIZES, concurrent_jobs=1):
+    """
+    Chọn tổ hợp (model, decode) chất lượng cao nhất có thời gian ước lượng trong ngân sách
+
+    Args:
+        duration (float): Độ dài audio cần transcribe (giây, sau VAD)
+        latency_budget (float): Ngân sách STT (giây); None = theo profile
+        profile (str): 'speed' | 'balanced' | 'quality'
+        cpu_count (int): Số nhân CPU (mặc định os.cpu_count())
+        rtf (dict): RTF theo model (mặc định benchmark đã cache hoặc DEFAULT_RTF)
+        models (tuple): Các model được phép, từ chất lượng cao tới thấp
+        concurrent_jobs (int): Số process transcribe song song trên cùng audio
+            (chia số luồng torch, thời gian ước lượng chia đều cho các process)
+
+    Returns:
+        WhisperPlan: Không tổ hợp nào vừa ngân sách thì trả về tổ hợp nhanh nhất
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    torch_threads = max(1, cpu_count // max(1, concurrent_jobs))
+    rtf = rtf or get_rtf_table(torch_threads)
+    budget = resolve_budget(duration, latency_budget, profile)
+
+    plans = []
+    for model_name in models:
+        for decode in DECODE_ORDER:
+            options, cost = DECODE_PROFILES[decode]
+            estimate = duration * rtf.get(model_name, DEFAULT_RTF.get(model_name, 1.0)) * cost
+            estimate /= max(1, concurrent_jobs)
+            plans.append(WhisperPlan(model_name, decode, dict(options), torch_threads, estimate))
+
+    ceiling = PROFILE_CEILINGS.get(profile or DEFAULT_PROFILE)
+    if ceiling and ceiling[0] in models:
+        plans = plans[next(i for i, plan in enumerate(plans) if (plan.model_name, plan.decode) == ceiling):]
+
+    for plan in plans:
+        if budget is None or plan.estimated_seconds <= budget:
+            return plan
+    return min(plans, key=lambda plan: plan.estimated_seconds)
+
+
+def profile_model(profile=None, models=MODEL_SIZES):
+    """Model policy chọn cho profile khi ngân sách không bị vượt (model cần load trước)"""
+    ceiling = PROFILE_CEILINGS.get(profile or DEFAULT_PROFILE)
+    if ceiling and ceiling[0] in models:
+        return ceiling[0]
+    return models[0]
+
+
+def preload_profile_model(profile=None):
+    """Load trước model sẽ dùng cho profile (EDITVIDEO_WHISPER_MODEL nếu có), bỏ qua nếu lỗi"""
+    if not HAS_WHISPER:
+        return
+    model_name = os.environ.get("EDITVIDEO_WHISPER_MODEL") or profile_model(profile)
+    try:
+        get_whisper_pool().preload(model_name)
+    except Exception as e:
+        print(f"⚠️ Không thể tải trước Whisper model: {e}")
+
+
+def apply_torch_threads(threads):
+    """Đặt số luồng torch cho process hiện tại (bỏ qua nếu không có torch)"""
+    try:
+        import torch
+        torch.set_num_threads(max(1, threads))
+    except ImportError:
+        pass
+
+
+def _device_name():
+    try:
+        import torch
+        return 'cuda' if torch.cuda.is_available() else 'cpu'
+    except ImportError:
+        return 'cpu'
+
+
+def machine_key(torch_threads=None):
+    """Khóa benchmark: kiến trúc, số nhân, thiết bị và số luồng torch"""
+    cpu_count = os.cpu_count() or 1
+    threads = torch_threads or cpu_count
+    return f"{platform.machine()}-{cpu_count}cpu-{_device_name()}-{threads}t"
+
+
+class BenchmarkCache:
+    """Kết quả benchmark RTF lưu dạng JSON: {machine_key: {model: rtf}}"""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("EDITVIDEO_WHISPER_BENCHMARK_PATH", DEFAULT_BENCHMARK_PATH)
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        return self.load().get(key, {})
+
+    def update(self, key, results):
+        """Ghi thêm RTF đo được cho một máy (ghi file tạm rồi đổi tên)"""
+        with self._lock:
+            data = self.load()
+            data.setdefault(key, {}).update(results)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def get_rtf_table(torch_threads=None, cache=None):
+    """RTF theo model: giá trị đã đo trên máy này, thiếu thì dùng DEFAULT_RTF"""
+    table = dict(DEFAULT_RTF)
+    table.update((cache or BenchmarkCache()).get(machine_key(torch_threads)))
+    return table
+
+
+def benchmark_model(model_name, audio=None, seconds=BENCHMARK_SECONDS, torch_threads=None):
+    """
+    Đo RTF của một model với decode greedy
+
+    Args:
+        audio (PCMAudio): Audio mẫu (nên có tiếng nói thật); None = tín hiệu tổng hợp
+        seconds (float): Độ dài tối đa dùng để đo
+
+    Returns:
+        float: Giây xử lý / giây audio
+    """
+    if not HAS_WHISPER:
+        raise ImportError("Cần cài đặt openai-whisper")
+    if audio is not None:
+        samples = audio.slice(0, seconds).to_float32()
+    else:
+        # Tín hiệu tổng hợp: các âm điều biến có nhiễu (kém thực tế hơn audio có lời)
+        t = np.arange(int(seconds * 16000)) / 16000
+        samples = (0.3 * np.sin(2 * np.pi * 180 * t) * (1 + np.sin(2 * np.pi * 3 * t))
+                   + 0.02 * np.random.default_rng(0).standard_normal(len(t))).astype(np.float32)
+    if torch_threads:
+        apply_torch_threads(torch_threads)
+
+    options = DECODE_PROFILES['greedy'][0]
+    with get_whisper_pool().acquire(model_name) as model:
+        # Lượt đầu để làm nóng (cấp phát bộ nhớ, JIT), không tính
+        model.transcribe(samples[:16000 * 5], **options)
+        started = time.perf_counter()
+        model.transcribe(samples, **options)
+        elapsed = time.perf_counter() - started
+    return elapsed / (len(samples) / 16000)
+
+
+def run_benchmark(models=MODEL_SIZES, audio=None, torch_threads=None, cache=None):
+    """Đo RTF các model và lưu vào cache benchmark, trả về {model: rtf}"""
+    cache = cache or BenchmarkCache()
+    results = {}
+    for model_name in models:
+        print(f"⏱️ Benchmark Whisper '{model_name}'...")
+        try:
+            results[model_name] = round(benchmark_model(model_name, audio, torch_threads=torch_threads), 4)
+            print(f"   RTF = {results[model_name]}")
+        except Exception as e:
+            print(f"⚠️ Không thể benchmark '{model_name}': {e}")
+    if results:
+        cache.update(machine_key(torch_threads), results)
+    return results
+
+
+def ensure_calibrated(models=MODEL_SIZES, audio=None, torch_threads=None, cache=None):
+    """Benchmark một lần nếu bật AUTO_CALIBRATE và máy này chưa có kết quả"""
+    if not AUTO_CALIBRATE or not HAS_WHISPER:
+        return
+    cache = cache or BenchmarkCache()
+    missing = [model_name for model_name in models if model_name not in cache.get(machine_key(torch_threads))]
+    if missing:
+        run_benchmark(missing, audio, torch_threads, cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper trên máy này để chọn model theo ngân sách")
+    parser.add_argument("--benchmark", action="store_true", help="Đo RTF và lưu vào cache")
+    parser.add_argument("audio", nargs="?", help="File audio/video mẫu có lời thoại (khuyến nghị)")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_SIZES), help="Các model cần đo")
+    parser.add_argument("--duration", type=float, default=600, help="Độ dài audio giả định để xem model được chọn")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        audio = None
+        if args.audio:
+            from audio_source import load_pcm_audio
+            audio = load_pcm_audio(args.audio)
+        run_benchmark(args.models, audio)
+
+    print(f"📊 RTF ({machine_key()}): {get_rtf_table()}")
+    for profile in PROFILE_BUDGET_RATIOS:
+        plan = choose_whisper_plan(args.duration, profile=profile)
+        print(f"   {profile}: {plan.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module quản lý Whisper model dùng chung trong process
+Mỗi kích thước model chỉ load một lần; các luồng mượn model qua slot có giới hạn.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import whisper
+    HAS_WHISPER = True
+except ImportError:
+    HAS_WHISPER = False
+
+# Model mặc định dùng để tạo phụ đề
+DEFAULT_WHISPER_MODEL = "base"
+
+# Số bản model tối đa cho mỗi kích thước (mỗi bản phục vụ một lượt transcribe tại một thời điểm)
+DEFAULT_MAX_INSTANCES = int(os.environ.get("EDITVIDEO_WHISPER_INSTANCES", "1"))
+
+
+class WhisperModelPool:
+    """
+    Pool Whisper model dùng chung
+
+    transcribe() gắn hook kv-cache lên model nên một instance không an toàn khi
+    nhiều luồng dùng cùng lúc: mỗi slot là quyền dùng riêng một instance.
+    """
+
+    def __init__(self, max_instances=DEFAULT_MAX_INSTANCES):
+        self.max_instances = max(1, max_instances)
+        self._lock = threading.Lock()
+        self._instances = {}    # model_name -> [mọi instance đã load]
+        self._available = {}    # model_name -> [instance rảnh]
+        self._conditions = {}   # model_name -> Condition chờ slot
+
+    def _condition(self, model_name):
+        with self._lock:
+            if model_name not in self._conditions:
+                self._conditions[model_name] = threading.Condition()
+                self._instances[model_name] = []
+                self._available[model_name] = []
+            return self._conditions[model_name]
+
+    def _load(self, model_name):
+        if not HAS_WHISPER:
+            raise ImportError("Cần cài đặt openai-whisper")
+        print(f"🤖 Đang tải Whisper model '{model_name}'...")
+        return whisper.load_model(model_name)
+
+    def get_model(self, model_name=DEFAULT_WHISPER_MODEL):
+        """
+        Lấy model (load nếu chưa có) để kiểm tra/tham chiếu
+
+        Không dùng giá trị trả về để transcribe đồng thời - dùng acquire().
+        """
+        condition = self._condition(model_name)
+        with condition:
+            if not self._instances[model_name]:
+                model = self._load(model_name)
+                self._instances[model_name].append(model)
+                self._available[model_name].append(model)
+            return self._instances[model_name][0]
+
+    def preload(self, model_name=DEFAULT_WHISPER_MODEL):
+        """Load trước model (vd: trước khi các worker batch bắt đầu)"""
+        self.get_model(model_name)
+
+    @contextmanager
+    def acquire(self, model_name=DEFAULT_WHISPER_MODEL):
+        """
+        Mượn riêng một instance model trong khối with
+
+        Load thêm instance khi mọi instance đều bận và chưa đạt max_instances,
+        ngược lại chờ tới khi có instance được trả về.
+        """
+        condition = self._condition(model_name)
+        with condition:
+            while True:
+                if self._available[model_name]:
+                    model = self._available[model_name].pop()
+                    break
+                if len(self._instances[model_name]) < self.max_instances:
+                    # Load trong lúc giữ condition để không load trùng
+                    model = self._load(model_name)
+                    self._instances[model_name].append(model)
+                    break
+                condition.wait()
+
+        try:
+            yield model
+        finally:
+            with condition:
+                self._available[model_name].append(model)
+                condition.notify()
+
+    def loaded_models(self):
+        """Số instance đã load theo từng model"""
+        with self._lock:
+            return {name: len(models) for name, models in self._instances.items()}
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_whisper_pool():
+    """WhisperModelPool dùng chung cho CLI, GUI và batch"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = WhisperModelPool()
+        return _shared_pool